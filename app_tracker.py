@@ -1,9 +1,6 @@
-import win32gui
-import win32process
-import psutil
-import time
-from datetime import datetime, timedelta
 from collections import defaultdict
+from window_source import default_window_source, track_foreground
+from clock import default_clock
 
 import logging
 
@@ -17,77 +14,63 @@ logging.basicConfig(
     datefmt = '%H:%M:%S'
 )
 
-def get_active_window_info():
-    """
-    Gets the name of active window/app
-    Return: process name or None 
-    """
-    try:
-        # grab foreground window
-        window = win32gui.GetForegroundWindow()
-
-        # if no valid window, skip
-        if not window:
-            return None
-
-        # grab process ID of window
-        _, pid = win32process.GetWindowThreadProcessId(window)
-
-        # use psutil -> get process name fm PID
-        process = psutil.Process(pid)
-        process_name = process.name()
-
-        return process_name
-    
-    except psutil.NoSuchProcess:
-        # EXPECTED - window closed between checks
-        logging.debug(f"Process disappeared (PID no longer exists)")
-        return None
-    except psutil.AccessDenied:
-        # EXPECTED - system/protected process
-        logging.debug(f"Access denied to process")
-        return None
-    except Exception as e:
-        # UNEXPECTED!!!! needs fixing
-        logging.error(f"Unexpected error getting window: {e}")
-        return None
-    
 class TimeTracker:
     """
     Tracks time spent in different apps
     Only starts tracking after 30+ seconds in the window
     """
-    def __init__(self, threshold_seconds = 30):
+    def __init__(self, threshold_seconds = 30, clock = None):
         self.threshold = threshold_seconds
         self.current_app = None
         self.session_start = None
         self.total_time = defaultdict(float) # in seconds
+        # monotonic durations, see clock.py
+        self.clock = clock or default_clock()
+        self.clock.anchor()
     
-    def update(self, app_name):
+    def update(self, app_name, now = None):
         """
         Update tracking w/ current active application
         
         :param self: TimeTracker instance
         :param app_name: the current window
+        :param now: when app_name was seen (default: now)
         """
-        now = datetime.now()
+        now = now or self.clock.now()
+
+        # slept / clock changed: count up to the jump, carry on from the new anchor
+        jump = self.clock.check()
+        if jump:
+            if self.current_app and self.session_start:
+                self._end_session(max(self.session_start, jump.before))
+                self.session_start = jump.after
+            now = max(now, jump.after)
 
         # If app changed
         if app_name != self.current_app:
             #save time fm prev app if 30+ seconds
             if self.current_app and self.session_start:
-                session_duration = (now - self.session_start).total_seconds()
-
-                if session_duration >= self.threshold:
-                    self.total_time[self.current_app] += session_duration
-                    print(f"Logged {session_duration:.1f}s in {self.current_app}")
-                else:
-                    print(f"Ignored {session_duration:.1f}s in {self.current_app} (below threshold)")
+                self._end_session(now)
 
             #start new session
             self.current_app = app_name
             self.session_start = now
 
+    def _end_session(self, end):
+        """
+        Add the open session to the totals if it's long enough
+        
+        :param self: TimeTracker instance
+        :param end: when it ended
+        """
+        session_duration = (end - self.session_start).total_seconds()
+
+        if session_duration >= self.threshold:
+            self.total_time[self.current_app] += session_duration
+            print(f"Logged {session_duration:.1f}s in {self.current_app}")
+        else:
+            print(f"Ignored {session_duration:.1f}s in {self.current_app} (below threshold)")
+
     def get_report(self):
         """
         Get formatted report of time tracked per app
@@ -124,7 +107,7 @@ class TimeTracker:
     
 def main():
     """
-    Loop - checks for active window every 2 seconds
+    Loop - updates on every foreground window change
     """
     import argparse
 
@@ -148,17 +131,15 @@ def main():
     print("Press Ctrl+C to stop\n")
 
     tracker = TimeTracker(threshold_seconds = 30)
+    source = default_window_source()
 
     try:
-        while True:
-            active_app = get_active_window_info()
-            if active_app:
-                tracker.update(active_app)
-
-            time.sleep(2)
+        track_foreground(source, tracker, lambda: True)
     except KeyboardInterrupt:
         print("\n\nStopping tracker...")
         print(tracker.get_report())
+    finally:
+        source.stop()
 
     
 
@@ -0,0 +1,274 @@
+"""
+Benchmarks for the database and tracking hot paths
+Fills a fresh database with synthetic projects/sessions at each scale, times the
+calls the GUI and tracker make, and writes the results as JSON so two commits
+can be compared on the same machine:
+
+    python benchmark.py --output before.json
+    (change things)
+    python benchmark.py --output after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import logging
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timedelta
+
+from database import Database
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000]
+START = datetime(2024, 1, 1, 9, 0)
+APPS = [
+    "Photoshop.exe", "PureRef.exe", "chrome.exe", "Code.exe", "blender.exe",
+    "krita.exe", "CLIPStudioPaint.exe", "Discord.exe", "Spotify.exe", "explorer.exe",
+    "Figma.exe", "Aseprite.exe", "obs64.exe", "notepad.exe", "Idle",
+]
+
+def timed(func, repeat):
+    """
+    Call func repeat times
+    :return: Stats dict (milliseconds per call)
+    """
+    times = []
+    for i in range(repeat):
+        began = time.perf_counter()
+        func(i)
+        times.append((time.perf_counter() - began) * 1000)
+    return summarize(times)
+
+def summarize(times):
+    """min/median/mean/p95/max of a list of millisecond timings"""
+    ordered = sorted(times)
+    return {
+        'calls': len(ordered),
+        'min_ms': ordered[0],
+        'median_ms': statistics.median(ordered),
+        'mean_ms': statistics.fmean(ordered),
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'max_ms': ordered[-1],
+    }
+
+def populate(db, sessions, projects, seed=0):
+    """
+    Fill db with projects and back-to-back sessions spread over them
+    :return: List of project IDs
+    """
+    rng = random.Random(seed)
+    project_ids = [db.create_project(f"Project {i + 1}") for i in range(projects)]
+
+    now = START
+    for _ in range(sessions):
+        duration = rng.uniform(30, 3600)
+        end = now + timedelta(seconds=duration)
+        db.add_time_session(rng.choice(project_ids), rng.choice(APPS), now, end, duration)
+        # small gap between sessions, the odd long break (nights, weekends)
+        now = end + timedelta(seconds=rng.choice((1, 5, 60, 8 * 3600)))
+    db.flush()
+    return project_ids
+
+def bench_database(db_path, sessions, projects=50, repeat=50, inserts=2000, seed=0):
+    """
+    Time the database calls at one scale
+
+    :param db_path: Database file to create (must not exist)
+    :param sessions: Number of sessions to generate
+    :param projects: Number of projects they're spread over
+    :param repeat: Calls per timed read/edit
+    :param inserts: add_time_session calls timed on top of the generated data
+    :param seed: Random seed (same seed = same data)
+    :return: Dict of operation -> stats
+    """
+    rng = random.Random(seed + 1)
+    results = {}
+
+    # big batches so generating 1M rows doesn't take all day
+    with Database(db_path, batch_size=5000) as db:
+        began = time.perf_counter()
+        project_ids = populate(db, sessions, projects, seed)
+        elapsed = time.perf_counter() - began
+        results['populate'] = {'rows': sessions, 'seconds': elapsed, 'rows_per_second': sessions / elapsed}
+
+    # reopen with the app's batching for everything else
+    with Database(db_path) as db:
+        last = START + timedelta(days=3650)
+
+        def add_session(i):
+            start = last + timedelta(minutes=i)
+            db.add_time_session(rng.choice(project_ids), rng.choice(APPS), start, start + timedelta(seconds=45), 45)
+        results['add_time_session'] = timed(add_session, inserts)
+        # the last partial batch is part of the cost
+        began = time.perf_counter()
+        db.flush()
+        results['add_time_session']['final_flush_ms'] = (time.perf_counter() - began) * 1000
+
+        results['get_project_time'] = timed(lambda i: db.get_project_time(rng.choice(project_ids)), repeat)
+        results['get_all_projects'] = timed(lambda i: db.get_all_projects(), repeat)
+        results['get_project_summaries'] = timed(lambda i: db.get_project_summaries(), repeat)
+
+        # pick what to edit up front so only the edit itself is timed
+        edits = []
+        for _ in range(repeat):
+            project_id = rng.choice(project_ids)
+            app = rng.choice(db.get_project_time(project_id)['app_breakdown'])
+            edits.append((project_id, app['app_name'], app['duration'] * rng.uniform(0.9, 1.1)))
+        results['update_app_time_for_project'] = timed(lambda i: db.update_app_time_for_project(*edits[i]), repeat)
+
+    results['file_mb'] = os.path.getsize(db_path) / 1e6
+    return results
+
+def bench_tracker(db_path, switches=5000, seed=0):
+    """
+    Time ProjectTimeTracker.update over a scripted stream of window switches
+    Fake window + idle sources, so nothing waits on the real clock or the OS
+
+    :param db_path: Database file to create (must not exist)
+    :param switches: Number of foreground switches played back
+    :param seed: Random seed
+    :return: Stats dict (per update() call)
+    """
+    from idle_source import FakeIdleSource
+    from window_source import ScriptedWindowSource, track_foreground
+    from tracker_with_db import ProjectTimeTracker
+
+    # the tracker logs every saved session, far slower than the code being timed
+    # (set after the import, tracker_with_db sets up logging when imported)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(seed + 2)
+    script = []
+    now = START
+    for _ in range(switches):
+        script.append((now, rng.choice(APPS[:-1])))
+        # mostly real sessions, some under the 30s threshold
+        now += timedelta(seconds=rng.choice((5, 40, 90, 300, 1200)))
+
+    source = ScriptedWindowSource(script)
+    with Database(db_path) as db:
+        project_id = db.create_project("Tracker")
+        idle = FakeIdleSource(clock=source.now)
+        tracker = ProjectTimeTracker(db, project_id, threshold_seconds=30, sync_calendar=False, idle_source=idle)
+
+        class TimedTracker:
+            """Times each update() the loop makes (switches and heartbeats)"""
+            def __init__(self):
+                self.times = []
+
+            def update(self, app_name, now):
+                # user is always active
+                idle.input_at(now)
+                began = time.perf_counter()
+                tracker.update(app_name, now)
+                self.times.append((time.perf_counter() - began) * 1000)
+
+        timed_tracker = TimedTracker()
+        # 60s heartbeat keeps the number of filler updates reasonable
+        track_foreground(source, timed_tracker, lambda: not source.done, heartbeat=60.0, on_tick=lambda app: db.flush_if_due())
+        db.flush()
+
+    stats = summarize(timed_tracker.times)
+    stats['switches'] = switches
+    return stats
+
+def environment():
+    """Machine/commit details stored with the results"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+def run(scales=None, projects=50, repeat=50, inserts=2000, switches=5000, seed=0, work_dir=None, progress=print):
+    """
+    Run every benchmark
+
+    :param scales: Session counts to generate (default: 10k, 100k, 1M)
+    :param work_dir: Where the temporary databases go (default: system temp)
+    :param progress: Called with a status line before each step (None = quiet)
+    :return: Results dict (what gets written as JSON)
+    """
+    scales = scales or DEFAULT_SCALES
+    progress = progress or (lambda message: None)
+
+    results = {
+        'environment': environment(),
+        'settings': {'projects': projects, 'repeat': repeat, 'inserts': inserts, 'switches': switches, 'seed': seed},
+        'scales': {},
+    }
+    with tempfile.TemporaryDirectory(dir=work_dir) as folder:
+        for sessions in scales:
+            progress(f"{sessions:,} sessions...")
+            db_path = os.path.join(folder, f'bench_{sessions}.db')
+            results['scales'][str(sessions)] = bench_database(db_path, sessions, projects, repeat, inserts, seed)
+
+        progress(f"Tracker stream ({switches:,} switches)...")
+        results['tracker_update'] = bench_tracker(os.path.join(folder, 'bench_tracker.db'), switches, seed)
+    return results
+
+def compare(baseline, current):
+    """
+    Median/throughput change per operation between two result dicts
+    :return: List of (name, before, after, ratio) - ratio > 1 means slower now
+    """
+    rows = []
+
+    def add(name, before, after, key):
+        if before and after and key in before and key in after and before[key]:
+            rows.append((name, before[key], after[key], after[key] / before[key]))
+
+    for scale, ops in current.get('scales', {}).items():
+        old_ops = baseline.get('scales', {}).get(scale, {})
+        for op, stats in ops.items():
+            if isinstance(stats, dict) and 'median_ms' in stats:
+                add(f"{scale} {op}", old_ops.get(op), stats, 'median_ms')
+        add(f"{scale} populate (s)", old_ops.get('populate'), ops.get('populate'), 'seconds')
+    add("tracker_update", baseline.get('tracker_update'), current.get('tracker_update'), 'median_ms')
+    return rows
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the database and tracking hot paths')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='Session counts to generate')
+    parser.add_argument('--projects', type=int, default=50, help='Projects the sessions are spread over')
+    parser.add_argument('--repeat', type=int, default=50, help='Calls per timed read/edit')
+    parser.add_argument('--inserts', type=int, default=2000, help='add_time_session calls timed per scale')
+    parser.add_argument('--switches', type=int, default=5000, help='Window switches in the tracker stream')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated data')
+    parser.add_argument('--work-dir', help='Folder for the temporary databases (default: system temp)')
+    parser.add_argument('--output', '-o', default='benchmark.json', help='JSON file to write')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    results = run(args.scales, args.projects, args.repeat, args.inserts, args.switches, args.seed, args.work_dir)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print(f"\n{'operation':45s} {'before':>10s} {'after':>10s} {'change':>8s}")
+        for name, before, after, ratio in compare(baseline, results):
+            print(f"{name:45s} {before:10.3f} {after:10.3f} {ratio:7.2f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,7 +12,6 @@ Automatically syncs time sessions to Google Calendar in real-time.
 import os
 import pickle
 from datetime import datetime, timezone
-import pytz
 from typing import Optional
 
 from google.auth.transport.requests import Request
@@ -25,9 +24,16 @@ import config
 # Scopes define what permissions we're requesting
 # We need full calendar access to create a dedicated calendar
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+# Google allows at most 50 calls in one batch request
+BATCH_LIMIT = 50
+
+# Event fields a session can change, patches send a subset of these
+PATCH_FIELDS = ('start', 'end', 'summary', 'description', 'colorId')
+
 def get_local_timezone():
-    """Get configured timezone"""
-    return pytz.timezone(config.get_timezone())
+    """Get configured timezone (cached by config, not rebuilt per event)"""
+    return config.get_tzinfo()
 
 
 class CalendarSync:
@@ -147,6 +153,66 @@ class CalendarSync:
             print(f"Error setting up calendar: {e}")
             return False
     
+    def _event_body(self, session_data: dict, fields: tuple = None) -> dict:
+        """
+        Build the Calendar API event resource for a session.
+        
+        Args:
+            session_data: Same format as create_event_from_session
+            fields: Only include these top-level fields (for patches), default all
+        
+        Returns:
+            dict: Event body for events().insert/patch
+        """
+        # Format times for Google Calendar (RFC3339)
+        start_time = session_data['start_time']
+        end_time = session_data['end_time']
+        
+        # Ensure times are timezone-aware (use local timezone)
+        LOCAL_TZ = get_local_timezone()
+        timezone_name = config.get_timezone()
+        if start_time.tzinfo is None:
+            start_time = LOCAL_TZ.localize(start_time)
+        if end_time.tzinfo is None:
+            end_time = LOCAL_TZ.localize(end_time)
+        # Calculate duration for display
+        duration_minutes = session_data['duration_seconds'] / 60
+        
+        # Colour code by app
+        app_colors = {
+            'Photoshop.exe': '9', # blueberry
+            'PureRef.exe': '4', # flamingo
+            'chrome.exe': '10', # basil
+            'code.exe': '1', # lavender
+            'Idle': '8', # graphite
+            'Genshin.exe': '5' # banana
+        }
+        color_id = app_colors.get(session_data['app_name'], '8') # default to graphite
+
+        # Create event
+        emoji = "💤" if session_data['app_name'] == 'Idle' else "🎨"
+        app_display = session_data['app_name'].replace('.exe', '')
+        event = {
+            # Clean up app name for display
+            'summary': f"{emoji} {app_display}",
+            'location': session_data['project_name'],
+            'description': f"Art time tracked in {session_data['app_name']}\n"
+                          f"Duration: {duration_minutes:.1f} minutes",
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': timezone_name,  # Adjust to your timezone
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': timezone_name,
+            },
+            'colorId': color_id,
+        }
+        
+        if fields:
+            return {field: event[field] for field in fields}
+        return event
+    
     def create_event_from_session(self, session_data: dict) -> Optional[str]:
         """
         Create a calendar event from a time session.
@@ -167,49 +233,7 @@ class CalendarSync:
             return None
         
         try:
-            # Format times for Google Calendar (RFC3339)
-            start_time = session_data['start_time']
-            end_time = session_data['end_time']
-            
-            # Ensure times are timezone-aware (use local timezone)
-            LOCAL_TZ = get_local_timezone()
-            if start_time.tzinfo is None:
-                start_time = LOCAL_TZ.localize(start_time)
-            if end_time.tzinfo is None:
-                end_time = LOCAL_TZ.localize(end_time)
-            # Calculate duration for display
-            duration_minutes = session_data['duration_seconds'] / 60
-            
-            # Colour code by app
-            app_colors = {
-                'Photoshop.exe': '9', # blueberry
-                'PureRef.exe': '4', # flamingo
-                'chrome.exe': '10', # basil
-                'code.exe': '1', # lavender
-                'Idle': '8', # graphite
-                'Genshin.exe': '5' # banana
-            }
-            color_id = app_colors.get(session_data['app_name'], '8') # default to graphite
-
-            # Create event
-            emoji = "💤" if session_data['app_name'] == 'Idle' else "🎨"
-            app_display = session_data['app_name'].replace('.exe', '')
-            event = {
-                # Clean up app name for display
-                'summary': f"{emoji} {app_display}",
-                'location': session_data['project_name'],
-                'description': f"Art time tracked in {session_data['app_name']}\n"
-                              f"Duration: {duration_minutes:.1f} minutes",
-                'start': {
-                    'dateTime': start_time.isoformat(),
-                    'timeZone': config.get_timezone(),  # Adjust to your timezone
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': config.get_timezone(),
-                },
-                'colorId': color_id,
-            }
+            event = self._event_body(session_data)
             
             # Insert event
             created_event = self.service.events().insert(
@@ -235,54 +259,41 @@ class CalendarSync:
         Returns:
             bool: True if successful, False otherwise
         """
+        return self.patch_event(event_id, session_data)['ok']
+    
+    def patch_event(self, event_id: str, session_data: dict, fields: tuple = PATCH_FIELDS,
+                    etag: Optional[str] = None) -> dict:
+        """
+        Update only some fields of an event, in one request (no get + update).
+        
+        Args:
+            event_id: Google Calendar event ID
+            session_data: Updated session data (same format as create_event_from_session)
+            fields: Which of PATCH_FIELDS changed
+            etag: Last known ETag, if given the patch only applies when the
+                  event hasn't been changed since (otherwise conflict)
+        
+        Returns:
+            dict: {'ok', 'event_id', 'etag', 'conflict', 'error'} (same as a batch_sync result)
+        """
         if not self.service:
             print("Not authenticated. Call authenticate() first.")
-            return False
+            return self._result(event_id, error="Not authenticated")
         
+        op = {'action': 'patch', 'event_id': event_id, 'session_data': session_data,
+              'fields': fields, 'etag': etag}
         try:
-            # Get the existing event
-            event = self.service.events().get(
-                calendarId=self.calendar_id,
-                eventId=event_id
-            ).execute()
-            
-            # Update event fields
-            start_time = session_data['start_time']
-            end_time = session_data['end_time']
-            
-            LOCAL_TZ = get_local_timezone()
-            if start_time.tzinfo is None:
-                start_time = LOCAL_TZ.localize(start_time)
-            if end_time.tzinfo is None:
-                end_time = LOCAL_TZ.localize(end_time)
-            
-            duration_minutes = session_data['duration_seconds'] / 60
-            
-            event['summary'] = f"🎨 {session_data['project_name']} - {session_data['app_name']}"
-            event['description'] = f"Art time tracked in {session_data['app_name']}\n" \
-                                  f"Duration: {duration_minutes:.1f} minutes"
-            event['start'] = {
-                'dateTime': start_time.isoformat(),
-                'timeZone': config.get_timezone(),
-            }
-            event['end'] = {
-                'dateTime': end_time.isoformat(),
-                'timeZone': config.get_timezone(),
-            }
-            
-            # Update the event
-            updated_event = self.service.events().update(
-                calendarId=self.calendar_id,
-                eventId=event_id,
-                body=event
-            ).execute()
-            
-            print(f"✓ Updated calendar event: {updated_event.get('htmlLink')}")
-            return True
+            event = self._build_request(op).execute()
+            print(f"✓ Updated calendar event: {event.get('htmlLink')}")
+            return self._result(event_id, response=event)
             
         except HttpError as e:
-            print(f"Error updating calendar event: {e}")
-            return False
+            result = self._result(event_id, exception=e)
+            if result['conflict']:
+                print(f"Calendar event {event_id} was changed elsewhere, not overwriting")
+            else:
+                print(f"Error updating calendar event: {e}")
+            return result
     
     def delete_event(self, event_id: str) -> bool:
         """
@@ -310,7 +321,115 @@ class CalendarSync:
         except HttpError as e:
             print(f"Error deleting calendar event: {e}")
             return False
-
+    
+    def batch_sync(self, operations: list) -> dict:
+        """
+        Send many event inserts/patches/deletes using batch requests
+        (up to BATCH_LIMIT calls per HTTP round-trip).
+        
+        Args:
+            operations: List of dicts with keys:
+                - key: Anything hashable, identifies the result
+                - action: 'insert', 'patch' or 'delete'
+                - event_id: Existing event ID (patch/delete)
+                - session_data: Session dict (insert/patch, same format as create_event_from_session)
+                - fields: Fields to send for a patch (default PATCH_FIELDS)
+                - etag: Only patch if the event still has this ETag (optional)
+        
+        Returns:
+            dict: key -> {'ok': bool, 'event_id': str or None, 'etag': str or None,
+                          'conflict': bool, 'error': str or None}
+        """
+        results = {}
+        if not self.service:
+            print("Not authenticated. Call authenticate() first.")
+            for op in operations:
+                results[op['key']] = self._result(op.get('event_id'), error="Not authenticated")
+            return results
+        
+        for start in range(0, len(operations), BATCH_LIMIT):
+            chunk = operations[start:start + BATCH_LIMIT]
+            
+            # request_id is the op's index in this chunk
+            def on_response(request_id, response, exception, chunk=chunk):
+                op = chunk[int(request_id)]
+                results[op['key']] = self._result(op.get('event_id'), response, exception)
+            
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for index, op in enumerate(chunk):
+                batch.add(self._build_request(op), request_id=str(index))
+            
+            try:
+                batch.execute()
+            except Exception as e:
+                # whole batch failed (offline etc.), every op without a result failed with it
+                for op in chunk:
+                    results.setdefault(op['key'], self._result(op.get('event_id'), error=str(e)))
+        
+        synced = sum(1 for result in results.values() if result['ok'])
+        print(f"Batch synced {synced}/{len(operations)} calendar events")
+        return results
+    
+    def _build_request(self, op: dict):
+        """
+        Build (but don't execute) the API request for one batch_sync operation.
+        
+        Args:
+            op: One entry of batch_sync's operations
+        
+        Returns:
+            HttpRequest (execute it, or add it to a batch)
+        """
+        events = self.service.events()
+        if op['action'] == 'insert':
+            return events.insert(calendarId=self.calendar_id, body=self._event_body(op['session_data']))
+        if op['action'] == 'patch':
+            request = events.patch(
+                calendarId=self.calendar_id,
+                eventId=op['event_id'],
+                body=self._event_body(op['session_data'], op.get('fields') or PATCH_FIELDS)
+            )
+            if op.get('etag'):
+                # server answers 412 if someone else changed the event since
+                request.headers['If-Match'] = op['etag']
+            return request
+        if op['action'] == 'delete':
+            return events.delete(calendarId=self.calendar_id, eventId=op['event_id'])
+        raise ValueError(f"Unknown calendar batch action: {op['action']}")
+    
+    @staticmethod
+    def _result(event_id: Optional[str], response=None, exception=None, error: str = None) -> dict:
+        """
+        Turn an API response (or error) into a batch_sync/patch_event result.
+        
+        Args:
+            event_id: Event ID sent with the request (None for inserts)
+            response: Parsed response body on success
+            exception: Exception raised for this request
+            error: Error message when there was no request at all
+        
+        Returns:
+            dict: {'ok', 'event_id', 'etag', 'conflict', 'error'}
+        """
+        if exception is not None or error is not None:
+            status = getattr(getattr(exception, 'resp', None), 'status', None)
+            return {
+                'ok': False,
+                'event_id': event_id,
+                'etag': None,
+                'conflict': str(status) == '412', # If-Match didn't match
+                'error': error or str(exception),
+            }
+        
+        # delete has an empty response, keep the ID we sent
+        response = response or {}
+        return {
+            'ok': True,
+            'event_id': response.get('id', event_id),
+            'etag': response.get('etag'),
+            'conflict': False,
+            'error': None,
+        }
 
 # Example usage (for testing)
 if __name__ == "__main__":
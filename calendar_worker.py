@@ -0,0 +1,186 @@
+"""
+Background calendar sync
+Pushes sessions waiting in the calendar_outbox table to Google Calendar,
+so a slow or offline API never holds up the tracking thread
+"""
+
+import threading
+import time
+import logging
+
+from database import Database
+
+# A rescaled session only changes its length, so that's all an update patch sends
+UPDATE_FIELDS = ('end', 'description')
+
+
+class CalendarSyncWorker:
+    """
+    Drains the calendar outbox on its own thread, retrying failures with backoff
+    """
+    def __init__(self, db: Database, calendar_sync, poll_interval = 5.0, batch_size = 50,
+                 base_backoff = 30.0, max_backoff = 3600.0, clock = time.time):
+        """
+        :param db: Database instance (outbox lives here)
+        :param calendar_sync: CalendarSync (or anything with batch_sync)
+        :param poll_interval: Seconds between outbox checks
+        :param batch_size: Max entries pushed per check (one batch request per 50)
+        :param base_backoff: Wait after the first failure, doubles each retry
+        :param max_backoff: Longest wait between retries (offline for days = retry hourly)
+        :param clock: Returns epoch seconds (swap out in tests)
+        """
+        self.db = db
+        self.calendar_sync = calendar_sync
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start the background thread
+
+        :param self: -
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="CalendarSyncWorker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout = 5.0):
+        """
+        Stop the background thread (unsynced sessions stay in the outbox for next time)
+
+        :param self: -
+        :param timeout: Max seconds to wait for an in-flight push
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        """
+        Worker loop
+
+        :param self: -
+        """
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                # keep the worker alive, entries are retried next round
+                logging.error(f"Calendar sync worker error: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def run_once(self):
+        """
+        Push every due outbox entry once, as a single batch request
+
+        :param self: -
+        :return: Number of sessions synced
+        """
+        entries = self.db.get_due_calendar_syncs(now=self.clock(), limit=self.batch_size)
+        if not entries:
+            return 0
+
+        operations = []
+        for entry in entries:
+            op = {
+                'key': entry['outbox_id'],
+                'action': 'insert',
+                'event_id': entry['calendar_event_id'],
+                'session_data': entry['session_data']
+            }
+            if entry['action'] == 'update':
+                # conditional patch, no read-modify-write
+                op.update(action='patch', fields=UPDATE_FIELDS, etag=entry['calendar_etag'])
+            operations.append(op)
+
+        try:
+            results = self.calendar_sync.batch_sync(operations)
+        except Exception as e:
+            # network errors (offline etc.) aren't HttpErrors so they end up here
+            results = {}
+            error = str(e)
+        else:
+            error = "No response from calendar API"
+
+        synced = 0
+        for entry in entries:
+            result = results.get(entry['outbox_id'])
+            if result and result['ok'] and result['event_id']:
+                self.db.complete_calendar_sync(
+                    entry['outbox_id'], entry['session_id'], result['event_id'], result.get('etag'), entry['version']
+                )
+                synced += 1
+            elif result and result.get('conflict'):
+                # event was edited in Google Calendar since we last wrote it, keep their version
+                # (the old ETag stays, so later edits made here can't overwrite it either)
+                self.db.complete_calendar_sync(
+                    entry['outbox_id'], entry['session_id'], entry['calendar_event_id'], entry['calendar_etag'],
+                    entry['version']
+                )
+                logging.warning(f"Calendar event for session {entry['session_id']} changed elsewhere, skipped update")
+            else:
+                reason = result['error'] if result else error
+                delay = self.backoff(entry['attempts'])
+                self.db.retry_calendar_sync(entry['outbox_id'], reason, self.clock() + delay)
+                logging.warning(
+                    f"Calendar sync failed for session {entry['session_id']} "
+                    f"({reason}), retrying in {delay:.0f}s"
+                )
+
+        if synced:
+            logging.info(f"Synced {synced} session(s) to calendar")
+        return synced
+
+    def backoff(self, attempts):
+        """
+        Seconds to wait before the next retry
+
+        :param self: -
+        :param attempts: Failed attempts so far
+        """
+        # cap the exponent so a long outage can't overflow the float
+        return min(self.max_backoff, self.base_backoff * (2 ** min(attempts, 20)))
+
+
+def backfill(db_path = 'time_tracker.db', project_id = None):
+    """
+    Push every session that never made it to the calendar, in batches
+    
+    :param db_path: Path to SQLite database file
+    :param project_id: Only this project (default: all)
+    """
+    from calendar_sync import CalendarSync
+
+    calendar_sync = CalendarSync()
+    if not calendar_sync.authenticate():
+        print("Authentication failed")
+        return
+
+    with Database(db_path) as db:
+        queued = db.queue_calendar_backfill(project_id)
+        print(f"Queued {queued} session(s) for calendar sync")
+
+        worker = CalendarSyncWorker(db, calendar_sync)
+        while worker.run_once():
+            pass
+
+        print(f"{db.get_pending_calendar_sync_count()} session(s) still pending (will retry next run)")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sync tracked sessions to Google Calendar')
+    parser.add_argument('--project', type=int, help='Only backfill this project ID')
+    args = parser.parse_args()
+
+    backfill(project_id=args.project)
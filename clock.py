@@ -0,0 +1,137 @@
+"""
+Session clock: durations from time.monotonic_ns(), wall time from a UTC anchor
+
+datetime.now() jumps with DST changes, NTP corrections and the user changing the
+clock, so subtracting two of them isn't always how long something took.
+SessionClock reads the wall clock once (the anchor) and works out every later
+timestamp as anchor + monotonic time since then. Two timestamps from the same
+anchor are exactly their monotonic distance apart, whatever the wall clock did.
+
+Timestamps are timezone-aware (local zone), so they subtract correctly across DST
+and .timestamp() gives the right epoch for the database.
+
+Linux/macOS monotonic time stops while the machine sleeps, so after a resume the
+anchored time falls behind the wall clock. check() notices that (or a clock
+change bigger than step_threshold), re-anchors and reports the jump, so the
+tracker can close the session where the machine went to sleep.
+
+On Windows monotonic time (QPC) keeps counting through sleep, so nothing drifts.
+There a resume shows up as a long gap between two check() calls instead: the
+tracker checks every couple of seconds while it runs, so more than suspend_gap
+without one means the process wasn't running, and the jump starts at the last check.
+"""
+
+import time
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+NS_PER_SECOND = 1_000_000_000
+
+# before: anchored time just before the jump was noticed (old anchor)
+# after: the same moment on the wall clock (new anchor)
+# seconds: after - before (> 0 suspend or clock set forward, < 0 clock set back)
+ClockJump = namedtuple('ClockJump', ['before', 'after', 'seconds'])
+
+
+class SessionClock:
+    """
+    Monotonic clock anchored to UTC wall time (see module docstring)
+    """
+    def __init__(self, wall_ns=time.time_ns, monotonic_ns=time.monotonic_ns, step_threshold=2.0, suspend_gap=60.0):
+        """
+        :param wall_ns: Wall clock, epoch nanoseconds
+        :param monotonic_ns: Monotonic clock, nanoseconds
+        :param step_threshold: Seconds the anchored time can drift from the wall clock before check() re-anchors
+        :param suspend_gap: Seconds between two check() calls that count as a suspend (None = drift only)
+        """
+        self._wall_ns = wall_ns
+        self._monotonic_ns = monotonic_ns
+        self.step_threshold = step_threshold
+        self.suspend_gap = suspend_gap
+        self.jumps = 0
+        self._lock = threading.Lock()
+        self._last_check = None # monotonic ns of the last check(), None = none since anchor()
+        self.anchor()
+
+    def anchor(self):
+        """Re-read the wall clock (start of a tracking session)"""
+        with self._lock:
+            self._anchor = self._read_anchor()
+            self._last_check = None
+
+    def _read_anchor(self):
+        # (UTC datetime, wall ns, monotonic ns) taken together, swapped as one tuple so readers never see half of it
+        mono = self._monotonic_ns()
+        wall = self._wall_ns()
+        anchor_time = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=wall // 1000)
+        return anchor_time, wall, mono
+
+    @property
+    def anchored_at(self):
+        """UTC wall time of the current anchor"""
+        return self._anchor[0]
+
+    def monotonic_ns(self):
+        """Raw monotonic reading, for elapsed()"""
+        return self._monotonic_ns()
+
+    def at(self, monotonic_ns):
+        """
+        Wall time of a monotonic reading
+        :return: Aware datetime in the local timezone
+        """
+        anchor_time, _, anchor_mono = self._anchor
+        return (anchor_time + timedelta(microseconds=(monotonic_ns - anchor_mono) // 1000)).astimezone()
+
+    def now(self):
+        """Current time from the anchor (aware, local timezone)"""
+        return self.at(self._monotonic_ns())
+
+    def elapsed(self, since_ns):
+        """Seconds since a monotonic_ns() reading"""
+        return (self._monotonic_ns() - since_ns) / NS_PER_SECOND
+
+    def check(self):
+        """
+        Compare the anchored time with the wall clock, re-anchor if they drifted apart
+        or if it's been longer than suspend_gap since the last check (sleep on Windows)
+        Call regularly (the tracker does on every update)
+
+        :return: ClockJump, or None if the anchor still holds
+        """
+        with self._lock:
+            _, anchor_wall, anchor_mono = self._anchor
+            mono = self._monotonic_ns()
+            last_check, self._last_check = self._last_check, mono
+            drift_ns = self._wall_ns() - (anchor_wall + mono - anchor_mono)
+            slept = (self.suspend_gap is not None and last_check is not None
+                     and mono - last_check > self.suspend_gap * NS_PER_SECOND)
+            if abs(drift_ns) < self.step_threshold * NS_PER_SECOND and not slept:
+                return None
+
+            # asleep since the last check (Windows), or since the monotonic clock stopped (drift)
+            before = self.at(last_check if slept else mono)
+            self._anchor = self._read_anchor()
+            self.jumps += 1
+            after = self.now()
+        return ClockJump(before, after, (after - before).total_seconds())
+
+
+def aware(value):
+    """
+    Naive datetime (local time) -> aware in the local timezone, aware ones are returned as they are
+    Sources and trackers only hand aware timestamps around, so they compare with SessionClock's
+    """
+    if value is not None and value.tzinfo is None:
+        return value.astimezone()
+    return value
+
+
+_default_clock = SessionClock()
+
+def default_clock():
+    """
+    Clock shared by the window sources and trackers in this process
+    """
+    return _default_clock
@@ -4,6 +4,9 @@ Configuration file for settings
 
 import json
 import os
+import tempfile
+import threading
+import time
 
 CONFIG_FILE = 'tracker_settings.json'
 
@@ -13,39 +16,149 @@ DEFAULT_SETTINGS = {
     'theme': 'default'
 }
 
+class Settings:
+    """
+    Settings file cached in memory
+    Re-read only when the file's mtime changes (checked at most every check_interval seconds)
+    """
+    def __init__(self, path=CONFIG_FILE, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._data = None
+        self._mtime = None
+        self._last_check = 0.0
+        self._tzinfo = None
+
+    def _file_mtime(self):
+        """mtime of the settings file, None if it doesn't exist"""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self):
+        """Parse the settings file, defaults if missing or broken"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                return DEFAULT_SETTINGS.copy()
+        return DEFAULT_SETTINGS.copy()
+
+    def _ensure_loaded(self):
+        """Load on first use, reload if the file changed on disk"""
+        now = time.monotonic()
+        if self._data is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        mtime = self._file_mtime()
+        if self._data is None or mtime != self._mtime:
+            self._data = self._read()
+            self._mtime = mtime
+            self._tzinfo = None
+
+    def invalidate(self):
+        """Forget cached values, next access re-reads the file"""
+        with self._lock:
+            self._data = None
+            self._tzinfo = None
+
+    def all(self):
+        """Copy of all settings"""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._data)
+
+    def get(self, key, default=None):
+        """Get one setting"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._data.get(key, default)
+
+    def set(self, key, value):
+        """Update one setting and save"""
+        with self._lock:
+            settings = self.all()
+            settings[key] = value
+            self.save(settings)
+
+    def save(self, settings):
+        """Save all settings (temp file + rename, so a crash never leaves half a file)"""
+        with self._lock:
+            folder = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.settings-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(settings, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            self._data = dict(settings)
+            self._mtime = self._file_mtime()
+            self._last_check = time.monotonic()
+            self._tzinfo = None
+
+    def tzinfo(self):
+        """Configured timezone as a pytz zone (built once per timezone change)"""
+        with self._lock:
+            self._ensure_loaded()
+            if self._tzinfo is None:
+                import pytz
+                self._tzinfo = pytz.timezone(self._data.get('timezone', DEFAULT_SETTINGS['timezone']))
+            return self._tzinfo
+
+# Shared instance used by the functions below
+_settings = Settings()
+
 def load_settings():
     """Load settings from file, or create default if doesn't exist"""
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return DEFAULT_SETTINGS.copy()
-    return DEFAULT_SETTINGS.copy()
+    return _settings.all()
 
 def save_settings(settings):
     """Save settings to file"""
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(settings, f, indent=4)
+    _settings.save(settings)
 
 def get_timezone():
     """Get current timezone setting"""
-    settings = load_settings()
-    return settings.get('timezone', 'America/Los_Angeles')
+    return _settings.get('timezone', 'America/Los_Angeles')
+
+def get_tzinfo():
+    """Get current timezone as a tzinfo (cached)"""
+    return _settings.tzinfo()
 
 def set_timezone(timezone):
     """Update timezone setting"""
-    settings = load_settings()
-    settings['timezone'] = timezone
-    save_settings(settings)
+    _settings.set('timezone', timezone)
+
+def get_exe_search_roots():
+    """Folders searched for app executables (None = built-in list)"""
+    return _settings.get('exe_search_roots')
+
+def get_service_port():
+    """Local port the tracker service listens on"""
+    return _settings.get('service_port', 47291)
+
+def get_user_data_dir():
+    """Per-user folder for private files (%LOCALAPPDATA%\\TimeTracker on Windows)"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'TimeTracker')
+
+def get_service_token_path():
+    """File with the secret clients send to the tracker service (readable by this user only)"""
+    return _settings.get('service_token_file') or os.path.join(get_user_data_dir(), 'service.token')
 
 def get_theme():
     """Get current theme setting"""
-    settings = load_settings()
-    return settings.get('theme', 'default')
+    return _settings.get('theme', 'default')
 
 def set_theme(theme):
     """Update theme setting"""
-    settings = load_settings()
-    settings['theme'] = theme
-    save_settings(settings)
\ No newline at end of file
+    _settings.set('theme', theme)
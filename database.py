@@ -1,33 +1,207 @@
+import bisect
+import contextlib
+import logging
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 
+# Bump this + add a matching _migrate_vN method when the schema changes
+# Stored in the database file with PRAGMA user_version
+SCHEMA_VERSION = 9
+
+# Periods get_time_by_period can split a range into
+PERIODS = ('day', 'week')
+
+def _to_datetime(value):
+    """
+    Convert a stored TIMESTAMP back to datetime (sqlite3 hands them back as text)
+    
+    :param value: datetime, ISO string or None
+    """
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+def _to_epoch(value) -> int:
+    """
+    Local datetime (or date / ISO string) -> integer epoch seconds
+    
+    :param value: datetime, date or ISO string
+    """
+    value = _to_datetime(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return int(value.timestamp())
+
+def _to_epoch_us(value) -> Optional[int]:
+    """
+    Local datetime (or date / ISO string) -> integer epoch microseconds, as stored in start_us/end_us
+    Exact: whole seconds from the OS, microseconds added as an int (no float rounding)
+    
+    :param value: datetime, date, ISO string or None
+    """
+    if value is None:
+        return None
+    value = _to_datetime(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return _to_epoch(value.replace(microsecond=0)) * 1_000_000 + value.microsecond
+
+def _from_epoch_us(value: Optional[int]) -> Optional[datetime]:
+    """
+    Stored epoch microseconds -> local datetime
+    
+    :param value: Epoch microseconds or None
+    """
+    if value is None:
+        return None
+    seconds, micros = divmod(value, 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micros)
+
+def _session_end_us(start_us: int, duration: float) -> int:
+    """
+    end_us of a session = start + duration (rounded like SQLite's ROUND), so edited sessions end where they're shown
+    """
+    return start_us + int(duration * 1_000_000 + 0.5)
+
+def _period_starts(start: datetime, end: datetime, period: str) -> List[datetime]:
+    """
+    Local midnights (day) or Monday midnights (week) from the period containing start up to end
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {PERIODS}, not {period!r}")
+
+    first = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    step = timedelta(days=1)
+    if period == 'week':
+        first -= timedelta(days=first.weekday())
+        step = timedelta(weeks=1)
+
+    starts = []
+    current = first
+    while current < end:
+        starts.append(current)
+        current += step
+    return starts
+
+def apply_session_to_project_time(time_data: Dict, app_name: str, duration: float) -> Dict:
+    """
+    Add one saved session to a get_project_time() result in place
+    Same result as re-querying, without touching the database
+    
+    :param time_data: Dict from get_project_time
+    :param app_name: App the session was in
+    :param duration: Session length in seconds
+    :return: time_data
+    """
+    breakdown = time_data['app_breakdown']
+    for app in breakdown:
+        if app['app_name'] == app_name:
+            app['duration'] += duration
+            break
+    else:
+        breakdown.append({'app_name': app_name, 'duration': duration})
+
+    # keep get_project_time's order (longest first)
+    breakdown.sort(key=lambda app: app['duration'], reverse=True)
+    time_data['total_seconds'] += duration
+    time_data['total_hours'] = time_data['total_seconds'] / 3600
+    return time_data
+
 class Database:
     """
     Database operations for time tracker
     """
-    def __init__(self, db_path='time_tracker.db'):
+    def __init__(self, db_path='time_tracker.db', batch_size=50, flush_interval=30.0, max_idle_readers=4):
         """
         Init database connection + make table if doesn't exist
         
         :param self: -
         :param db_path: path to SQLite database file
+        :param batch_size: flush queued sessions once this many are waiting (1 = write straight away)
+        :param flush_interval: flush queued sessions once the oldest has waited this many seconds
+        :param max_idle_readers: read-only connections kept open between reads (more are opened as needed, then closed)
         """
         self.db_path = db_path
         self.conn = None
         self.cursor = None
+
+        # Write-behind queue for time sessions
+        # one commit (= one disk sync) per batch instead of per session
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending_sessions = []
+        self._oldest_pending = None # time.monotonic() of first queued row
+        self._lock = threading.RLock() # guards the writer connection + queue (tracking thread queues, GUI thread flushes)
+        self._app_ids = {}    # app name -> apps.id
+
+        # Reads check out a read-only connection from a small pool (see _reader())
+        self.max_idle_readers = max(0, max_idle_readers)
+        self._idle_readers = []
+        self._readers_lock = threading.Lock() # guards _idle_readers
+        self._trace = None
         self._connect()
         self._create_tables()
+        self._migrate()
+        self._load_app_ids()
 
     def _connect(self):
         """
-        Establish database connection
+        Establish the writer connection
+        All writes go through this one connection, under self._lock
         
         :param self: -
         """
         self.conn = sqlite3.connect(self.db_path, check_same_thread = False)
         self.conn.row_factory = sqlite3.Row # allow access columns by name instead of row[0]
         self.cursor = self.conn.cursor()
+        # WAL: readers see the last commit while a write is in progress, and don't block it
+        # NORMAL only syncs at checkpoints, a power cut can lose the last few commits but never corrupts
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+
+    @contextlib.contextmanager
+    def _reader(self):
+        """
+        Check out a read-only connection for the with block, it goes back to the pool after
+        Never shares a cursor or a lock with the writer. Only max_idle_readers stay open,
+        so threads coming and going (GUI workers, service clients) don't pile up connections + fds
+        
+        :param self: -
+        """
+        with self._readers_lock:
+            conn = self._idle_readers.pop() if self._idle_readers else None
+        if conn is None:
+            # check_same_thread off, the next checkout may be on another thread (never two at once)
+            conn = sqlite3.connect(self.db_path, check_same_thread = False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA query_only = ON')
+        conn.set_trace_callback(self._trace)
+
+        try:
+            yield conn
+        finally:
+            with self._readers_lock:
+                # closed database, or the pool's full
+                keep = self.conn is not None and len(self._idle_readers) < self.max_idle_readers
+                if keep:
+                    self._idle_readers.append(conn)
+            if not keep:
+                conn.close()
+
+    def set_trace_callback(self, callback):
+        """
+        Call callback with every SQL statement run, on the writer and all readers (None = stop)
+        
+        :param self: -
+        :param callback: Function taking the SQL text
+        """
+        self._trace = callback
+        with self._lock:
+            self.conn.set_trace_callback(callback)
+        # readers pick it up when they're checked out
 
     def _create_tables(self):
         """
@@ -65,6 +239,324 @@ class Database:
 
         self.conn.commit()
 
+    def _migrate(self):
+        """
+        Bring an existing database up to SCHEMA_VERSION
+        Each step runs in its own transaction together with the version bump,
+        so a crash mid-migration leaves the file on the previous version
+        
+        :param self: -
+        """
+        current = self.cursor.execute('PRAGMA user_version').fetchone()[0]
+
+        for version in range(current + 1, SCHEMA_VERSION + 1):
+            self.cursor.execute('BEGIN')
+            try:
+                getattr(self, f'_migrate_v{version}')()
+                # PRAGMA can't use ? placeholders, version is our own int
+                self.cursor.execute(f'PRAGMA user_version = {int(version)}')
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+    def _migrate_v1(self):
+        """
+        Covering indexes for the session aggregates
+        (project_id, app_name, duration) answers SUM/GROUP BY per project without touching the table
+        (start_time) for date range lookups
+        
+        :param self: -
+        """
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_time_sessions_project_app
+            ON time_sessions (project_id, app_name, duration)
+        ''')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_time_sessions_start_time
+            ON time_sessions (start_time)
+        ''')
+
+    def _migrate_v2(self):
+        """
+        Rollup table with running totals per project + app
+        Kept up to date by flush() and update_app_time_for_project(), so reports
+        read one row per app instead of summing every session
+        Sessions without a project (project_id NULL) have no project to total up, they're left out
+        
+        :param self: -
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS project_app_totals (
+                project_id INTEGER NOT NULL,
+                app_name TEXT NOT NULL,
+                total_duration REAL NOT NULL DEFAULT 0,
+                session_count INTEGER NOT NULL DEFAULT 0,
+                last_end_time TIMESTAMP,
+                PRIMARY KEY (project_id, app_name),
+                FOREIGN KEY (project_id) REFERENCES projects (id)
+            )
+        ''')
+        # schema at this version: app names/timestamps still in time_sessions
+        self.cursor.execute('''
+            INSERT INTO project_app_totals (project_id, app_name, total_duration, session_count, last_end_time)
+            SELECT project_id, app_name, SUM(duration), COUNT(*), MAX(end_time)
+            FROM time_sessions
+            WHERE project_id IS NOT NULL
+            GROUP BY project_id, app_name
+        ''')
+
+    def _migrate_v3(self):
+        """
+        Outbox of sessions waiting to be pushed to Google Calendar
+        A row here = sync pending; the worker deletes it once the event exists
+        
+        :param self: -
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS calendar_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NOT NULL,
+                action TEXT NOT NULL DEFAULT 'create',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                FOREIGN KEY (session_id) REFERENCES time_sessions (id)
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_calendar_outbox_due
+            ON calendar_outbox (next_attempt_at)
+        ''')
+
+    def _migrate_v4(self):
+        """
+        Remember each calendar event's ETag so edits can be sent as conditional patches
+        
+        :param self: -
+        """
+        if not self._has_column('time_sessions', 'calendar_etag'):
+            self.cursor.execute('ALTER TABLE time_sessions ADD COLUMN calendar_etag TEXT')
+
+    def _migrate_v5(self):
+        """
+        Integer epoch seconds next to the TIMESTAMP text, for date range queries
+        start_ts = start_time, end_ts = start_ts + duration (where an edited session really ends)
+        (project_id, start_ts, ...) covers the range aggregates, (start_ts, ...) the all-project ones
+        
+        :param self: -
+        """
+        for column in ('start_ts', 'end_ts'):
+            if not self._has_column('time_sessions', column):
+                self.cursor.execute(f'ALTER TABLE time_sessions ADD COLUMN {column} INTEGER')
+
+        # stored times are local, 'utc' converts them like datetime.timestamp() does
+        self.cursor.execute('''
+            UPDATE time_sessions
+            SET start_ts = CAST(strftime('%s', start_time, 'utc') AS INTEGER),
+                end_ts = CAST(strftime('%s', start_time, 'utc') AS INTEGER) + CAST(ROUND(duration) AS INTEGER)
+        ''')
+
+        # text range index replaced by the integer ones
+        self.cursor.execute('DROP INDEX IF EXISTS idx_time_sessions_start_time')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_time_sessions_project_range
+            ON time_sessions (project_id, start_ts, end_ts, app_name, duration)
+        ''')
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_time_sessions_range
+            ON time_sessions (start_ts, end_ts, app_name, duration)
+        ''')
+
+    def _migrate_v6(self):
+        """
+        Compact sessions: app names move to an apps dictionary table (time_sessions keeps an integer app_id)
+        and times become integer epoch microseconds (start_us, end_us = start + duration)
+        time_sessions + project_app_totals are rebuilt in place (SQLite can't change column types),
+        row ids are kept so calendar_outbox still points at the right sessions
+        
+        :param self: -
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS apps (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        self.cursor.execute('''
+            INSERT OR IGNORE INTO apps (name)
+            SELECT app_name FROM time_sessions GROUP BY app_name ORDER BY MIN(id)
+        ''')
+
+        # TIMESTAMP text -> microseconds with the same conversion new sessions use
+        self.conn.create_function('epoch_us', 1, _to_epoch_us, deterministic=True)
+        self.cursor.execute('''
+            CREATE TABLE time_sessions_v6 (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id INTEGER,
+                app_id INTEGER NOT NULL,
+                start_us INTEGER NOT NULL,
+                end_us INTEGER NOT NULL,
+                duration REAL NOT NULL,
+                calendar_event_id TEXT,
+                calendar_etag TEXT,
+                FOREIGN KEY (project_id) REFERENCES projects (id),
+                FOREIGN KEY (app_id) REFERENCES apps (id)
+            )
+        ''')
+        self.cursor.execute('''
+            INSERT INTO time_sessions_v6
+                (id, project_id, app_id, start_us, end_us, duration, calendar_event_id, calendar_etag)
+            SELECT s.id, s.project_id, a.id, epoch_us(s.start_time),
+                   epoch_us(s.start_time) + CAST(ROUND(s.duration * 1000000) AS INTEGER),
+                   s.duration, s.calendar_event_id, s.calendar_etag
+            FROM time_sessions s
+            JOIN apps a ON a.name = s.app_name
+        ''')
+        # drops the old indexes with it
+        self.cursor.execute('DROP TABLE time_sessions')
+        self.cursor.execute('ALTER TABLE time_sessions_v6 RENAME TO time_sessions')
+
+        self.cursor.execute('''
+            CREATE INDEX idx_time_sessions_project_app
+            ON time_sessions (project_id, app_id, duration)
+        ''')
+        self.cursor.execute('''
+            CREATE INDEX idx_time_sessions_project_range
+            ON time_sessions (project_id, start_us, end_us, app_id, duration)
+        ''')
+        self.cursor.execute('''
+            CREATE INDEX idx_time_sessions_range
+            ON time_sessions (start_us, end_us, app_id, duration)
+        ''')
+
+        self.cursor.execute('DROP TABLE project_app_totals')
+        self.cursor.execute('''
+            CREATE TABLE project_app_totals (
+                project_id INTEGER NOT NULL,
+                app_id INTEGER NOT NULL,
+                total_duration REAL NOT NULL DEFAULT 0,
+                session_count INTEGER NOT NULL DEFAULT 0,
+                last_end_us INTEGER,
+                PRIMARY KEY (project_id, app_id),
+                FOREIGN KEY (project_id) REFERENCES projects (id),
+                FOREIGN KEY (app_id) REFERENCES apps (id)
+            )
+        ''')
+        self._fill_rollups()
+
+    def _migrate_v7(self):
+        """
+        Index on session length, so the longest session (lower bound for range queries)
+        is a single index seek instead of a cached value that misses other processes' writes
+        
+        :param self: -
+        """
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_time_sessions_span
+            ON time_sessions ((end_us - start_us))
+        ''')
+
+    def _migrate_v8(self):
+        """
+        Dead-letter table for queued sessions that can't be inserted (see flush())
+        Columns are untyped and hold the values as queued, so a bad row always fits and can be fixed up by hand
+        
+        :param self: -
+        """
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS failed_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id,
+                app_name,
+                start_time,
+                end_time,
+                duration,
+                calendar_event_id,
+                error TEXT,
+                failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+    def _migrate_v9(self):
+        """
+        Version on outbox rows, bumped when the session changes again while its row is waiting
+        The worker only deletes the row if the version is the one it sent, so an edit made while
+        a push was in flight still gets pushed
+        
+        :param self: -
+        """
+        if not self._has_column('calendar_outbox', 'version'):
+            self.cursor.execute('ALTER TABLE calendar_outbox ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+    def _has_column(self, table: str, column: str) -> bool:
+        """
+        Check if a table already has a column (ALTER TABLE ADD COLUMN isn't IF NOT EXISTS)
+        
+        :param self: -
+        :param table: Table name (our own, never user input)
+        :param column: Column name
+        """
+        rows = self.cursor.execute(f'PRAGMA table_info({table})').fetchall()
+        return any(row['name'] == column for row in rows)
+
+    def _fill_rollups(self):
+        """
+        Recompute project_app_totals from time_sessions (no commit, caller owns the transaction)
+        
+        :param self: -
+        """
+        self.cursor.execute('DELETE FROM project_app_totals')
+        self.cursor.execute('''
+            INSERT INTO project_app_totals (project_id, app_id, total_duration, session_count, last_end_us)
+            SELECT project_id, app_id, SUM(duration), COUNT(*), MAX(end_us)
+            FROM time_sessions
+            WHERE project_id IS NOT NULL
+            GROUP BY project_id, app_id
+        ''')
+
+    def _get_app_id(self, name: str) -> int:
+        """
+        apps.id for an app name, added to the apps table the first time it's seen
+        (no commit, runs inside the caller's transaction)
+        
+        :param self: -
+        :param name: Application name
+        """
+        app_id = self._app_ids.get(name)
+        if app_id is None:
+            self.cursor.execute('INSERT OR IGNORE INTO apps (name) VALUES (?)', (name,))
+            if self.cursor.rowcount:
+                app_id = self.cursor.lastrowid
+            else:
+                # added by another connection since we loaded the apps
+                app_id = self.cursor.execute('SELECT id FROM apps WHERE name = ?', (name,)).fetchone()[0]
+            self._app_ids[name] = app_id
+        return app_id
+
+    def _load_app_ids(self):
+        """
+        Cache the whole apps table (one row per app ever tracked, small)
+        
+        :param self: -
+        """
+        rows = self.conn.execute('SELECT name, id FROM apps').fetchall()
+        self._app_ids = {row['name']: row['id'] for row in rows}
+
+    def _find_app_id(self, name: str) -> Optional[int]:
+        """
+        apps.id for an app name, None if it was never tracked
+        
+        :param self: -
+        :param name: Application name
+        """
+        app_id = self._app_ids.get(name)
+        if app_id is None:
+            rows = self._read('SELECT id FROM apps WHERE name = ?', (name,))
+            if rows:
+                app_id = self._app_ids[name] = rows[0][0]
+        return app_id
+
     def create_project(self, name: str, status: str = 'WIP') -> int:
         """
         Create a new proj
@@ -77,12 +569,13 @@ class Database:
         :return: Proj ID
 
         """
-        self.cursor.execute(
-            'INSERT INTO projects (name, status) VALUES (?, ?)',
-            (name, status)
-        )
-        self.conn.commit()
-        return self.cursor.lastrowid
+        with self._lock:
+            self.cursor.execute(
+                'INSERT INTO projects (name, status) VALUES (?, ?)',
+                (name, status)
+            )
+            self.conn.commit()
+            return self.cursor.lastrowid
     
     def get_all_projects(self) -> List[Dict]:
         """
@@ -92,10 +585,48 @@ class Database:
         :return: List of projecct dictionaries
 
         """
-        self.cursor.execute('SELECT * FROM projects ORDER by updated_at DESC')
-        rows = self.cursor.fetchall()
+        rows = self._read('SELECT * FROM projects ORDER by updated_at DESC')
         return [dict(row) for row in rows]
     
+    def get_project_summaries(self) -> List[Dict]:
+        """
+        Get all projs with their time totals in one query (for project lists/dashboards)
+        
+        :param self: -
+        :return: List of project dictionaries, each also has
+                 total_seconds, session_count, last_activity (or None) and top_app (or None)
+
+        """
+        # include sessions still waiting in the write-behind queue
+        self.flush()
+
+        # rollup rows are joined for the totals and searched for each project's top app
+        rows = self._read(
+            '''
+            SELECT p.*,
+                   COALESCE(SUM(t.total_duration), 0) AS total_seconds,
+                   COALESCE(SUM(t.session_count), 0) AS session_count,
+                   MAX(t.last_end_us) AS last_activity,
+                   (SELECT a.name FROM project_app_totals top
+                    JOIN apps a ON a.id = top.app_id
+                    WHERE top.project_id = p.id
+                    ORDER BY top.total_duration DESC
+                    LIMIT 1) AS top_app
+            FROM projects p
+            LEFT JOIN project_app_totals t ON t.project_id = p.id
+            GROUP BY p.id
+            ORDER BY p.updated_at DESC
+            '''
+        )
+        summaries = []
+        for row in rows:
+            summary = dict(row)
+            # same text a TIMESTAMP column gives back
+            last_activity = _from_epoch_us(summary['last_activity'])
+            summary['last_activity'] = str(last_activity) if last_activity else None
+            summaries.append(summary)
+        return summaries
+    
     def get_project(self, project_id: int) -> Optional[Dict]:
         """
         Get a specific proj by ID
@@ -106,9 +637,8 @@ class Database:
         :return: Proj Dictionary or None if not found
 
         """
-        self.cursor.execute('SELECT * FROM projects WHERE id = ?', (project_id,))
-        row = self.cursor.fetchone()
-        return dict(row) if row else None
+        rows = self._read('SELECT * FROM projects WHERE id = ?', (project_id,))
+        return dict(rows[0]) if rows else None
     
     def update_project_status(self, project_id: int, status: str):
         """
@@ -120,11 +650,12 @@ class Database:
         :param status: New status
 
         """
-        self.cursor.execute(
-            'UPDATE projects SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-            (status, project_id)
-        )
-        self.conn.commit()
+        with self._lock:
+            self.cursor.execute(
+                'UPDATE projects SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (status, project_id)
+            )
+            self.conn.commit()
 
     def update_project_name(self, project_id: int, name: str):
         """
@@ -134,15 +665,17 @@ class Database:
         :param project_id: Project ID
         :param name: New project name
         """
-        self.cursor.execute(
-            'UPDATE projects SET name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-            (name, project_id)
-        )
-        self.conn.commit()
+        with self._lock:
+            self.cursor.execute(
+                'UPDATE projects SET name = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                (name, project_id)
+            )
+            self.conn.commit()
 
-    def add_time_session(self, project_id: int, app_name: str, start_time: datetime, end_time: datetime, duration: float, calendar_event_id: str = None):
+    def add_time_session(self, project_id: int, app_name: str, start_time: datetime, end_time: datetime, duration: float, calendar_event_id: str = None, sync_calendar: bool = False):
         """
         Add a time session to a proj
+        Session is queued and written with the next batch (see flush())
         
         :param self: -
         :param project_id: Proj ID
@@ -151,25 +684,190 @@ class Database:
 
         :param start_time: Session start time
 
-        :param end_time: Session end time
+        :param end_time: Session end time (stored as start + duration)
 
         :param duration: Duration in seconds
 
         :param calendar_event_id: Google calendar event ID (not req)
 
+        :param sync_calendar: Also queue the session in calendar_outbox for the background calendar sync
+
         """
-        self.cursor.execute(
-            '''
-            INSERT INTO time_sessions (project_id, app_name, start_time, end_time, duration, calendar_event_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''',
-            (project_id, app_name, start_time, end_time, duration, calendar_event_id)
+        with self._lock:
+            if not self._pending_sessions:
+                self._oldest_pending = time.monotonic()
+            self._pending_sessions.append(
+                (project_id, app_name, start_time, end_time, duration, calendar_event_id, sync_calendar)
+            )
+
+            if len(self._pending_sessions) >= self.batch_size:
+                self.flush()
+            else:
+                self.flush_if_due()
+
+    def flush_if_due(self):
+        """
+        Flush queued sessions if the oldest one has waited longer than flush_interval
+        Cheap to call every tracking tick
+        
+        :param self: -
+        """
+        with self._lock:
+            if self._pending_sessions and time.monotonic() - self._oldest_pending >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        """
+        Write all queued sessions in a single transaction
+        If the batch fails, rows go in one at a time and the ones that still fail are moved to failed_sessions
+        
+        :param self: -
+        :return: Number of sessions written
+        """
+        # nothing queued, don't wait on the writer lock (reads call this first)
+        if not self._pending_sessions:
+            return 0
+
+        with self._lock:
+            if not self._pending_sessions:
+                return 0
+
+            rows = self._pending_sessions
+            try:
+                self._write_sessions(rows)
+                written = rows
+            except sqlite3.OperationalError:
+                # locked, disk full... not the rows' fault, they stay queued for the next flush
+                raise
+            except Exception:
+                # one bad row mustn't hold back the rest (or every later flush), write them one by one
+                written = []
+                for index, row in enumerate(rows):
+                    try:
+                        self._write_sessions([row])
+                        written.append(row)
+                    except sqlite3.OperationalError:
+                        self._pending_sessions = rows[index:]
+                        raise
+                    except Exception as e:
+                        # parked, not dropped: the time's still in the db for someone to fix and re-add
+                        try:
+                            self._park_session(row, e)
+                        except sqlite3.OperationalError:
+                            self._pending_sessions = rows[index:]
+                            raise
+
+            self._pending_sessions = []
+            self._oldest_pending = None
+            return len(written)
+
+    def _write_sessions(self, rows):
+        """
+        Insert queued session rows in one transaction (all or none)
+        
+        :param self: -
+        :param rows: Tuples as queued by add_time_session
+        """
+        totals = []
+        # "with conn" commits on success, rolls back on error
+        # sessions + rollup totals go in the same transaction so they can't drift apart
+        try:
+            with self.conn:
+                for project_id, app_name, start_time, _, duration, calendar_event_id, sync_calendar in rows:
+                    app_id = self._get_app_id(app_name)
+                    start_us = _to_epoch_us(start_time)
+                    end_us = _session_end_us(start_us, duration)
+                    self.cursor.execute(
+                        '''
+                        INSERT INTO time_sessions (project_id, app_id, start_us, end_us, duration, calendar_event_id)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ''',
+                        (project_id, app_id, start_us, end_us, duration, calendar_event_id)
+                    )
+                    # need the new session id, so outbox rows go in one by one
+                    if sync_calendar:
+                        self.cursor.execute(
+                            'INSERT INTO calendar_outbox (session_id) VALUES (?)',
+                            (self.cursor.lastrowid,)
+                        )
+                    # sessions without a project aren't in any project's totals
+                    if project_id is not None:
+                        totals.append((project_id, app_id, duration, end_us))
+                self.cursor.executemany(
+                    '''
+                    INSERT INTO project_app_totals (project_id, app_id, total_duration, session_count, last_end_us)
+                    VALUES (?, ?, ?, 1, ?)
+                    ON CONFLICT (project_id, app_id) DO UPDATE SET
+                        total_duration = total_duration + excluded.total_duration,
+                        session_count = session_count + 1,
+                        last_end_us = MAX(COALESCE(last_end_us, excluded.last_end_us), excluded.last_end_us)
+                    ''',
+                    totals
+                )
+        except Exception:
+            # app ids handed out in the rolled back transaction don't exist
+            self._app_ids = {}
+            raise
+
+    def _park_session(self, row, error):
+        """
+        Save a queued session that can't be inserted to failed_sessions (own transaction)
+        
+        :param self: -
+        :param row: Tuple as queued by add_time_session
+        :param error: Why the insert failed
+        """
+        # whatever got queued, as something sqlite can store
+        values = [value if value is None or isinstance(value, (int, float, str)) else str(value) for value in row[:6]]
+        with self.conn:
+            self.cursor.execute(
+                '''
+                INSERT INTO failed_sessions (project_id, app_name, start_time, end_time, duration, calendar_event_id, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                values + [str(error)]
+            )
+        logging.error(f"Session couldn't be saved, moved to failed_sessions ({error}): {row}")
+
+    def get_failed_sessions(self) -> List[Dict]:
+        """
+        Sessions flush() couldn't insert, oldest first
+        
+        :param self: -
+        :return: List of dicts (the values as queued + error, failed_at)
+        """
+        self.flush()
+        return [dict(row) for row in self._read('SELECT * FROM failed_sessions ORDER BY id')]
+
+    def has_session(self, project_id: int, app_name: str, start_time: datetime) -> bool:
+        """
+        Whether a session of app_name starting at start_time is saved (or queued) for a proj
+        Crash recovery checks this so a session is never added twice
+
+        :param self: -
+        :param project_id: Proj ID
+        :param app_name: Application name
+        :param start_time: Session start time
+        """
+        start_us = _to_epoch_us(start_time)
+        with self._lock:
+            for session in self._pending_sessions:
+                if session[:2] == (project_id, app_name) and _to_epoch_us(session[2]) == start_us:
+                    return True
+
+        app_id = self._find_app_id(app_name)
+        if app_id is None:
+            return False
+        rows = self._read(
+            'SELECT 1 FROM time_sessions WHERE project_id = ? AND app_id = ? AND start_us = ? LIMIT 1',
+            (project_id, app_id, start_us)
         )
-        self.conn.commit()
+        return bool(rows)
 
     def get_project_time(self, project_id: int) -> Dict:
         """
         Get total time and breakdown by app for a proj
+        Reads the project_app_totals rollup (one row per app, not per session)
         
         :param self: -
         :param project_id: Proj ID
@@ -177,30 +875,25 @@ class Database:
         :return: Dictionary with total time and app breakdown
 
         """
-        # Total time
-        self.cursor.execute(
-            '''
-            SELECT SUM(duration) as total_duration
-            FROM time_sessions
-            WHERE project_id = ?
-            ''',
-            (project_id,)
-        )
-        total = self.cursor.fetchone()['total_duration'] or 0
+        # include sessions still waiting in the write-behind queue
+        self.flush()
 
         # Per app breakdown
-        self.cursor.execute(
+        rows = self._read(
             '''
-            SELECT app_name, SUM(duration) as duration
-            FROM time_sessions
-            WHERE project_id = ?
-            GROUP BY app_name
+            SELECT a.name AS app_name, t.total_duration as duration
+            FROM project_app_totals t
+            JOIN apps a ON a.id = t.app_id
+            WHERE t.project_id = ?
             ORDER BY duration DESC
             ''',
             (project_id,)
         )
 
-        app_breakdown = [dict(row) for row in self.cursor.fetchall()]
+        app_breakdown = [dict(row) for row in rows]
+
+        # Total time
+        total = sum(app['duration'] for app in app_breakdown)
 
         return {
             'total_seconds': total,
@@ -217,45 +910,491 @@ class Database:
         :param app_name: Application name
         :param new_duration: New total duration in seconds
         """
-        # Get current total for this app
-        self.cursor.execute(
-            '''
-            SELECT SUM(duration) as current_total
-            FROM time_sessions
-            WHERE project_id = ? AND app_name = ?
+        # lock held throughout so a flush can't land between reading the total and scaling it
+        with self._lock:
+            self.flush()
+
+            app_id = self._find_app_id(app_name)
+            if app_id is None:
+                return  # Never tracked
+
+            # the service and the GUI are separate connections: take the write lock before reading
+            # the total, so no other process can add sessions between reading it and scaling them
+            self.cursor.execute('BEGIN IMMEDIATE')
+            with self.conn:
+                # Get current total for this app
+                self.cursor.execute(
+                    '''
+                    SELECT total_duration as current_total
+                    FROM project_app_totals
+                    WHERE project_id = ? AND app_id = ?
+                    ''',
+                    (project_id, app_id)
+                )
+
+                result = self.cursor.fetchone()
+                current_total = result['current_total'] if result and result['current_total'] else 0
+
+                if current_total == 0:
+                    return  # Nothing to update
+
+                # Calculate scaling factor
+                scale_factor = new_duration / current_total
+
+                # Update all sessions proportionally (end_us moves with the new length)
+                self.cursor.execute(
+                    '''
+                    UPDATE time_sessions
+                    SET duration = duration * ?,
+                        end_us = start_us + CAST(ROUND(duration * ? * 1000000) AS INTEGER)
+                    WHERE project_id = ? AND app_id = ?
+                    ''',
+                    (scale_factor, scale_factor, project_id, app_id)
+                )
+
+                # Re-sync calendar events of the rescaled sessions (patched by the sync worker)
+                # rows already waiting may be in flight with the old length: bump them so they stay queued
+                self.cursor.execute(
+                    '''
+                    UPDATE calendar_outbox SET version = version + 1
+                    WHERE session_id IN (SELECT id FROM time_sessions WHERE project_id = ? AND app_id = ?)
+                    ''',
+                    (project_id, app_id)
+                )
+                self.cursor.execute(
+                    '''
+                    INSERT INTO calendar_outbox (session_id, action)
+                    SELECT s.id, 'update' FROM time_sessions s
+                    WHERE s.project_id = ? AND s.app_id = ?
+                      AND s.calendar_event_id IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM calendar_outbox o
+                          WHERE o.session_id = s.id
+                      )
+                    ORDER BY s.id
+                    ''',
+                    (project_id, app_id)
+                )
+
+                # Re-sum the scaled rows so the rollup matches them exactly, last_end_us moved with them
+                self.cursor.execute(
+                    '''
+                    UPDATE project_app_totals
+                    SET (total_duration, last_end_us) = (
+                        SELECT COALESCE(SUM(duration), 0), MAX(end_us)
+                        FROM time_sessions
+                        WHERE project_id = ? AND app_id = ?
+                    )
+                    WHERE project_id = ? AND app_id = ?
+                    ''',
+                    (project_id, app_id, project_id, app_id)
+                )
+
+    def get_time_in_range(self, project_id: Optional[int], start: datetime, end: datetime) -> Dict:
+        """
+        Total time and breakdown by app between start and end
+        Sessions sticking out of the range only count the part inside it
+        
+        :param self: -
+        :param project_id: Proj ID (None = all projects)
+        :param start: Range start (local time, included)
+        :param end: Range end (local time, excluded)
+        :return: Same format as get_project_time
+        """
+        start_us, end_us = _to_epoch_us(start), _to_epoch_us(end)
+        where, params = self._range_filter(project_id, start_us, end_us)
+
+        # whole sessions count their exact duration, clipped ones the overlap
+        rows = self._read(
+            f'''
+            SELECT a.name AS app_name, r.duration
+            FROM (
+                SELECT app_id,
+                       SUM(CASE WHEN start_us >= ? AND end_us <= ? THEN duration
+                                ELSE (MIN(end_us, ?) - MAX(start_us, ?)) / 1000000.0 END) AS duration
+                FROM time_sessions
+                WHERE {where}
+                GROUP BY app_id
+            ) r
+            JOIN apps a ON a.id = r.app_id
+            ORDER BY r.duration DESC
             ''',
-            (project_id, app_name)
+            (start_us, end_us, end_us, start_us) + params
         )
+
+        app_breakdown = [dict(row) for row in rows]
+        total = sum(app['duration'] for app in app_breakdown)
+        return {
+            'total_seconds': total,
+            'total_hours': total / 3600,
+            'app_breakdown': app_breakdown
+        }
+
+    def get_time_by_period(self, project_id: Optional[int], start: datetime, end: datetime, period: str = 'day') -> List[Dict]:
+        """
+        Time per day or week (local time) between start and end, split by app
+        Sessions crossing midnight (or Monday midnight) are split between the periods
         
-        result = self.cursor.fetchone()
-        current_total = result['current_total'] if result and result['current_total'] else 0
+        :param self: -
+        :param project_id: Proj ID (None = all projects)
+        :param start: Range start (local time, included)
+        :param end: Range end (local time, excluded)
+        :param period: 'day' or 'week' (weeks start on Monday)
+        :return: One dict per period (empty ones included), oldest first, with
+                 period_start, period_end, total_seconds and app_breakdown (same format as get_project_time)
+        """
+        start, end = _to_datetime(start), _to_datetime(end)
+        starts = _period_starts(start, end, period)
+        # first/last period cut to the requested range
+        bounds = [max(period_start, start) for period_start in starts] + [end]
+        edges = [_to_epoch_us(bound) for bound in bounds]
+
+        where, params = self._range_filter(project_id, edges[0], edges[-1])
+        rows = self._read(
+            f'''
+            SELECT a.name AS app_name, s.start_us, s.end_us, s.duration
+            FROM time_sessions s
+            JOIN apps a ON a.id = s.app_id
+            WHERE {where}
+            ''',
+            params
+        )
+
+        apps_per_period = [{} for _ in starts]
+        for app_name, session_start, session_end, duration in rows:
+            first = max(bisect.bisect_right(edges, session_start) - 1, 0)
+            for index in range(first, len(starts)):
+                lo, hi = edges[index], edges[index + 1]
+                if lo >= session_end:
+                    break
+                if session_start >= lo and session_end <= hi:
+                    seconds = duration
+                else:
+                    seconds = (min(session_end, hi) - max(session_start, lo)) / 1_000_000
+                apps = apps_per_period[index]
+                apps[app_name] = apps.get(app_name, 0) + seconds
+
+        periods = []
+        for index, apps in enumerate(apps_per_period):
+            total = sum(apps.values())
+            periods.append({
+                'period_start': bounds[index],
+                'period_end': bounds[index + 1],
+                'total_seconds': total,
+                'app_breakdown': [
+                    {'app_name': app_name, 'duration': duration}
+                    for app_name, duration in sorted(apps.items(), key=lambda item: item[1], reverse=True)
+                ]
+            })
+        return periods
+
+    def _session_filter(self, project_id: Optional[int], start: Optional[datetime], end: Optional[datetime]):
+        """
+        WHERE clause + params for iter_sessions/count_sessions (no start/end = no limit on that side)
+
+        :param self: -
+        """
+        if start is None and end is None:
+            self.flush()
+            if project_id is None:
+                return '1', ()
+            return 'project_id = ?', (project_id,)
+        start_us = _to_epoch_us(start) if start is not None else -(2 ** 62)
+        end_us = _to_epoch_us(end) if end is not None else 2 ** 62
+        return self._range_filter(project_id, start_us, end_us)
+
+    def count_sessions(self, project_id: Optional[int] = None, start: datetime = None, end: datetime = None) -> int:
+        """
+        Number of sessions iter_sessions would return
+
+        :param self: -
+        :param project_id: Proj ID (None = all projects)
+        :param start: Sessions overlapping from here (local time, included)
+        :param end: Up to here (local time, excluded)
+        """
+        where, params = self._session_filter(project_id, start, end)
+        return self._read(f'SELECT COUNT(*) FROM time_sessions WHERE {where}', params)[0][0]
+
+    def iter_sessions(self, project_id: Optional[int] = None, start: datetime = None, end: datetime = None,
+                      batch_size: int = 5000):
+        """
+        Stream raw sessions, oldest first, in fetchmany() batches
+        Only one batch is in memory at a time, however many rows there are
+        The whole iteration reads one snapshot, sessions written meanwhile aren't included
+
+        :param self: -
+        :param project_id: Proj ID (None = all projects)
+        :param start: Sessions overlapping from here (local time, included), None = from the first
+        :param end: Up to here (local time, excluded), None = to the last
+        :param batch_size: Rows fetched per batch
+        :return: Generator of lists of rows (id, project_id, project_name, app_name, start_us, end_us,
+                 duration, calendar_event_id)
+        """
+        where, params = self._session_filter(project_id, start, end)
+        # the range indexes are in start order, so this streams instead of sorting everything first
+        sql = f'''
+            SELECT s.id, s.project_id, p.name AS project_name, a.name AS app_name,
+                   s.start_us, s.end_us, s.duration, s.calendar_event_id
+            FROM time_sessions s
+            JOIN apps a ON a.id = s.app_id
+            LEFT JOIN projects p ON p.id = s.project_id
+            WHERE {where}
+            ORDER BY s.start_us
+        '''
+        # a connection of its own until the generator finishes, other reads can run while it's open
+        reader = contextlib.nullcontext(self.conn) if self.db_path == ':memory:' else self._reader()
+        with reader as conn:
+            cursor = conn.execute(sql, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+
+    def _range_filter(self, project_id: Optional[int], start_us: int, end_us: int):
+        """
+        WHERE clause + params for sessions overlapping [start_us, end_us)
+        start_us is bounded below by the longest session so the index is seeked, not scanned
+        
+        :param self: -
+        """
+        self.flush()
+        lowest_start = start_us - self._get_max_span()
+        where = 'start_us >= ? AND start_us < ? AND end_us > ?'
+        params = (lowest_start, end_us, start_us)
+        if project_id is not None:
+            where = 'project_id = ? AND ' + where
+            params = (project_id,) + params
+        return where, params
+
+    def _get_max_span(self) -> int:
+        """
+        Longest session in microseconds
+        Read every time (an index seek, see _migrate_v7), sessions saved by another process count too
         
-        if current_total == 0:
-            return  # Nothing to update
+        :param self: -
+        """
+        return self._read('SELECT MAX(end_us - start_us) FROM time_sessions')[0][0] or 0
+
+    def _read(self, sql: str, params=()) -> List[sqlite3.Row]:
+        """
+        Run a read query on a pooled reader connection
+        
+        :param self: -
+        """
+        if self.db_path == ':memory:':
+            # every connection would get its own empty database, share the writer
+            with self._lock:
+                return self.conn.execute(sql, params).fetchall()
+        with self._reader() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def rebuild_rollups(self):
+        """
+        Repair project_app_totals by recomputing it from time_sessions
+        
+        :param self: -
+        """
+        with self._lock:
+            self.flush()
+            with self.conn:
+                self._fill_rollups()
+
+    def check_rollups(self) -> List[Dict]:
+        """
+        Compare project_app_totals against the raw sessions
         
-        # Calculate scaling factor
-        scale_factor = new_duration / current_total
+        :param self: -
+        :return: List of mismatched (project_id, app_name) rows, empty if consistent
+        """
+        self.flush()
+
+        # raw totals missing/different in the rollup, plus rollup rows with no sessions behind them
+        rows = self._read(
+            '''
+            WITH raw AS (
+                SELECT project_id, app_id, SUM(duration) AS total_duration, COUNT(*) AS session_count,
+                       MAX(end_us) AS last_end_us
+                FROM time_sessions
+                WHERE project_id IS NOT NULL
+                GROUP BY project_id, app_id
+            )
+            SELECT raw.project_id, a.name AS app_name,
+                   raw.total_duration AS expected_seconds, t.total_duration AS rollup_seconds,
+                   raw.session_count AS expected_sessions, t.session_count AS rollup_sessions,
+                   raw.last_end_us AS expected_last_end_us, t.last_end_us AS rollup_last_end_us
+            FROM raw
+            JOIN apps a ON a.id = raw.app_id
+            LEFT JOIN project_app_totals t
+                ON t.project_id = raw.project_id AND t.app_id = raw.app_id
+            WHERE t.project_id IS NULL
+               OR t.session_count != raw.session_count
+               OR ABS(t.total_duration - raw.total_duration) > 0.001
+               OR t.last_end_us IS NOT raw.last_end_us
+            UNION ALL
+            SELECT t.project_id, a.name,
+                   0, t.total_duration,
+                   0, t.session_count,
+                   NULL, t.last_end_us
+            FROM project_app_totals t
+            JOIN apps a ON a.id = t.app_id
+            WHERE NOT EXISTS (
+                SELECT 1 FROM raw
+                WHERE raw.project_id = t.project_id AND raw.app_id = t.app_id
+            )
+            '''
+        )
+        return [dict(row) for row in rows]
+    
+    def get_due_calendar_syncs(self, now: float = None, limit: int = 50) -> List[Dict]:
+        """
+        Get outbox entries ready to be (re)tried, with the session data CalendarSync needs
         
-        # Update all sessions proportionally
-        self.cursor.execute(
+        :param self: -
+        :param now: Current time as epoch seconds (default: time.time())
+        :param limit: Max entries to return
+        :return: List of dicts with outbox_id, session_id, action, attempts, version, calendar_event_id,
+                 calendar_etag and session_data (same format as CalendarSync.create_event_from_session)
+        """
+        if now is None:
+            now = time.time()
+
+        rows = self._read(
             '''
-            UPDATE time_sessions
-            SET duration = duration * ?
-            WHERE project_id = ? AND app_name = ?
+            SELECT o.id AS outbox_id, o.session_id, o.action, o.attempts, o.version,
+                   a.name AS app_name, s.start_us, s.duration, s.calendar_event_id, s.calendar_etag,
+                   p.name AS project_name
+            FROM calendar_outbox o
+            JOIN time_sessions s ON s.id = o.session_id
+            JOIN apps a ON a.id = s.app_id
+            LEFT JOIN projects p ON p.id = s.project_id
+            WHERE o.next_attempt_at <= ?
+            ORDER BY o.id
+            LIMIT ?
             ''',
-            (scale_factor, project_id, app_name)
+            (now, limit)
         )
+
+        entries = []
+        for row in rows:
+            start_time = _from_epoch_us(row['start_us'])
+            entries.append({
+                'outbox_id': row['outbox_id'],
+                'session_id': row['session_id'],
+                'action': row['action'],
+                'attempts': row['attempts'],
+                'version': row['version'],
+                'calendar_event_id': row['calendar_event_id'],
+                'calendar_etag': row['calendar_etag'],
+                'session_data': {
+                    'project_name': row['project_name'],
+                    'app_name': row['app_name'],
+                    'start_time': start_time,
+                    # end from duration so edited (rescaled) sessions show their new length
+                    'end_time': start_time + timedelta(seconds=row['duration']),
+                    'duration_seconds': row['duration']
+                }
+            })
+        return entries
+
+    def complete_calendar_sync(self, outbox_id: int, session_id: int, calendar_event_id: str, calendar_etag: str = None,
+                               version: int = None):
+        """
+        Store the calendar event ID on the session and remove it from the outbox
+        If the session changed again since the entry was read (version moved on), it stays queued as an update
         
-        self.conn.commit()
-    
+        :param self: -
+        :param outbox_id: calendar_outbox row ID
+        :param session_id: time_sessions row ID
+        :param calendar_event_id: Google calendar event ID
+        :param calendar_etag: Event ETag after the change (None = next patch is unconditional)
+        :param version: Outbox row version that was pushed (None = remove whatever it is now)
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                'UPDATE time_sessions SET calendar_event_id = ?, calendar_etag = ? WHERE id = ?',
+                (calendar_event_id, calendar_etag, session_id)
+            )
+            if version is None:
+                self.conn.execute('DELETE FROM calendar_outbox WHERE id = ?', (outbox_id,))
+            else:
+                self.conn.execute('DELETE FROM calendar_outbox WHERE id = ? AND version = ?', (outbox_id, version))
+                # still there = edited mid-push, the event exists now so the newer data goes as a patch
+                self.conn.execute("UPDATE calendar_outbox SET action = 'update' WHERE id = ?", (outbox_id,))
+
+    def retry_calendar_sync(self, outbox_id: int, error: str, next_attempt_at: float):
+        """
+        Record a failed sync attempt and when to try again
+        
+        :param self: -
+        :param outbox_id: calendar_outbox row ID
+        :param error: What went wrong (for debugging)
+        :param next_attempt_at: Epoch seconds of the next attempt
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                '''
+                UPDATE calendar_outbox
+                SET attempts = attempts + 1, last_error = ?, next_attempt_at = ?
+                WHERE id = ?
+                ''',
+                (error, next_attempt_at, outbox_id)
+            )
+
+    def queue_calendar_backfill(self, project_id: int = None) -> int:
+        """
+        Queue every session without a calendar event (and not already queued) for sync
+        
+        :param self: -
+        :param project_id: Only this project (default: all)
+        :return: Number of sessions queued
+        """
+        self.flush()
+
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                '''
+                INSERT INTO calendar_outbox (session_id)
+                SELECT s.id FROM time_sessions s
+                WHERE s.calendar_event_id IS NULL
+                  AND (? IS NULL OR s.project_id = ?)
+                  AND NOT EXISTS (SELECT 1 FROM calendar_outbox o WHERE o.session_id = s.id)
+                ORDER BY s.id
+                ''',
+                (project_id, project_id)
+            )
+            return cursor.rowcount
+
+    def get_pending_calendar_sync_count(self) -> int:
+        """
+        Count sessions still waiting for calendar sync
+        
+        :param self: -
+        :return: Number of outbox entries
+        """
+        return self._read('SELECT COUNT(*) FROM calendar_outbox')[0][0]
+
     def close(self):
         """
-        Close database connection
+        Flush queued sessions + close database connections
         
         :param self: -
         """
         if self.conn:
-            self.conn.close()
+            try:
+                self.flush()
+            finally:
+                # readers still checked out close themselves when they're handed back (conn is None by then)
+                with self._readers_lock:
+                    for conn in self._idle_readers:
+                        conn.close()
+                    self._idle_readers = []
+                    # last connection out checkpoints the WAL back into the main file
+                    self.conn.close()
+                    self.conn = None
     
     # Enter and exit for context manager, ensure database connection ALWAYS closed
     def __enter__(self):
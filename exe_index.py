@@ -0,0 +1,227 @@
+"""
+Index of every .exe under a few folders: name -> full path
+Built once with one pass over the folders, saved to disk, and refreshed by
+re-listing only the folders whose mtime changed (a folder's mtime changes
+whenever something is added, removed or renamed directly inside it)
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+
+INDEX_PATH = os.path.join('icon_cache', 'exe_index.json')
+INDEX_VERSION = 1
+
+def default_roots():
+    """Folders apps usually live in (same ones find_executable_path used to walk)"""
+    return [
+        r"C:\Program Files",
+        r"C:\Program Files (x86)",
+        r"C:\Windows\System32",
+        os.path.expanduser("~\\AppData\\Local"),
+    ]
+
+class ExeIndex:
+    """
+    exe name -> path, looked up in a dict instead of walking the disk per app
+    """
+    def __init__(self, roots=None, path=INDEX_PATH, max_depth=4, extension='.exe', refresh_interval=600.0):
+        """
+        :param roots: Folders to scan, earlier ones win when names clash (default: default_roots())
+        :param path: Where the index is saved (None = memory only)
+        :param max_depth: How many folders deep below a root to look
+        :param extension: File extension to index
+        :param refresh_interval: Min seconds between refreshes triggered by lookup misses
+        """
+        self.roots = list(roots) if roots is not None else default_roots()
+        self.path = path
+        self.max_depth = max_depth
+        self.extension = extension.lower()
+        self.refresh_interval = refresh_interval
+        self._dirs = None    # folder -> [root index, depth, mtime_ns, [exe names]]
+        self._lookup = {}    # lowercase exe name -> path
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+        self.dirs_listed = 0 # folders read by the last build/refresh
+
+    def find(self, app_name):
+        """
+        Full path of an exe, or None
+        Misses trigger an incremental refresh (at most every refresh_interval seconds)
+
+        :param app_name: Application name (e.g., 'chrome.exe')
+        """
+        with self._lock:
+            self._ensure_loaded()
+            path = self._lookup.get(app_name.lower())
+            # not indexed, or uninstalled since
+            stale = path is None or not os.path.exists(path)
+            if stale and time.monotonic() - self._last_refresh >= self.refresh_interval:
+                self.refresh()
+                path = self._lookup.get(app_name.lower())
+            return path
+
+    def build(self):
+        """Scan every root from scratch"""
+        with self._lock:
+            self._dirs = {}
+            self.dirs_listed = 0
+            for root_index, root in enumerate(self.roots):
+                self._scan(root, root_index, 0)
+            self._finish()
+
+    def refresh(self):
+        """
+        Bring the index up to date, only folders whose mtime changed are listed again
+        :return: Number of folders listed
+        """
+        with self._lock:
+            if self._dirs is None:
+                self.build()
+                return self.dirs_listed
+
+            self.dirs_listed = 0
+            for folder, (root_index, depth, mtime, _) in list(self._dirs.items()):
+                if folder not in self._dirs:
+                    # removed along with a changed parent
+                    continue
+                try:
+                    current = os.stat(folder).st_mtime_ns
+                except OSError:
+                    self._forget(folder)
+                    continue
+                if current != mtime:
+                    self._scan(folder, root_index, depth, rescan=True)
+
+            # roots that didn't exist last time
+            for root_index, root in enumerate(self.roots):
+                if root not in self._dirs:
+                    self._scan(root, root_index, 0)
+
+            self._finish()
+            return self.dirs_listed
+
+    def _scan(self, folder, root_index, depth, rescan=False):
+        """List one folder, record its exes, descend into subfolders we don't know yet"""
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+            with os.scandir(folder) as entries:
+                entries = list(entries)
+        except OSError:
+            # missing root, access denied...
+            self._forget(folder)
+            return
+        self.dirs_listed += 1
+
+        exes = []
+        subfolders = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subfolders.append(entry.path)
+                elif entry.name.lower().endswith(self.extension) and entry.is_file():
+                    exes.append(entry.name)
+            except OSError:
+                continue
+        self._dirs[folder] = [root_index, depth, mtime, exes]
+
+        if rescan:
+            # subfolders that were removed or renamed away
+            prefix = os.path.join(folder, '')
+            current = set(subfolders)
+            for known in [d for d in self._dirs if d.startswith(prefix)]:
+                parent = os.path.dirname(known)
+                if parent == folder and known not in current:
+                    self._forget(known)
+
+        if depth < self.max_depth:
+            for subfolder in subfolders:
+                # known subfolders are checked by refresh() on their own mtime
+                if subfolder not in self._dirs:
+                    self._scan(subfolder, root_index, depth + 1)
+
+    def _forget(self, folder):
+        """Drop a folder and everything under it"""
+        prefix = os.path.join(folder, '')
+        for known in [d for d in self._dirs if d == folder or d.startswith(prefix)]:
+            del self._dirs[known]
+
+    def _finish(self):
+        """Rebuild the lookup dict and save"""
+        self._rebuild_lookup()
+        self._last_refresh = time.monotonic()
+        self.save()
+
+    def _rebuild_lookup(self):
+        lookup = {}
+        # earlier roots first, then shallower folders (what the old os.walk search found first)
+        for folder in sorted(self._dirs, key=lambda d: (self._dirs[d][0], self._dirs[d][1], d)):
+            for name in self._dirs[folder][3]:
+                lookup.setdefault(name.lower(), os.path.join(folder, name))
+        self._lookup = lookup
+
+    def _ensure_loaded(self):
+        """Load the saved index, or build it if there isn't a usable one"""
+        if self._dirs is not None:
+            return
+        # a loaded index isn't refreshed until a lookup misses (_last_refresh is still 0)
+        if not self.load():
+            self.build()
+
+    def load(self):
+        """
+        Read the saved index
+        :return: True if it was loaded (False if missing, broken or for other roots)
+        """
+        if not self.path:
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if (data.get('version') != INDEX_VERSION or data.get('roots') != self.roots
+                or data.get('max_depth') != self.max_depth or data.get('extension') != self.extension):
+            return False
+
+        with self._lock:
+            self._dirs = data['dirs']
+            self._rebuild_lookup()
+        return True
+
+    def save(self):
+        """Write the index (temp file + rename)"""
+        if not self.path:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'roots': self.roots,
+            'max_depth': self.max_depth,
+            'extension': self.extension,
+            'dirs': self._dirs
+        }
+        try:
+            folder = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(folder, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.exe_index-', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            # worst case we scan again next launch
+            print(f"Couldn't save exe index: {e}")
+
+# Shared index, created on first use
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_exe_index():
+    """Shared ExeIndex over the configured search roots"""
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            import config
+            _INDEX = ExeIndex(roots=config.get_exe_search_roots())
+        return _INDEX
@@ -1,13 +1,176 @@
-import win32ui
-import win32gui
-import win32con
-import win32api
-from PIL import Image
 import os
+import io
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
 
-# Cache to store icons we've already found
-_ICON_CACHE = {}
-_PATH_CACHE = {}
+# On-disk cache: resolved exe paths + extracted icons as PNG
+ICON_CACHE_DIR = 'icon_cache'
+
+# Re-search for apps we couldn't find after this long (they may have been installed since)
+NOT_FOUND_TTL = 7 * 24 * 3600
+
+class IconCache:
+    """
+    Icons + exe paths, kept in memory (bounded LRU) and on disk so a new launch
+    doesn't search the filesystem or extract icons again
+
+    Disk layout (cache_dir):
+        paths.json                          app_name -> [exe path or null, when it was looked up]
+        <hash of exe path>_<mtime>_<size>.png   icon, a new exe (mtime) = a new file
+    """
+    def __init__(self, cache_dir=ICON_CACHE_DIR, maxsize=128):
+        """
+        :param cache_dir: Folder for the on-disk cache (created when first needed)
+        :param maxsize: Max icons kept in memory (least recently used dropped first)
+        """
+        self.cache_dir = cache_dir
+        self.maxsize = maxsize
+        self._icons = OrderedDict() # (app_name, size) -> image
+        self._paths = None          # loaded from paths.json on first use
+        self._lock = threading.RLock()
+
+    def get_path(self, app_name, resolve):
+        """
+        Exe path for an app, resolve(app_name) is only called if the disk cache has no (valid) answer
+
+        :param app_name: Application name (e.g., 'chrome.exe')
+        :param resolve: Callable app_name -> path or None (the slow search)
+        :return: Full path or None
+        """
+        with self._lock:
+            paths = self._load_paths()
+            entry = paths.get(app_name)
+            if entry:
+                path, checked_at = entry
+                if path and os.path.exists(path):
+                    return path
+                if not path and time.time() - checked_at < NOT_FOUND_TTL:
+                    return None
+
+        # not cached, moved/uninstalled, or not found a while ago
+        path = resolve(app_name)
+        with self._lock:
+            self._paths[app_name] = [path, time.time()]
+            self._save_paths()
+        return path
+
+    def get_icon(self, app_name, size, resolve, extract):
+        """
+        Icon for an app: memory -> PNG on disk -> extract from the exe
+
+        :param app_name: Application name
+        :param size: Icon size in pixels
+        :param resolve: Callable app_name -> exe path or None
+        :param extract: Callable (exe_path, size) -> PIL Image or None
+        :return: PIL Image, or None if there's no icon to be had
+        """
+        key = (app_name, size)
+        with self._lock:
+            if key in self._icons:
+                self._icons.move_to_end(key)
+                return self._icons[key]
+
+        icon = None
+        exe_path = self.get_path(app_name, resolve)
+        if exe_path:
+            png_path = self._png_path(exe_path, size)
+            if png_path and os.path.exists(png_path):
+                icon = _load_png(png_path)
+            elif png_path:
+                icon = extract(exe_path, size)
+                if icon is not None:
+                    self._save_png(png_path, icon)
+
+        self._remember(key, icon)
+        return icon
+
+    def peek(self, app_name, size):
+        """Icon if it's already in memory, else None (never touches the disk)"""
+        with self._lock:
+            key = (app_name, size)
+            if key in self._icons:
+                self._icons.move_to_end(key)
+                return self._icons[key]
+            return None
+
+    def remember(self, app_name, size, icon):
+        """Keep an icon in memory (e.g. the default icon for an app without one)"""
+        self._remember((app_name, size), icon)
+
+    def _remember(self, key, icon):
+        with self._lock:
+            self._icons[key] = icon
+            self._icons.move_to_end(key)
+            while len(self._icons) > self.maxsize:
+                self._icons.popitem(last=False)
+
+    def clear_memory(self):
+        """Drop in-memory icons (disk cache stays)"""
+        with self._lock:
+            self._icons.clear()
+            self._paths = None
+
+    def _load_paths(self):
+        if self._paths is None:
+            try:
+                with open(os.path.join(self.cache_dir, 'paths.json'), 'r') as f:
+                    self._paths = json.load(f)
+            except (OSError, ValueError):
+                self._paths = {}
+        return self._paths
+
+    def _save_paths(self):
+        """Write paths.json (temp file + rename, like the settings file)"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.paths-', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._paths, f, indent=4)
+            os.replace(temp_path, os.path.join(self.cache_dir, 'paths.json'))
+        except OSError as e:
+            # cache only, worst case we search again next launch
+            print(f"Couldn't save icon path cache: {e}")
+
+    def _png_path(self, exe_path, size):
+        """Cache file for an exe's icon, None if the exe can't be stat'ed"""
+        try:
+            mtime = os.stat(exe_path).st_mtime_ns
+        except OSError:
+            return None
+        name = hashlib.sha1(os.path.normcase(exe_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{name}_{mtime}_{size}.png")
+
+    def _save_png(self, png_path, icon):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # drop icons of older versions of this exe
+            prefix, _, size_suffix = os.path.basename(png_path).split('_')
+            for old in os.listdir(self.cache_dir):
+                if old.startswith(prefix + '_') and old.endswith('_' + size_suffix) and old != os.path.basename(png_path):
+                    os.remove(os.path.join(self.cache_dir, old))
+
+            buffer = io.BytesIO()
+            icon.save(buffer, 'PNG')
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.icon-', suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(buffer.getvalue())
+            os.replace(temp_path, png_path)
+        except OSError as e:
+            print(f"Couldn't save icon {png_path}: {e}")
+
+def _load_png(png_path):
+    from PIL import Image
+
+    with Image.open(png_path) as img:
+        img.load()
+        return img.copy()
+
+# Shared cache used by get_app_icon
+_ICON_CACHE = IconCache()
 
 def get_app_icon(app_name, size=32):
     """
@@ -17,74 +180,84 @@ def get_app_icon(app_name, size=32):
     :param size: Icon size in pixels
     :return: PIL Image or None
     """
-    # Check cache first
-    cache_key = f"{app_name}_{size}"
-    if cache_key in _ICON_CACHE:
-        return _ICON_CACHE[cache_key]
-    
     try:
-        # Check if we've already found the path
-        if app_name not in _PATH_CACHE:
-            exe_path = find_executable_path(app_name)
-            _PATH_CACHE[app_name] = exe_path
-        else:
-            exe_path = _PATH_CACHE[app_name]
-        
-        if not exe_path:
-            icon = get_default_icon(size)
-            _ICON_CACHE[cache_key] = icon
-            return icon
-        
-        # Extract icon
-        ico_x = win32api.GetSystemMetrics(win32con.SM_CXICON)
-        ico_y = win32api.GetSystemMetrics(win32con.SM_CYICON)
-        
-        large, small = win32gui.ExtractIconEx(exe_path, 0)
-        
-        if not large:
+        icon = _ICON_CACHE.get_icon(app_name, size, find_executable_path, extract_icon)
+        if icon is None:
             icon = get_default_icon(size)
-            _ICON_CACHE[cache_key] = icon
-            return icon
-        
-        hicon = large[0]
-        
-        # Convert to bitmap
-        hdc = win32ui.CreateDCFromHandle(win32gui.GetDC(0))
-        hbmp = win32ui.CreateBitmap()
-        hbmp.CreateCompatibleBitmap(hdc, ico_x, ico_y)
-        hdc = hdc.CreateCompatibleDC()
-        
-        hdc.SelectObject(hbmp)
-        hdc.DrawIcon((0, 0), hicon)
-        
-        # Convert to PIL Image
-        bmpstr = hbmp.GetBitmapBits(True)
-        img = Image.frombuffer(
-            'RGB',
-            (ico_x, ico_y),
-            bmpstr, 'raw', 'BGRX', 0, 1
-        )
-        
-        img = img.resize((size, size), Image.Resampling.LANCZOS)
-        
-        # Cleanup
-        win32gui.DestroyIcon(hicon)
-        
-        # Cache it
-        _ICON_CACHE[cache_key] = img
-        
-        return img
+            _ICON_CACHE.remember(app_name, size, icon)
+        return icon
         
     except Exception as e:
         print(f"Error extracting icon for {app_name}: {e}")
         icon = get_default_icon(size)
-        _ICON_CACHE[cache_key] = icon
+        _ICON_CACHE.remember(app_name, size, icon)
         return icon
 
 
+def get_cached_icon(app_name, size=32):
+    """
+    Icon from memory only - cheap enough for the UI thread
+    
+    :return: PIL Image or None if it still needs loading
+    """
+    return _ICON_CACHE.peek(app_name, size)
+
+
+def extract_icon(exe_path, size=32):
+    """
+    Extract the first icon of an executable (Windows only)
+    
+    :param exe_path: Full path to the exe
+    :param size: Icon size in pixels
+    :return: PIL Image or None
+    """
+    # Windows only, imported here so the cache works (and is testable) anywhere
+    import win32ui
+    import win32gui
+    import win32con
+    import win32api
+    from PIL import Image
+
+    ico_x = win32api.GetSystemMetrics(win32con.SM_CXICON)
+    ico_y = win32api.GetSystemMetrics(win32con.SM_CYICON)
+    
+    large, small = win32gui.ExtractIconEx(exe_path, 0)
+    
+    if not large:
+        return None
+    
+    hicon = large[0]
+    
+    # Convert to bitmap
+    hdc = win32ui.CreateDCFromHandle(win32gui.GetDC(0))
+    hbmp = win32ui.CreateBitmap()
+    hbmp.CreateCompatibleBitmap(hdc, ico_x, ico_y)
+    hdc = hdc.CreateCompatibleDC()
+    
+    hdc.SelectObject(hbmp)
+    hdc.DrawIcon((0, 0), hicon)
+    
+    # Convert to PIL Image
+    bmpstr = hbmp.GetBitmapBits(True)
+    img = Image.frombuffer(
+        'RGB',
+        (ico_x, ico_y),
+        bmpstr, 'raw', 'BGRX', 0, 1
+    )
+    
+    img = img.resize((size, size), Image.Resampling.LANCZOS)
+    
+    # Cleanup
+    win32gui.DestroyIcon(hicon)
+    for extra in large[1:] + small:
+        win32gui.DestroyIcon(extra)
+    
+    return img
+
+
 def find_executable_path(app_name):
     """
-    Find executable path (optimized with common locations first)
+    Find executable path (common locations first, then the exe index)
     
     :param app_name: Application name
     :return: Full path or None
@@ -106,24 +279,9 @@ def find_executable_path(app_name):
         if matches:
             return matches[0]
     
-    # Fall back to searching
-    search_paths = [
-        r"C:\Program Files",
-        r"C:\Program Files (x86)",
-        r"C:\Windows\System32",
-        os.path.expanduser("~\\AppData\\Local"),
-    ]
-    
-    for base_path in search_paths:
-        for root, dirs, files in os.walk(base_path):
-            if app_name in files:
-                return os.path.join(root, app_name)
-            
-            # Don't search too deep
-            if root.count(os.sep) - base_path.count(os.sep) > 3:
-                del dirs[:]
-    
-    return None
+    # Fall back to the exe index (one scan of the search folders, saved between launches)
+    from exe_index import get_exe_index
+    return get_exe_index().find(app_name)
 
 
 def get_default_icon(size=32, color='#808080'):
@@ -133,7 +291,7 @@ def get_default_icon(size=32, color='#808080'):
     :param size: Icon size
     :return: PIL Image
     """
-    from PIL import ImageDraw
+    from PIL import Image, ImageDraw
 
     # Convert hex to RGB tuple
     color = color.lstrip('#')
@@ -0,0 +1,98 @@
+"""
+Loads app icons off the Tk thread
+Finding an exe can mean walking Program Files, so windows show a placeholder
+and get the real icon posted back (window.after) when a worker has it
+"""
+
+import logging
+import threading
+from tkinter import TclError
+from concurrent.futures import ThreadPoolExecutor
+from icon_helper import get_app_icon, get_cached_icon
+
+class IconLoader:
+    """
+    Thread pool for icon lookups, several requests for the same app share one lookup
+    """
+    def __init__(self, load=get_app_icon, peek=get_cached_icon, max_workers=4):
+        """
+        :param load: (app_name, size) -> PIL Image, slow (runs on a worker)
+        :param peek: (app_name, size) -> PIL Image or None, fast (runs on the caller's thread)
+        :param max_workers: Lookups running at once
+        """
+        self._load = load
+        self._peek = peek
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="IconLoader")
+        self._lock = threading.Lock()
+        self._pending = {} # (app_name, size) -> [(window, callback), ...]
+
+    def request(self, window, app_name, callback, size=32):
+        """
+        Get an icon, callback(image) runs on window's Tk thread
+
+        :param window: Tk widget to post the result through (window.after)
+        :param app_name: Application name (e.g., 'chrome.exe')
+        :param callback: Called with the PIL Image
+        :param size: Icon size in pixels
+        :return: True if the icon was cached and callback already ran
+        """
+        icon = self._peek(app_name, size)
+        if icon is not None:
+            callback(icon)
+            return True
+
+        key = (app_name, size)
+        with self._lock:
+            waiting = self._pending.get(key)
+            if waiting is not None:
+                waiting.append((window, callback))
+                return False
+            self._pending[key] = [(window, callback)]
+
+        self._executor.submit(self._resolve, key)
+        return False
+
+    def pending_count(self):
+        """Icons still being looked up"""
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self):
+        """Stop the workers, lookups not started yet are dropped"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _resolve(self, key):
+        app_name, size = key
+        try:
+            icon = self._load(app_name, size)
+        except Exception as e:
+            logging.warning(f"Icon lookup failed for {app_name}: {e}")
+            icon = None
+
+        with self._lock:
+            waiting = self._pending.pop(key, [])
+
+        if icon is None:
+            return
+        for window, callback in waiting:
+            try:
+                window.after(0, callback, icon)
+            except (TclError, RuntimeError):
+                # window closed (or Tk gone) before the icon arrived
+                pass
+
+# Shared loader, created on first use
+_LOADER = None
+_LOADER_LOCK = threading.Lock()
+
+def get_icon_loader():
+    """Shared IconLoader"""
+    global _LOADER
+    with _LOADER_LOCK:
+        if _LOADER is None:
+            _LOADER = IconLoader()
+        return _LOADER
+
+def request_icon(window, app_name, callback, size=32):
+    """Load an app icon in the background, see IconLoader.request"""
+    return get_icon_loader().request(window, app_name, callback, size)
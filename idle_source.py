@@ -0,0 +1,104 @@
+"""
+How the tracker knows the user has stepped away
+- LastInputIdleSource: asks Windows when the last keyboard/mouse input was (GetLastInputInfo)
+- MonotonicIdleSource: watches a probe (e.g. mouse position) on the monotonic clock
+- FakeIdleSource: idle time driven by the test (no OS, no real clock)
+"""
+
+import sys
+import time
+
+from clock import default_clock, aware
+
+
+class IdleSource:
+    """
+    Base class for idle sources
+    """
+    def idle_seconds(self):
+        """Seconds since the last keyboard/mouse input"""
+        raise NotImplementedError
+
+
+class LastInputIdleSource(IdleSource):
+    """
+    Windows: one GetLastInputInfo call per check, covers keyboard AND mouse
+    """
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [('cbSize', wintypes.UINT), ('dwTime', wintypes.DWORD)]
+
+        self._user32 = ctypes.windll.user32
+        self._kernel32 = ctypes.windll.kernel32
+        # reused every call, nothing allocated per tick
+        self._info = LASTINPUTINFO()
+        self._info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+        self._info_ref = ctypes.byref(self._info)
+
+    def idle_seconds(self):
+        if not self._user32.GetLastInputInfo(self._info_ref):
+            return 0.0
+        # both are GetTickCount() milliseconds, & handles the 49 day wrap-around
+        return ((self._kernel32.GetTickCount() - self._info.dwTime) & 0xFFFFFFFF) / 1000
+
+
+class MonotonicIdleSource(IdleSource):
+    """
+    Anywhere: activity = probe() returned something new (or touch() was called),
+    idle time measured on time.monotonic() so clock changes don't matter
+    """
+    def __init__(self, probe=None, clock=time.monotonic):
+        """
+        :param probe: Callable returning something that changes on input (e.g. mouse position)
+        :param clock: Monotonic seconds
+        """
+        self.probe = probe
+        self.clock = clock
+        self._last_value = probe() if probe else None
+        self._last_activity = clock()
+
+    def touch(self):
+        """Record activity now"""
+        self._last_activity = self.clock()
+
+    def idle_seconds(self):
+        if self.probe:
+            value = self.probe()
+            if value != self._last_value:
+                self._last_value = value
+                self.touch()
+        return self.clock() - self._last_activity
+
+
+class FakeIdleSource(IdleSource):
+    """
+    Test idle source: idle time = clock() - last input
+    Pair clock with ScriptedWindowSource.now for fully deterministic tracking
+    Naive times are taken as local, so they compare fine with the (aware) session clock
+    """
+    def __init__(self, clock=None, last_input=None):
+        raw_clock = clock or default_clock().now
+        self.clock = lambda: aware(raw_clock())
+        self.last_input = aware(last_input) or self.clock()
+
+    def input_at(self, timestamp):
+        """Pretend the user touched the keyboard/mouse at timestamp"""
+        self.last_input = aware(timestamp)
+
+    def idle_seconds(self):
+        return max(0.0, (self.clock() - self.last_input).total_seconds())
+
+
+def default_idle_source():
+    """
+    Best idle source for this machine
+    """
+    if sys.platform == 'win32':
+        return LastInputIdleSource()
+
+    # no last-input API here, fall back to watching the mouse
+    import pyautogui
+    return MonotonicIdleSource(probe=pyautogui.position)
@@ -0,0 +1,195 @@
+"""
+Export raw time sessions to CSV, JSON Lines or Parquet
+
+Rows are streamed from Database.iter_sessions() one fetchmany() batch at a time
+and written straight out, so memory stays flat however long the history is:
+
+    python session_export.py sessions.csv
+    python session_export.py week.jsonl --project 3 --start 2025-01-06 --end 2025-01-13
+    python session_export.py all.parquet    (needs pyarrow)
+
+Times are written as local ISO 8601 with their UTC offset (Parquet: UTC timestamps),
+so they stay unambiguous across DST changes.
+"""
+
+import os
+import sys
+import csv
+import json
+from datetime import datetime, timezone
+
+from database import Database
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+# columns, in file order (duration can differ from end - start for edited sessions)
+FIELDS = [
+    'session_id', 'project_id', 'project_name', 'app_name',
+    'start_time', 'end_time', 'duration', 'calendar_event_id',
+]
+
+
+class ExportError(Exception):
+    """Export can't be done (bad format, missing optional library...)"""
+
+
+def _local_iso(us):
+    """Epoch microseconds -> local ISO 8601 with offset (exact, no float rounding)"""
+    seconds, micros = divmod(us, 1_000_000)
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(microsecond=micros).astimezone().isoformat()
+
+def format_for(path):
+    """
+    Export format from a file extension
+    :return: 'csv', 'jsonl' or 'parquet'
+    """
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    extension = {'json': 'jsonl', 'ndjson': 'jsonl', 'pq': 'parquet'}.get(extension, extension)
+    if extension not in FORMATS:
+        raise ExportError(f"Can't tell the format from {path!r}, use one of {FORMATS}")
+    return extension
+
+def _values(row):
+    """Row -> tuple in FIELDS order"""
+    session_id, project_id, project_name, app_name, start_us, end_us, duration, calendar_event_id = row
+    return (
+        session_id, project_id, project_name, app_name,
+        _local_iso(start_us), _local_iso(end_us), duration, calendar_event_id,
+    )
+
+def _write_csv(f, batches, on_batch):
+    writer = csv.writer(f)
+    writer.writerow(FIELDS)
+    for batch in batches:
+        writer.writerows(map(_values, batch))
+        on_batch(len(batch))
+
+def _write_jsonl(f, batches, on_batch):
+    for batch in batches:
+        f.write(''.join(
+            json.dumps(dict(zip(FIELDS, _values(row))), ensure_ascii=False) + '\n' for row in batch
+        ))
+        on_batch(len(batch))
+
+def _write_parquet(path, batches, on_batch):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExportError("Parquet export needs pyarrow (pip install pyarrow), or export to csv/jsonl") from e
+
+    schema = pa.schema([
+        ('session_id', pa.int64()),
+        ('project_id', pa.int64()),
+        ('project_name', pa.string()),
+        ('app_name', pa.string()),
+        ('start_time', pa.timestamp('us', tz='UTC')),
+        ('end_time', pa.timestamp('us', tz='UTC')),
+        ('duration', pa.float64()),
+        ('calendar_event_id', pa.string()),
+    ])
+    # one row group per batch
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            columns = {
+                'session_id': [row['id'] for row in batch],
+                'project_id': [row['project_id'] for row in batch],
+                'project_name': [row['project_name'] for row in batch],
+                'app_name': [row['app_name'] for row in batch],
+                'start_time': [row['start_us'] for row in batch],
+                'end_time': [row['end_us'] for row in batch],
+                'duration': [row['duration'] for row in batch],
+                'calendar_event_id': [row['calendar_event_id'] for row in batch],
+            }
+            writer.write_table(pa.table(columns, schema=schema))
+            on_batch(len(batch))
+
+def export_sessions(db, path, fmt=None, project_id=None, start=None, end=None, batch_size=5000, progress=None):
+    """
+    Write sessions to a file
+
+    :param db: Database
+    :param path: Output file (written to a temp file first, replaced at the end)
+    :param fmt: 'csv', 'jsonl' or 'parquet' (default: from the extension)
+    :param project_id: Only this project (None = all)
+    :param start: Sessions overlapping from here (local time, included), None = from the first
+    :param end: Up to here (local time, excluded), None = to the last
+    :param batch_size: Rows fetched and written at a time
+    :param progress: Called with (rows_written, total_rows) after every batch
+    :return: Number of sessions written
+    """
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format {fmt!r}, use one of {FORMATS}")
+
+    total = db.count_sessions(project_id, start, end)
+    written = 0
+
+    def on_batch(rows):
+        nonlocal written
+        written += rows
+        if progress:
+            progress(written, total)
+
+    batches = db.iter_sessions(project_id, start, end, batch_size=batch_size)
+    # a failed export never leaves half a file where the old one was
+    temp_path = path + '.tmp'
+    try:
+        if fmt == 'parquet':
+            _write_parquet(temp_path, batches, on_batch)
+        else:
+            with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+                (_write_csv if fmt == 'csv' else _write_jsonl)(f, batches, on_batch)
+        os.replace(temp_path, path)
+    except BaseException:
+        batches.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if progress and total == 0:
+        progress(0, 0)
+    return written
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export time sessions to CSV, JSON Lines or Parquet')
+    parser.add_argument('output', help='File to write (.csv, .jsonl or .parquet)')
+    parser.add_argument('--format', '-f', choices=FORMATS, help='Output format (default: from the extension)')
+    parser.add_argument('--db', default='time_tracker.db', help='SQLite database file')
+    parser.add_argument('--project', type=int, help='Only this project ID (default: all)')
+    parser.add_argument('--start', type=datetime.fromisoformat, help='From this local date/time (e.g. 2025-01-06)')
+    parser.add_argument('--end', type=datetime.fromisoformat, help='Up to this local date/time, excluded')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows fetched at a time')
+    parser.add_argument('--quiet', '-q', action='store_true', help="Don't show progress")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f"No database at {args.db}")
+
+    def show_progress(done, total):
+        percent = done / total * 100 if total else 100
+        sys.stderr.write(f"\rExported {done:,} / {total:,} sessions ({percent:.0f}%)")
+        sys.stderr.flush()
+
+    with Database(args.db) as db:
+        try:
+            count = export_sessions(
+                db, args.output, args.format, args.project, args.start, args.end,
+                batch_size=args.batch_size, progress=None if args.quiet else show_progress
+            )
+        except ExportError as e:
+            if not args.quiet:
+                sys.stderr.write("\n")
+            print(f"Export failed: {e}", file=sys.stderr)
+            return 1
+
+    if not args.quiet:
+        sys.stderr.write("\n")
+    print(f"{count:,} sessions written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Crash-safe record of the session that's still open
+
+A session only reaches the database when it ends (app switch, idle...), so a crash,
+kill or power cut used to lose everything since the last switch. The tracking
+engine now checkpoints the open session to a small append-only file next to the
+database every interval seconds:
+
+    {"project_id": 1, "app_name": "Photoshop.exe", "start": "...", "seen": "..."}
+
+One line per checkpoint, fsynced, and nothing touches the database (or its write
+lock) in between. A clean stop saves the open session, then deletes the file. If it's still there when the
+service starts, the last line is the session that got cut off: recover() saves it
+as ending at its last checkpoint, unless the session made it into the db anyway.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+
+# <database file> + this
+JOURNAL_SUFFIX = '.session'
+
+
+class SessionJournal:
+    """
+    Append-only checkpoint file for the open session (see module docstring)
+    """
+    def __init__(self, path, interval=30.0, max_bytes=64 * 1024, fsync=True, clock=time.monotonic):
+        """
+        :param path: Journal file
+        :param interval: Min seconds between checkpoints (at most this much of a crashed session is lost)
+        :param max_bytes: File size at which it's rewritten with just the latest checkpoint
+        :param fsync: Flush every checkpoint to disk (off only for tests/benchmarks)
+        :param clock: Monotonic seconds, for interval
+        """
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.clock = clock
+        self.checkpoints = 0
+        self._last_write = None
+
+    @classmethod
+    def for_database(cls, db_path, **kwargs):
+        """
+        Journal kept next to a database file
+        :return: SessionJournal, or None for an in-memory database
+        """
+        if db_path == ':memory:':
+            return None
+        return cls(db_path + JOURNAL_SUFFIX, **kwargs)
+
+    def due(self):
+        """
+        Whether interval has passed since the last checkpoint
+        True counts as taking it (the write itself may happen on another thread)
+        """
+        now = self.clock()
+        if self._last_write is not None and now - self._last_write < self.interval:
+            return False
+        self._last_write = now
+        return True
+
+    def checkpoint(self, project_id, app_name, start_time, seen_time):
+        """
+        Append the open session (callers ask due() first)
+
+        :param project_id: Project being tracked
+        :param app_name: App (or "Idle") the session is for
+        :param start_time: When the session started
+        :param seen_time: Latest time it was still open
+        """
+        line = json.dumps({
+            'project_id': project_id,
+            'app_name': app_name,
+            'start': start_time.isoformat(),
+            'seen': seen_time.isoformat(),
+        }) + '\n'
+
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+            # only the last line matters, start over (temp file + rename, the old one stays until then)
+            temp_path = self.path + '.tmp'
+            self._write(temp_path, 'w', line)
+            os.replace(temp_path, self.path)
+        else:
+            self._write(self.path, 'a', line)
+        self.checkpoints += 1
+
+    def _write(self, path, mode, line):
+        with open(path, mode, encoding='utf-8') as f:
+            f.write(line)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def clear(self):
+        """Forget the open session (clean stop, or after recovery)"""
+        self._last_write = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def last(self):
+        """
+        Latest complete checkpoint
+        :return: Dict with project_id, app_name, start, seen (datetimes), or None
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+
+        # a crash mid-write leaves half a line at the end
+        for line in reversed(lines):
+            try:
+                record = json.loads(line)
+                return {
+                    'project_id': record['project_id'],
+                    'app_name': record['app_name'],
+                    'start': datetime.fromisoformat(record['start']),
+                    'seen': datetime.fromisoformat(record['seen']),
+                }
+            except (ValueError, KeyError, TypeError):
+                continue
+        return None
+
+    def recover(self, db, threshold_seconds=30, sync_calendar=False):
+        """
+        Save the session a crash cut off (start up to its last checkpoint), then clear the journal
+
+        :param db: Database
+        :param threshold_seconds: Minimum session length saved, same as the tracker's
+        :param sync_calendar: Queue it for the calendar like a normal session
+        :return: Session dict that was saved, or None
+        """
+        record = self.last()
+        if record is None:
+            self.clear()
+            return None
+
+        duration = (record['seen'] - record['start']).total_seconds()
+        project = db.get_project(record['project_id'])
+        if project is None or duration < threshold_seconds:
+            logging.info(f"Nothing to recover from {self.path}")
+            self.clear()
+            return None
+        if db.has_session(record['project_id'], record['app_name'], record['start']):
+            # it ended and was saved, the crash came before the next checkpoint
+            self.clear()
+            return None
+
+        session = {
+            'project_id': record['project_id'],
+            'app_name': record['app_name'],
+            'start_time': record['start'],
+            'end_time': record['seen'],
+            'duration': duration,
+        }
+        db.add_time_session(**session, sync_calendar=sync_calendar)
+        # written before the journal goes, so a crash here just recovers it again (and skips it)
+        db.flush()
+        self.clear()
+        logging.warning(
+            f"Recovered interrupted session: {duration:.1f}s in {record['app_name']} to project '{project['name']}'"
+        )
+        return session
@@ -0,0 +1,21 @@
+import json
+from benchmark import run, compare
+
+def test_benchmark_smoke(tmp_path):
+    """
+    A tiny run covers every operation and round-trips through JSON
+    """
+    results = run(scales=[300], projects=5, repeat=3, inserts=60, switches=200, work_dir=str(tmp_path), progress=None)
+    results = json.loads(json.dumps(results))
+
+    ops = results['scales']['300']
+    assert ops['populate']['rows'] == 300
+    for op in ('add_time_session', 'get_project_time', 'get_all_projects', 'update_app_time_for_project'):
+        assert ops[op]['calls'] > 0
+        assert ops[op]['min_ms'] <= ops[op]['median_ms'] <= ops[op]['max_ms']
+    assert results['tracker_update']['calls'] >= 200
+    assert results['environment']['sqlite']
+
+    # same results compared against themselves = no change
+    rows = compare(results, results)
+    assert rows and all(ratio == 1 for _, _, _, ratio in rows)
@@ -0,0 +1,234 @@
+import json
+import threading
+import pytest
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+pytest.importorskip("googleapiclient")
+pytest.importorskip("google_auth_oauthlib")
+pytest.importorskip("pytz")
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from calendar_sync import CalendarSync, BATCH_LIMIT
+
+BOUNDARY = 'batch_response_boundary'
+
+class CalendarServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Calendar API: real HTTP, real multipart batches, one answer per part
+    """
+    def __init__(self, fail_event_ids = (), etags = None):
+        super().__init__(('127.0.0.1', 0), CalendarHandler)
+        self.fail_event_ids = set(fail_event_ids)
+        self.etags = etags or {}
+        self.round_trips = 0
+        self.batches = []   # parts per batch request
+        self.requests = []  # (method, path, headers, body) of every API call, batched or not
+        self.inserted = 0
+
+    def respond(self, method, path, headers, body):
+        """
+        Answer one API call
+        :return: (status, headers, body dict or None)
+        """
+        self.requests.append((method, path, headers, body))
+        event_id = path.split('?')[0].split('/events')[-1].strip('/') or None
+        if event_id in self.fail_event_ids:
+            return 404, {}, {'error': {'code': 404, 'message': f"{event_id} not found"}}
+        if method == 'POST':
+            self.inserted += 1
+            return 200, {'ETag': '"1"'}, {'id': f"new-{self.inserted}", 'etag': '"1"'}
+        if method == 'PATCH':
+            if_match = headers.get('if-match')
+            if if_match and if_match != self.etags.get(event_id):
+                return 412, {}, {'error': {'code': 412, 'message': "Precondition Failed"}}
+            self.etags[event_id] = f"{self.etags.get(event_id, '')}+"
+            return 200, {'ETag': self.etags[event_id]}, {'id': event_id, 'etag': self.etags[event_id]}
+        return 204, {}, None
+
+class CalendarHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        server = self.server
+        server.round_trips += 1
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if self.path.startswith('/batch/'):
+            message = BytesParser().parsebytes(
+                b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body
+            )
+            parts = message.get_payload()
+            server.batches.append(len(parts))
+            answers = []
+            for part in parts:
+                status, headers, data = server.respond(*parse_http(part.get_payload()))
+                answers.append(
+                    f"--{BOUNDARY}\r\nContent-Type: application/http\r\n"
+                    f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                    + http_message(status, headers, data)
+                )
+            self.send(200, {'Content-Type': f'multipart/mixed; boundary={BOUNDARY}'},
+                      ''.join(answers) + f"--{BOUNDARY}--\r\n")
+        else:
+            headers = {name.lower(): value for name, value in self.headers.items()}
+            status, headers, data = server.respond(self.command, self.path, headers, json.loads(body) if body else None)
+            self.send(status, dict(headers, **{'Content-Type': 'application/json'}), json.dumps(data) if data else '')
+
+    do_POST = do_PATCH = do_DELETE = _handle
+
+    def send(self, status, headers, text):
+        content = text.encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+def parse_http(text):
+    """
+    One batch part (an HTTP request as text) -> (method, path, headers, body)
+    """
+    head, _, body = text.replace('\r\n', '\n').partition('\n\n')
+    request_line, *header_lines = head.split('\n')
+    method, path, _ = request_line.split(' ')
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return method, path, headers, json.loads(body) if body.strip() else None
+
+def http_message(status, headers, data):
+    """
+    An HTTP response as text, for a batch response part
+    """
+    lines = [f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}", 'Content-Type: application/json; charset=UTF-8']
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return '\r\n'.join(lines) + '\r\n\r\n' + (json.dumps(data) if data else '') + '\r\n'
+
+@pytest.fixture
+def server():
+    server = CalendarServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join(timeout=5)
+
+def make_sync(server_or_port):
+    """
+    CalendarSync on the real API client, pointed at the local server
+    """
+    port = server_or_port if isinstance(server_or_port, int) else server_or_port.server_address[1]
+    document = json.loads(get_static_doc('calendar', 'v3'))
+    document['rootUrl'] = f"http://127.0.0.1:{port}/"
+    sync = CalendarSync()
+    sync.service = build_from_document(document, http=httplib2.Http(timeout=5))
+    sync.calendar_id = 'calendar-1'
+    return sync
+
+def session(minutes):
+    start = datetime(2025, 1, 1, 9, 0)
+    return {
+        'project_name': 'Batch Test',
+        'app_name': 'Photoshop.exe',
+        'start_time': start,
+        'end_time': start + timedelta(minutes=minutes),
+        'duration_seconds': minutes * 60
+    }
+
+def test_batch_sync_groups_requests(server):
+    """
+    120 inserts go out in 3 round-trips (50 + 50 + 20)
+    """
+    sync = make_sync(server)
+
+    operations = [{'key': i, 'action': 'insert', 'session_data': session(1)} for i in range(120)]
+    results = sync.batch_sync(operations)
+
+    assert server.round_trips == 3
+    assert server.batches == [BATCH_LIMIT, BATCH_LIMIT, 20]
+    assert all(result['ok'] for result in results.values())
+    assert len({result['event_id'] for result in results.values()}) == 120
+
+def test_batch_sync_reports_each_item(server):
+    """
+    Mixed insert/patch/delete, one bad event ID fails on its own
+    """
+    server.fail_event_ids = {'missing'}
+    sync = make_sync(server)
+
+    results = sync.batch_sync([
+        {'key': 'a', 'action': 'insert', 'session_data': session(5)},
+        {'key': 'b', 'action': 'patch', 'event_id': 'evt-b', 'session_data': session(10)},
+        {'key': 'c', 'action': 'delete', 'event_id': 'evt-c'},
+        {'key': 'd', 'action': 'delete', 'event_id': 'missing'},
+    ])
+
+    assert server.round_trips == 1
+    assert [request[0] for request in server.requests] == ['POST', 'PATCH', 'DELETE', 'DELETE']
+    assert results['a']['ok'] and results['a']['event_id'] == 'new-1'
+    assert results['b']['ok'] and results['b']['event_id'] == 'evt-b'
+    assert results['c']['ok'] and results['c']['event_id'] == 'evt-c'
+    assert results['d']['ok'] is False
+    assert '404' in results['d']['error']
+
+def test_batch_sync_whole_batch_failure(server):
+    """
+    If the batch request itself fails (nothing listening), every item in it is reported as failed
+    """
+    port = server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+    results = make_sync(port).batch_sync(
+        [{'key': i, 'action': 'insert', 'session_data': session(1)} for i in range(3)]
+    )
+
+    assert [result['ok'] for result in results.values()] == [False, False, False]
+    assert all(result['error'] for result in results.values())
+
+def test_patch_event_sends_only_changed_fields(server):
+    """
+    A patch is one request with just the given fields and an If-Match header
+    """
+    server.etags = {'evt': '"abc"'}
+    sync = make_sync(server)
+
+    result = sync.patch_event('evt', session(20), fields=('end', 'description'), etag='"abc"')
+
+    assert result['ok']
+    assert result['etag'] == '"abc"+'
+    assert server.round_trips == 1
+    method, path, headers, body = server.requests[0]
+    assert method == 'PATCH'
+    assert path.startswith('/calendar/v3/calendars/calendar-1/events/evt')
+    assert set(body) == {'end', 'description'}
+    assert '20.0 minutes' in body['description']
+    assert headers['if-match'] == '"abc"'
+
+def test_stale_etag_is_a_conflict(server):
+    """
+    Patching with an outdated ETag inside a batch: the 412 part is a conflict, the other parts still go through
+    """
+    server.etags = {'evt': '"new"', 'other': '"same"'}
+    sync = make_sync(server)
+
+    results = sync.batch_sync([
+        {'key': 1, 'action': 'patch', 'event_id': 'evt', 'session_data': session(5), 'etag': '"old"'},
+        {'key': 2, 'action': 'patch', 'event_id': 'other', 'session_data': session(5), 'etag': '"same"'},
+    ])
+
+    # If-Match made it into each part of the multipart body
+    assert [request[2]['if-match'] for request in server.requests] == ['"old"', '"same"']
+    assert results[1]['ok'] is False
+    assert results[1]['conflict'] is True
+    assert results[2]['ok'] and results[2]['etag'] == '"same"+'
+    assert server.etags['evt'] == '"new"'
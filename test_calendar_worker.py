@@ -0,0 +1,273 @@
+from datetime import datetime, timedelta
+from database import Database
+from calendar_worker import CalendarSyncWorker
+
+class FakeCalendar:
+    """
+    Stand-in for CalendarSync, fails the first `failures` batches like an offline API
+    """
+    def __init__(self, failures = 0):
+        self.failures = failures
+        self.created = []
+        self.patched = []
+        self.batches = []
+
+    def batch_sync(self, operations):
+        self.batches.append(operations)
+        if self.failures:
+            self.failures -= 1
+            raise OSError("network is unreachable")
+
+        results = {}
+        for op in operations:
+            if op['action'] == 'insert':
+                self.created.append(op['session_data'])
+                event_id = f"event-{len(self.created)}"
+            else:
+                self.patched.append(op)
+                event_id = op['event_id']
+            results[op['key']] = {'ok': True, 'event_id': event_id, 'etag': f"etag-{len(self.batches)}",
+                                  'conflict': False, 'error': None}
+        return results
+
+class FakeClock:
+    """
+    Epoch seconds that only move when told to
+    """
+    def __init__(self, now = 1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def add_synced_session(db, project_id, app_name, minutes):
+    """
+    Add a session that should end up on the calendar
+    """
+    start = datetime(2025, 1, 1, 9, 0)
+    db.add_time_session(
+        project_id, app_name, start, start + timedelta(minutes=minutes), minutes * 60,
+        sync_calendar=True
+    )
+
+def event_ids(db, project_id):
+    """
+    Calendar event IDs stored on a project's sessions, in insert order
+    """
+    rows = db.conn.execute(
+        'SELECT calendar_event_id FROM time_sessions WHERE project_id = ? ORDER BY id',
+        (project_id,)
+    ).fetchall()
+    return [row['calendar_event_id'] for row in rows]
+
+def test_worker_pushes_pending_sessions(tmp_path):
+    """
+    Sessions are saved as pending, the worker creates events and stores their IDs
+    """
+    with Database(str(tmp_path / 'sync.db'), batch_size=1) as db:
+        project_id = db.create_project("Sync Test")
+        add_synced_session(db, project_id, "Photoshop.exe", 45)
+        add_synced_session(db, project_id, "PureRef.exe", 15)
+        db.add_time_session(project_id, "chrome.exe", datetime(2025, 1, 1), datetime(2025, 1, 1, 0, 1), 60)
+
+        assert db.get_pending_calendar_sync_count() == 2
+        assert event_ids(db, project_id) == [None, None, None]
+
+        calendar = FakeCalendar()
+        worker = CalendarSyncWorker(db, calendar, clock=FakeClock())
+        assert worker.run_once() == 2
+        assert len(calendar.batches) == 1
+
+        assert event_ids(db, project_id) == ["event-1", "event-2", None]
+        assert db.get_pending_calendar_sync_count() == 0
+        assert calendar.created[0]['project_name'] == "Sync Test"
+        assert calendar.created[0]['app_name'] == "Photoshop.exe"
+        assert calendar.created[0]['start_time'] == datetime(2025, 1, 1, 9, 0)
+        assert calendar.created[0]['duration_seconds'] == 2700
+
+def test_worker_backs_off_and_retries(tmp_path):
+    """
+    Failed pushes stay in the outbox and are retried after an increasing delay
+    """
+    with Database(str(tmp_path / 'retry.db'), batch_size=1) as db:
+        project_id = db.create_project("Retry Test")
+        add_synced_session(db, project_id, "Photoshop.exe", 30)
+
+        clock = FakeClock()
+        worker = CalendarSyncWorker(db, FakeCalendar(failures=2), base_backoff=10, clock=clock)
+
+        assert worker.run_once() == 0
+        # not due yet
+        clock.now += 5
+        assert worker.run_once() == 0
+        assert db.get_due_calendar_syncs(now=clock.now) == []
+
+        # second failure doubles the wait
+        clock.now += 5
+        assert worker.run_once() == 0
+        clock.now += 19
+        assert worker.run_once() == 0
+        clock.now += 1
+        assert worker.run_once() == 1
+
+        assert event_ids(db, project_id) == ["event-1"]
+        assert db.get_pending_calendar_sync_count() == 0
+
+def test_outbox_survives_restart(tmp_path):
+    """
+    Pending syncs are stored in the database, not in memory
+    """
+    db_path = str(tmp_path / 'restart.db')
+    with Database(db_path) as db:
+        project_id = db.create_project("Restart Test")
+        add_synced_session(db, project_id, "Photoshop.exe", 30)
+
+    with Database(db_path) as db:
+        assert db.get_pending_calendar_sync_count() == 1
+        CalendarSyncWorker(db, FakeCalendar(), clock=FakeClock()).run_once()
+        assert event_ids(db, project_id) == ["event-1"]
+
+def test_worker_retries_only_failed_items(tmp_path):
+    """
+    Per-item batch results: successes are stored, failures go back in the outbox
+    """
+    class HalfFailingCalendar(FakeCalendar):
+        def batch_sync(self, operations):
+            results = super().batch_sync(operations)
+            results[operations[0]['key']] = {'ok': False, 'event_id': None, 'error': "rate limited"}
+            return results
+
+    with Database(str(tmp_path / 'partial.db'), batch_size=1) as db:
+        project_id = db.create_project("Partial Test")
+        add_synced_session(db, project_id, "Photoshop.exe", 30)
+        add_synced_session(db, project_id, "PureRef.exe", 10)
+
+        worker = CalendarSyncWorker(db, HalfFailingCalendar(), clock=FakeClock())
+        assert worker.run_once() == 1
+        assert event_ids(db, project_id) == [None, "event-2"]
+        assert db.get_pending_calendar_sync_count() == 1
+
+def test_backfill_queues_unsynced_sessions(tmp_path):
+    """
+    Backfill queues sessions with no event that aren't already waiting
+    """
+    start = datetime(2025, 1, 1, 9, 0)
+
+    with Database(str(tmp_path / 'backfill.db'), batch_size=1) as db:
+        project_id = db.create_project("Backfill Test")
+        other_id = db.create_project("Other")
+        db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(minutes=1), 60)
+        db.add_time_session(project_id, "PureRef.exe", start, start + timedelta(minutes=1), 60, calendar_event_id="done")
+        add_synced_session(db, project_id, "chrome.exe", 1)
+        db.add_time_session(other_id, "Photoshop.exe", start, start + timedelta(minutes=1), 60)
+
+        assert db.queue_calendar_backfill(project_id) == 1
+        assert db.queue_calendar_backfill(project_id) == 0
+        assert db.queue_calendar_backfill() == 1
+        assert db.get_pending_calendar_sync_count() == 3
+
+        calendar = FakeCalendar()
+        CalendarSyncWorker(db, calendar, clock=FakeClock()).run_once()
+        assert len(calendar.batches) == 1
+        assert event_ids(db, project_id) == ["event-2", "done", "event-1"]
+
+def test_edits_patch_synced_events(tmp_path):
+    """
+    Rescaling an app's time queues conditional patches of only the changed fields
+    """
+    with Database(str(tmp_path / 'patch.db'), batch_size=1) as db:
+        project_id = db.create_project("Patch Test")
+        add_synced_session(db, project_id, "Photoshop.exe", 30)
+        add_synced_session(db, project_id, "Photoshop.exe", 10)
+
+        calendar = FakeCalendar()
+        worker = CalendarSyncWorker(db, calendar, clock=FakeClock())
+        worker.run_once()
+
+        db.update_app_time_for_project(project_id, "Photoshop.exe", 20 * 60)
+        # editing twice before the worker runs doesn't queue twice
+        db.update_app_time_for_project(project_id, "Photoshop.exe", 20 * 60)
+        assert db.get_pending_calendar_sync_count() == 2
+
+        assert worker.run_once() == 2
+        assert [op['event_id'] for op in calendar.patched] == ["event-1", "event-2"]
+        first = calendar.patched[0]
+        assert first['action'] == 'patch'
+        assert first['fields'] == ('end', 'description')
+        assert first['etag'] == "etag-1"
+        # 30 of 40 minutes scaled to 20 -> 15 minutes
+        session_data = first['session_data']
+        assert session_data['end_time'] - session_data['start_time'] == timedelta(minutes=15)
+
+        etags = [row['calendar_etag'] for row in db.conn.execute('SELECT calendar_etag FROM time_sessions')]
+        assert etags == ["etag-2", "etag-2"]
+
+def test_patch_conflict_keeps_remote_version(tmp_path):
+    """
+    A 412 (event edited in Google Calendar) drops the update and keeps the old ETag, so later edits conflict too
+    """
+    class ConflictCalendar(FakeCalendar):
+        def batch_sync(self, operations):
+            results = super().batch_sync(operations)
+            for op in operations:
+                if op['action'] == 'patch':
+                    results[op['key']] = {'ok': False, 'event_id': op['event_id'], 'etag': None,
+                                          'conflict': True, 'error': "412 Precondition Failed"}
+            return results
+
+    with Database(str(tmp_path / 'conflict.db'), batch_size=1) as db:
+        project_id = db.create_project("Conflict Test")
+        add_synced_session(db, project_id, "Photoshop.exe", 30)
+
+        worker = CalendarSyncWorker(db, ConflictCalendar(), clock=FakeClock())
+        worker.run_once()
+        db.update_app_time_for_project(project_id, "Photoshop.exe", 60)
+
+        assert worker.run_once() == 0
+        assert db.get_pending_calendar_sync_count() == 0
+        row = db.conn.execute('SELECT calendar_event_id, calendar_etag FROM time_sessions').fetchone()
+        assert (row['calendar_event_id'], row['calendar_etag']) == ("event-1", "etag-1")
+
+        # the next edit is still conditional on the ETag we wrote, not an unconditional overwrite
+        db.update_app_time_for_project(project_id, "Photoshop.exe", 120)
+        entry = db.get_due_calendar_syncs(now=FakeClock()())[0]
+        assert entry['calendar_etag'] == "etag-1"
+
+def test_edit_while_push_in_flight_is_still_pushed(tmp_path):
+    """
+    A rescale landing between the worker reading an entry and completing it stays queued with the new length
+    """
+    class EditingCalendar(FakeCalendar):
+        def __init__(self, edit):
+            super().__init__()
+            self.edit = edit
+
+        def batch_sync(self, operations):
+            # the GUI saves an edit while the request is on the wire
+            if self.edit:
+                self.edit.pop()()
+            return super().batch_sync(operations)
+
+    with Database(str(tmp_path / 'in_flight.db'), batch_size=1) as db:
+        project_id = db.create_project("In Flight Test")
+        add_synced_session(db, project_id, "Photoshop.exe", 30)
+
+        # mid-create: the event gets made with the old length, then patched
+        calendar = EditingCalendar([lambda: db.update_app_time_for_project(project_id, "Photoshop.exe", 20 * 60)])
+        worker = CalendarSyncWorker(db, calendar, clock=FakeClock())
+        assert worker.run_once() == 1
+        assert db.get_pending_calendar_sync_count() == 1
+        assert worker.run_once() == 1
+        assert calendar.patched[-1]['etag'] == "etag-1"
+        session_data = calendar.patched[-1]['session_data']
+        assert session_data['end_time'] - session_data['start_time'] == timedelta(minutes=20)
+
+        # mid-patch: the second edit isn't lost when the first patch completes
+        calendar.edit = [lambda: db.update_app_time_for_project(project_id, "Photoshop.exe", 5 * 60)]
+        db.update_app_time_for_project(project_id, "Photoshop.exe", 10 * 60)
+        assert worker.run_once() == 1
+        assert db.get_pending_calendar_sync_count() == 1
+        assert worker.run_once() == 1
+        session_data = calendar.patched[-1]['session_data']
+        assert session_data['end_time'] - session_data['start_time'] == timedelta(minutes=5)
+        assert db.get_pending_calendar_sync_count() == 0
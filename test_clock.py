@@ -0,0 +1,146 @@
+from database import Database
+from idle_source import FakeIdleSource
+from tracker_with_db import ProjectTimeTracker
+from clock import SessionClock, NS_PER_SECOND
+
+EPOCH_2025 = 1_735_722_000 * NS_PER_SECOND # 2025-01-01 09:00 UTC
+
+class FakeTime:
+    """
+    Wall + monotonic clocks the test moves by hand
+    """
+    def __init__(self):
+        self.wall = EPOCH_2025
+        self.mono = 5 * NS_PER_SECOND
+
+    def advance(self, seconds):
+        """Time passing normally"""
+        self.wall += int(seconds * NS_PER_SECOND)
+        self.mono += int(seconds * NS_PER_SECOND)
+
+    def suspend(self, seconds):
+        """Machine asleep: wall clock moves, monotonic doesn't"""
+        self.wall += int(seconds * NS_PER_SECOND)
+
+    def clock(self, **kwargs):
+        return SessionClock(wall_ns=lambda: self.wall, monotonic_ns=lambda: self.mono, **kwargs)
+
+def test_durations_ignore_wall_clock_changes():
+    """
+    Timestamps follow the monotonic clock until check() says the wall clock moved
+    """
+    fake = FakeTime()
+    clock = fake.clock()
+    start = clock.now()
+    assert start.tzinfo is not None
+    assert start.timestamp() == EPOCH_2025 / NS_PER_SECOND
+
+    fake.advance(90.25)
+    # clock set back an hour (or NTP) - doesn't touch durations
+    fake.wall -= 3600 * NS_PER_SECOND
+    assert (clock.now() - start).total_seconds() == 90.25
+
+    jump = clock.check()
+    assert jump.seconds == -3600
+    assert (jump.before - start).total_seconds() == 90.25
+    assert clock.check() is None
+
+def test_small_drift_keeps_anchor():
+    """
+    NTP slewing a little doesn't re-anchor mid-session
+    """
+    fake = FakeTime()
+    clock = fake.clock()
+    fake.advance(60)
+    fake.wall += NS_PER_SECOND // 2
+    assert clock.check() is None and clock.jumps == 0
+
+def test_tracker_splits_session_at_suspend(tmp_path):
+    """
+    Sleep in the middle of a session: the time before it is saved, the sleep isn't counted
+    """
+    fake = FakeTime()
+    # drift only, updates here are further apart than suspend_gap
+    clock = fake.clock(suspend_gap=None)
+    # user never goes idle
+    now = clock.now()
+    idle = FakeIdleSource(clock=lambda: now)
+
+    with Database(str(tmp_path / 'clock.db')) as db:
+        project_id = db.create_project("Clock")
+        tracker = ProjectTimeTracker(db, project_id, sync_calendar=False, idle_source=idle, clock=clock)
+
+        tracker.update("Photoshop.exe")
+        fake.advance(100)
+        tracker.update("Photoshop.exe")
+        fake.suspend(3600)
+        fake.advance(1)
+        # first update after waking up notices the jump
+        tracker.update("Photoshop.exe")
+        fake.advance(50)
+        tracker.update("krita.exe")
+        db.flush()
+
+        rows = db.conn.execute('SELECT start_us, end_us, duration FROM time_sessions ORDER BY id').fetchall()
+        assert [row['duration'] for row in rows] == [101.0, 50.0]
+        # the hour asleep is the gap between them
+        assert rows[1]['start_us'] - rows[0]['end_us'] == 3600 * 1_000_000
+
+def test_long_gap_between_checks_is_a_suspend(tmp_path):
+    """
+    Windows: monotonic time keeps counting through sleep, so the only sign is no update for a long time
+    """
+    fake = FakeTime()
+    clock = fake.clock(suspend_gap=60)
+    now = clock.now()
+    idle = FakeIdleSource(clock=lambda: now)
+
+    with Database(str(tmp_path / 'gap.db')) as db:
+        project_id = db.create_project("Gap")
+        tracker = ProjectTimeTracker(db, project_id, sync_calendar=False, idle_source=idle, clock=clock)
+
+        tracker.update("Photoshop.exe")
+        for _ in range(50):
+            # the engine's heartbeat
+            fake.advance(2)
+            tracker.update("Photoshop.exe")
+        assert clock.jumps == 0
+
+        # asleep for an hour, both clocks moved
+        fake.advance(3600)
+        tracker.update("Photoshop.exe")
+        assert clock.jumps == 1
+        fake.advance(40)
+        tracker.update("krita.exe")
+        db.flush()
+
+        rows = db.conn.execute('SELECT start_us, end_us, duration FROM time_sessions ORDER BY id').fetchall()
+        assert [row['duration'] for row in rows] == [100.0, 40.0]
+        assert rows[1]['start_us'] - rows[0]['end_us'] == 3600 * 1_000_000
+
+def test_naive_timestamps_mix_with_clock_jumps(tmp_path):
+    """
+    Fake sources handing over naive times (tests, benchmarks) still work with the aware session clock
+    """
+    from datetime import datetime, timedelta
+    from window_source import ScriptedWindowSource
+
+    fake = FakeTime()
+    clock = fake.clock()
+    start = datetime(2025, 1, 1, 9, 0)
+    source = ScriptedWindowSource([(start, "Photoshop.exe"), (start + timedelta(seconds=90), "krita.exe")])
+    assert source.now().tzinfo is not None
+    assert FakeIdleSource().clock().tzinfo is not None
+
+    with Database(str(tmp_path / 'naive.db')) as db:
+        project_id = db.create_project("Naive")
+        tracker = ProjectTimeTracker(db, project_id, sync_calendar=False, idle_source=FakeIdleSource(clock=source.now),
+                                     clock=clock)
+        event = source.wait(1)
+        tracker.update(event.app_name, event.timestamp)
+        fake.wall -= 3600 * NS_PER_SECOND
+        # a jump is noticed on the update with a (would-be naive) source timestamp
+        tracker.update("Photoshop.exe", start + timedelta(seconds=30))
+        assert clock.jumps == 1
+        event = source.wait(120)
+        tracker.update(event.app_name, event.timestamp)
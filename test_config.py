@@ -0,0 +1,79 @@
+import os
+import json
+import pytest
+from config import Settings
+
+def write_settings(path, settings, mtime_ns=None):
+    """
+    Write a settings file directly (like another process/editor would)
+    """
+    with open(path, 'w') as f:
+        json.dump(settings, f)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_settings_cached_until_file_changes(tmp_path):
+    """
+    Values come from memory until the file's mtime changes
+    """
+    path = str(tmp_path / 'settings.json')
+    write_settings(path, {'timezone': 'Europe/London', 'theme': 'pink'}, mtime_ns=1_000_000_000)
+    settings = Settings(path, check_interval=0)
+
+    assert settings.get('theme') == 'pink'
+
+    # same mtime -> cache still used
+    write_settings(path, {'timezone': 'Europe/London', 'theme': 'dark'}, mtime_ns=1_000_000_000)
+    assert settings.get('theme') == 'pink'
+
+    # new mtime -> reloaded
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert settings.get('theme') == 'dark'
+
+def test_settings_check_interval_skips_stat(tmp_path):
+    """
+    Within check_interval the file isn't even looked at
+    """
+    path = str(tmp_path / 'settings.json')
+    write_settings(path, {'theme': 'pink'})
+    settings = Settings(path, check_interval=3600)
+
+    assert settings.get('theme') == 'pink'
+    os.remove(path)
+    assert settings.get('theme') == 'pink'
+
+    settings.invalidate()
+    assert settings.get('theme') == 'default'
+
+def test_settings_set_writes_atomically(tmp_path):
+    """
+    set() updates the cache and replaces the file, leaving no temp files behind
+    """
+    path = str(tmp_path / 'settings.json')
+    settings = Settings(path)
+
+    # missing file -> defaults
+    assert settings.get('timezone') == 'America/Los_Angeles'
+
+    settings.set('theme', 'dark')
+    assert settings.get('theme') == 'dark'
+    with open(path) as f:
+        assert json.load(f) == {'timezone': 'America/Los_Angeles', 'theme': 'dark'}
+    assert os.listdir(tmp_path) == ['settings.json']
+
+def test_settings_tzinfo_cached(tmp_path):
+    """
+    tzinfo is built once, and again only after the timezone changes
+    """
+    pytest.importorskip("pytz")
+
+    path = str(tmp_path / 'settings.json')
+    settings = Settings(path)
+    settings.set('timezone', 'Asia/Tokyo')
+
+    tz = settings.tzinfo()
+    assert tz.zone == 'Asia/Tokyo'
+    assert settings.tzinfo() is tz
+
+    settings.set('timezone', 'Europe/Paris')
+    assert settings.tzinfo().zone == 'Europe/Paris'
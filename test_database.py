@@ -1,5 +1,8 @@
 import os
-from database import Database
+import sqlite3
+from datetime import datetime, timedelta
+import pytest
+from database import Database, apply_session_to_project_time
 
 def test_database():
     """
@@ -46,5 +49,503 @@ def test_database():
     
     print("\nDatabase test complete!")
 
+def count_saved_sessions(db_path):
+    """
+    Count sessions actually on disk (separate connection, ignores write-behind queue)
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM time_sessions').fetchone()[0]
+    finally:
+        conn.close()
+
+def test_write_behind_batches_sessions(tmp_path):
+    """
+    Sessions are queued until the batch is full, then written together
+    """
+    db_path = str(tmp_path / 'batch.db')
+    start = datetime(2025, 1, 1, 9, 0)
+
+    with Database(db_path, batch_size=3, flush_interval=3600) as db:
+        project_id = db.create_project("Batch Test")
+
+        for _ in range(2):
+            db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(minutes=1), 60)
+        assert count_saved_sessions(db_path) == 0
+
+        db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(minutes=1), 60)
+        assert count_saved_sessions(db_path) == 3
+
+def test_write_behind_flushes_on_read_and_close(tmp_path):
+    """
+    Queued sessions are visible to reads and written on close
+    """
+    db_path = str(tmp_path / 'flush.db')
+    start = datetime(2025, 1, 1, 9, 0)
+
+    with Database(db_path, batch_size=100, flush_interval=3600) as db:
+        project_id = db.create_project("Flush Test")
+        db.add_time_session(project_id, "PureRef.exe", start, start + timedelta(minutes=15), 900)
+
+        # reads see queued rows
+        assert db.get_project_time(project_id)['total_seconds'] == 900
+
+        db.add_time_session(project_id, "PureRef.exe", start, start + timedelta(minutes=5), 300)
+        assert count_saved_sessions(db_path) == 1
+
+    # close flushed the rest
+    assert count_saved_sessions(db_path) == 2
+
+def test_write_behind_flushes_when_due(tmp_path):
+    """
+    flush_if_due() writes once the oldest queued session is older than flush_interval
+    """
+    db_path = str(tmp_path / 'due.db')
+    start = datetime(2025, 1, 1, 9, 0)
+
+    with Database(db_path, batch_size=100, flush_interval=3600) as db:
+        project_id = db.create_project("Due Test")
+        db.add_time_session(project_id, "chrome.exe", start, start + timedelta(minutes=1), 60)
+
+        db.flush_if_due()
+        assert count_saved_sessions(db_path) == 0
+
+        db.flush_interval = 0
+        db.flush_if_due()
+        assert count_saved_sessions(db_path) == 1
+
+def test_bad_session_doesnt_block_the_queue(tmp_path):
+    """
+    A row that can't be written is parked in failed_sessions, the rest of its batch and later sessions still go in
+    """
+    with Database(str(tmp_path / 'poison.db'), batch_size=10) as db:
+        project_id = db.create_project("Queue")
+        start = datetime(2025, 1, 1, 9, 0)
+        db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(minutes=1), 60)
+        db.add_time_session(project_id, "krita.exe", "not a date", start, 60)
+        db.add_time_session(project_id, "PureRef.exe", start, start + timedelta(minutes=1), 60)
+
+        assert db.flush() == 2
+        db.add_time_session(project_id, "chrome.exe", start, start + timedelta(minutes=1), 60)
+        apps = [app['app_name'] for app in db.get_project_time(project_id)['app_breakdown']]
+        assert sorted(apps) == ["Photoshop.exe", "PureRef.exe", "chrome.exe"]
+        assert db.check_rollups() == []
+
+        # not lost, kept as queued with the reason
+        failed = db.get_failed_sessions()
+        assert len(failed) == 1
+        assert (failed[0]['app_name'], failed[0]['start_time'], failed[0]['duration']) == ("krita.exe", "not a date", 60)
+        assert failed[0]['error']
+
+    # a locked database isn't the row's fault, nothing gets parked and it stays queued
+    db = Database(str(tmp_path / 'locked.db'), batch_size=10)
+    try:
+        project_id = db.create_project("Locked")
+        db.add_time_session(project_id, "krita.exe", start, start + timedelta(minutes=1), 60)
+        blocker = sqlite3.connect(db.db_path)
+        blocker.execute('BEGIN IMMEDIATE')
+        db.conn.execute('PRAGMA busy_timeout = 0')
+        with pytest.raises(sqlite3.OperationalError):
+            db.flush()
+        blocker.rollback()
+        blocker.close()
+        assert len(db._pending_sessions) == 1
+        assert db.flush() == 1
+        assert db.get_failed_sessions() == []
+    finally:
+        db.close()
+
+def query_plans(db, func, *args):
+    """
+    Run a Database method and return the EXPLAIN QUERY PLAN details of every statement it ran
+    """
+    statements = []
+    db.set_trace_callback(statements.append)
+    try:
+        func(*args)
+    finally:
+        db.set_trace_callback(None)
+
+    plans = {}
+    for sql in statements:
+        if 'time_sessions' in sql and sql.lstrip().upper().startswith(('SELECT', 'UPDATE')):
+            rows = db.conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+            plans[sql] = ' | '.join(row['detail'] for row in rows)
+    return plans
+
+def test_migration_sets_schema_version(tmp_path):
+    """
+    New databases are stamped with the current schema version, reopening is a no-op
+    """
+    from database import SCHEMA_VERSION
+
+    db_path = str(tmp_path / 'version.db')
+    with Database(db_path):
+        pass
+    with Database(db_path) as db:
+        assert db.cursor.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+
+def test_session_aggregates_use_covering_index(tmp_path):
+    """
+    Report and edit queries search the covering index instead of scanning time_sessions
+    """
+    start = datetime(2025, 1, 1, 9, 0)
+
+    with Database(str(tmp_path / 'plan.db'), batch_size=1) as db:
+        project_id = db.create_project("Plan Test")
+        db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(minutes=1), 60)
+
+        plans = query_plans(db, db.get_project_time, project_id)
+        plans.update(query_plans(db, db.update_app_time_for_project, project_id, "Photoshop.exe", 120))
+        assert plans
+
+        for sql, plan in plans.items():
+            assert 'SCAN time_sessions' not in plan, sql
+            if sql.lstrip().upper().startswith('SELECT'):
+                assert 'COVERING INDEX idx_time_sessions_project_app' in plan, plan
+
+        # date ranges seek the integer start_us indexes
+        plans = query_plans(db, db.get_time_in_range, project_id, start, start + timedelta(days=1))
+        plans.update(query_plans(db, db.get_time_by_period, None, start, start + timedelta(days=7), 'week'))
+        range_plans = {sql: plan for sql, plan in plans.items() if 'start_us >= ' in sql}
+        assert len(range_plans) == 2
+        for plan in range_plans.values():
+            assert 'SCAN time_sessions' not in plan
+            assert 'COVERING INDEX idx_time_sessions_' in plan and 'start_us>?' in plan, plan
+
+def test_project_summaries(tmp_path):
+    """
+    get_project_summaries returns totals, session count, last activity and top app per project
+    """
+    start = datetime(2025, 1, 1, 9, 0)
+
+    with Database(str(tmp_path / 'summary.db')) as db:
+        art_id = db.create_project("Art")
+        empty_id = db.create_project("Empty")
+        db.add_time_session(art_id, "Photoshop.exe", start, start + timedelta(minutes=45), 2700)
+        db.add_time_session(art_id, "PureRef.exe", start, start + timedelta(minutes=15), 900)
+        db.add_time_session(art_id, "PureRef.exe", start, start + timedelta(minutes=50), 3000)
+
+        statements = []
+        db.set_trace_callback(statements.append)
+        summaries = {p['id']: p for p in db.get_project_summaries()}
+        db.set_trace_callback(None)
+
+        # one round-trip no matter how many projects
+        assert len([sql for sql in statements if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]) == 1
+
+        art = summaries[art_id]
+        assert art['name'] == "Art"
+        assert art['total_seconds'] == 6600
+        assert art['session_count'] == 3
+        assert art['top_app'] == "PureRef.exe"
+        assert art['last_activity'] == str(start + timedelta(minutes=50))
+
+        # halving PureRef's time pulls its sessions' ends in, Photoshop's 45 minutes is now the latest
+        db.update_app_time_for_project(art_id, "PureRef.exe", 1950)
+        art = {p['id']: p for p in db.get_project_summaries()}[art_id]
+        assert art['last_activity'] == str(start + timedelta(minutes=45))
+        assert db.check_rollups() == []
+
+        empty = summaries[empty_id]
+        assert empty['total_seconds'] == 0
+        assert empty['session_count'] == 0
+        assert empty['top_app'] is None
+        assert empty['last_activity'] is None
+
+def test_rollups_follow_sessions_and_edits(tmp_path):
+    """
+    project_app_totals matches the raw sessions after inserts and edits, and can be rebuilt
+    """
+    start = datetime(2025, 1, 1, 9, 0)
+
+    with Database(str(tmp_path / 'rollup.db'), batch_size=2) as db:
+        project_id = db.create_project("Rollup Test")
+        for minutes in (10, 20, 30):
+            db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(minutes=minutes), minutes * 60)
+        db.add_time_session(project_id, "PureRef.exe", start, start + timedelta(minutes=5), 300)
+
+        time_data = db.get_project_time(project_id)
+        assert time_data['total_seconds'] == 3900
+        assert time_data['app_breakdown'][0] == {'app_name': "Photoshop.exe", 'duration': 3600}
+        assert db.check_rollups() == []
+
+        db.update_app_time_for_project(project_id, "Photoshop.exe", 1800)
+        assert db.get_project_time(project_id)['total_seconds'] == 2100
+        assert db.check_rollups() == []
+
+        # damage the rollup, check notices, rebuild repairs
+        db.conn.execute(
+            'UPDATE project_app_totals SET total_duration = 1 WHERE app_id = (SELECT id FROM apps WHERE name = ?)',
+            ("PureRef.exe",)
+        )
+        db.conn.commit()
+        mismatches = db.check_rollups()
+        assert [m['app_name'] for m in mismatches] == ["PureRef.exe"]
+        assert mismatches[0]['expected_seconds'] == 300
+
+        db.rebuild_rollups()
+        assert db.check_rollups() == []
+        assert db.get_project_time(project_id)['total_seconds'] == 2100
+
+def make_original_database(db_path, sessions, project_id=1):
+    """
+    Database file as the very first version of the app wrote it (no migrations, TIMESTAMP text, app names per row)
+    sessions: (app_name, start_time, duration, calendar_event_id)
+    project_id: what the sessions are saved under (the first version allowed None)
+    """
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            status TEXT DEFAULT 'WIP',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE time_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER,
+            app_name TEXT NOT NULL,
+            start_time TIMESTAMP NOT NULL,
+            end_time TIMESTAMP NOT NULL,
+            duration REAL NOT NULL,
+            calendar_event_id TEXT,
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        );
+        INSERT INTO projects (name) VALUES ('Old Project');
+    ''')
+    for app_name, start_time, duration, calendar_event_id in sessions:
+        conn.execute(
+            '''
+            INSERT INTO time_sessions (project_id, app_name, start_time, end_time, duration, calendar_event_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''',
+            (project_id, app_name, str(start_time), str(start_time + timedelta(seconds=duration)), duration, calendar_event_id)
+        )
+    conn.commit()
+    conn.close()
+    return 1
+
+def test_rollups_backfilled_for_existing_database(tmp_path):
+    """
+    Upgrading an old database fills the rollup from sessions already saved
+    """
+    db_path = str(tmp_path / 'upgrade.db')
+    start = datetime(2025, 1, 1, 9, 0)
+    project_id = make_original_database(db_path, [
+        ("chrome.exe", start, 60, None),
+        ("Photoshop.exe", start, 30, None),
+        ("chrome.exe", start, 15, None),
+    ])
+
+    with Database(db_path) as db:
+        assert db.get_project_time(project_id)['total_seconds'] == 105
+        assert db.get_project_time(project_id)['app_breakdown'][0] == {'app_name': "chrome.exe", 'duration': 75}
+        assert db.check_rollups() == []
+
+def test_sessions_without_project_survive_migration(tmp_path):
+    """
+    project_id NULL was always allowed: old rows migrate, new ones save, neither goes in the rollup
+    """
+    db_path = str(tmp_path / 'no_project.db')
+    start = datetime(2025, 1, 1, 9, 0)
+    make_original_database(db_path, [("chrome.exe", start, 60, None)], project_id=None)
+
+    with Database(db_path) as db:
+        db.add_time_session(None, "krita.exe", start, start + timedelta(seconds=30), 30)
+        db.add_time_session(1, "krita.exe", start, start + timedelta(seconds=45), 45)
+        assert db.flush() == 2
+
+        rows = db.conn.execute('SELECT COUNT(*) FROM time_sessions WHERE project_id IS NULL').fetchone()[0]
+        assert rows == 2
+        assert db.get_project_time(1)['total_seconds'] == 45
+        assert db.check_rollups() == []
+
+def test_session_delta_matches_requery(tmp_path):
+    """
+    Applying saved sessions to a report's time_data gives what get_project_time would
+    """
+    start = datetime(2025, 1, 1, 9, 0)
+    sessions = [("Photoshop.exe", 600), ("PureRef.exe", 900), ("Photoshop.exe", 700), ("Code.exe", 30)]
+
+    with Database(str(tmp_path / 'delta.db')) as db:
+        project_id = db.create_project("Delta Test")
+        db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(seconds=100), 100)
+        time_data = db.get_project_time(project_id)
+
+        for app_name, duration in sessions:
+            db.add_time_session(project_id, app_name, start, start + timedelta(seconds=duration), duration)
+            apply_session_to_project_time(time_data, app_name, duration)
+
+        assert time_data == db.get_project_time(project_id)
+        assert [app['app_name'] for app in time_data['app_breakdown']] == ["Photoshop.exe", "PureRef.exe", "Code.exe"]
+
+def test_range_queries_split_sessions(tmp_path):
+    """
+    Range totals only count the part of a session inside the range, days/weeks split at midnight
+    """
+    with Database(str(tmp_path / 'range.db')) as db:
+        project_id = db.create_project("Range Test")
+        other_id = db.create_project("Other")
+
+        def add(project, app_name, start, minutes):
+            db.add_time_session(project, app_name, start, start + timedelta(minutes=minutes), minutes * 60)
+
+        # Sunday 5 Jan 2025 23:30 -> Monday 00:30, crosses a day and a week
+        add(project_id, "Photoshop.exe", datetime(2025, 1, 5, 23, 30), 60)
+        add(project_id, "PureRef.exe", datetime(2025, 1, 6, 9, 0), 15)
+        add(project_id, "Photoshop.exe", datetime(2025, 1, 8, 14, 0), 120)
+        add(other_id, "chrome.exe", datetime(2025, 1, 6, 10, 0), 30)
+
+        monday = db.get_time_in_range(project_id, datetime(2025, 1, 6), datetime(2025, 1, 7))
+        assert monday['total_seconds'] == 30 * 60 + 15 * 60
+        assert monday['app_breakdown'] == [
+            {'app_name': "Photoshop.exe", 'duration': 1800},
+            {'app_name': "PureRef.exe", 'duration': 900},
+        ]
+        # all projects
+        assert db.get_time_in_range(None, datetime(2025, 1, 6), datetime(2025, 1, 7))['total_seconds'] == 4500
+
+        days = db.get_time_by_period(project_id, datetime(2025, 1, 5, 12), datetime(2025, 1, 9), 'day')
+        assert [day['period_start'] for day in days] == [
+            datetime(2025, 1, 5, 12), datetime(2025, 1, 6), datetime(2025, 1, 7), datetime(2025, 1, 8)
+        ]
+        assert [day['total_seconds'] for day in days] == [1800, 2700, 0, 7200]
+        assert days[1]['app_breakdown'][0] == {'app_name': "Photoshop.exe", 'duration': 1800}
+
+        weeks = db.get_time_by_period(project_id, datetime(2025, 1, 1), datetime(2025, 1, 13), 'week')
+        assert [week['period_start'] for week in weeks] == [datetime(2025, 1, 1), datetime(2025, 1, 6)]
+        assert [week['total_seconds'] for week in weeks] == [1800, 1800 + 900 + 7200]
+
+        # editing an app's time moves where its sessions end
+        db.update_app_time_for_project(project_id, "Photoshop.exe", 90 * 60)
+        monday = db.get_time_in_range(project_id, datetime(2025, 1, 6), datetime(2025, 1, 7))
+        # 60 min session scaled to 30 -> 23:30-00:00, nothing left on Monday
+        assert monday['app_breakdown'] == [{'app_name': "PureRef.exe", 'duration': 900}]
+
+def test_range_queries_see_other_connections_sessions(tmp_path):
+    """
+    A long session saved by another Database (the service, say) still shows up in range queries here (the GUI)
+    """
+    db_path = str(tmp_path / 'span.db')
+    with Database(db_path) as gui, Database(db_path) as service:
+        project_id = gui.create_project("Span")
+        gui.add_time_session(project_id, "PureRef.exe", datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 9, 5), 300)
+        assert gui.get_time_in_range(project_id, datetime(2025, 1, 6, 10), datetime(2025, 1, 6, 11))['total_seconds'] == 0
+
+        service.add_time_session(project_id, "Photoshop.exe", datetime(2025, 1, 6, 8), datetime(2025, 1, 6, 12), 4 * 3600)
+        service.flush()
+        assert gui.get_time_in_range(project_id, datetime(2025, 1, 6, 10), datetime(2025, 1, 6, 11))['total_seconds'] == 3600
+
+def test_compact_migration_keeps_sessions(tmp_path):
+    """
+    Upgrading moves app names to the apps table and times to exact epoch microseconds,
+    session ids (and with them calendar event/outbox links) are kept
+    """
+    db_path = str(tmp_path / 'compact.db')
+    start = datetime(2025, 3, 1, 8, 15, 30, 123456)
+    project_id = make_original_database(db_path, [
+        ("Photoshop.exe", start, 90.4, "evt-1"),
+        ("PureRef.exe", start + timedelta(minutes=5), 30, None),
+        ("Photoshop.exe", start + timedelta(days=1), 60, None),
+    ])
+
+    with Database(db_path) as db:
+        assert [row['name'] for row in db.conn.execute('SELECT name FROM apps ORDER BY id')] == [
+            "Photoshop.exe", "PureRef.exe"
+        ]
+        columns = [row['name'] for row in db.conn.execute('PRAGMA table_info(time_sessions)')]
+        assert 'app_name' not in columns and 'start_time' not in columns
+
+        rows = db.conn.execute('SELECT id, app_id, start_us, end_us, calendar_event_id FROM time_sessions ORDER BY id').fetchall()
+        start_us = int(start.replace(microsecond=0).timestamp()) * 1_000_000 + 123456
+        assert [tuple(row) for row in rows][0] == (1, 1, start_us, start_us + 90_400_000, "evt-1")
+        assert [row['id'] for row in rows] == [1, 2, 3]
+
+        # same answers as before the upgrade
+        assert db.get_time_in_range(project_id, datetime(2025, 3, 1), datetime(2025, 3, 2))['total_seconds'] == 120.4
+        summary = db.get_project_summaries()[0]
+        assert summary['top_app'] == "Photoshop.exe"
+        assert summary['last_activity'] == str(start + timedelta(days=1, seconds=60))
+
+        # new sessions of known apps reuse their id
+        db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(seconds=5), 5)
+        db.add_time_session(project_id, "Code.exe", start, start + timedelta(seconds=5), 5)
+        db.flush()
+        assert db.conn.execute('SELECT COUNT(*) FROM apps').fetchone()[0] == 3
+        assert db.check_rollups() == []
+
+def test_reads_not_blocked_by_open_write(tmp_path):
+    """
+    WAL + per-thread readers: a report on another thread sees the last commit while a write is still open
+    """
+    import threading
+
+    start = datetime(2025, 1, 1, 9, 0)
+
+    with Database(str(tmp_path / 'wal.db'), batch_size=1) as db:
+        assert db.conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        project_id = db.create_project("WAL")
+        db.add_time_session(project_id, "Photoshop.exe", start, start + timedelta(minutes=1), 60)
+
+        results = {}
+        def report():
+            # runs while the writer holds the lock and has uncommitted rows
+            results['time'] = db.get_project_time(project_id)['total_seconds']
+            results['projects'] = [p['name'] for p in db.get_all_projects()]
+
+        with db._lock:
+            db.conn.execute('BEGIN IMMEDIATE')
+            db.conn.execute("INSERT INTO projects (name) VALUES ('Uncommitted')")
+            reader = threading.Thread(target=report)
+            reader.start()
+            reader.join(timeout=5)
+            assert not reader.is_alive()
+            db.conn.rollback()
+
+        assert results == {'time': 60, 'projects': ["WAL"]}
+        # the thread read on a pooled connection, not the writer, and handed it back
+        assert len(db._idle_readers) == 1 and db._idle_readers[0] is not db.conn
+
+def test_reader_connections_dont_pile_up(tmp_path):
+    """
+    Short-lived threads share a few pooled read connections instead of leaving one open each
+    """
+    import threading
+
+    with Database(str(tmp_path / 'pool.db'), max_idle_readers=2) as db:
+        project_id = db.create_project("Pool")
+        db.add_time_session(project_id, "Photoshop.exe", datetime(2025, 1, 1, 9), datetime(2025, 1, 1, 9, 1), 60)
+        db.flush()
+
+        reused = set()
+        def report():
+            assert db.get_project_time(project_id)['total_seconds'] == 60
+            reused.add(id(db._idle_readers[-1]))
+
+        for _ in range(50):
+            thread = threading.Thread(target=report)
+            thread.start()
+            thread.join()
+        # one after another, they all got the same connection
+        assert len(reused) == 1 and len(db._idle_readers) == 1
+
+        # all at once: as many connections as needed, only max_idle_readers kept
+        barrier = threading.Barrier(20)
+        def read_together():
+            with db._reader() as conn:
+                barrier.wait(timeout=5)
+                conn.execute('SELECT COUNT(*) FROM time_sessions').fetchone()
+        threads = [threading.Thread(target=read_together) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(db._idle_readers) == 2
+
+    # close() closed the pooled ones
+    assert db._idle_readers == []
+
 if __name__ == "__main__":
-    test_database()
\ No newline at end of file
+    test_database()
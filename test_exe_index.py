@@ -0,0 +1,79 @@
+import os
+from exe_index import ExeIndex
+
+def make_tree(base, files):
+    for relative in files:
+        path = base / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'MZ')
+
+def bump_mtime(path):
+    """Make sure a folder's mtime differs from what was indexed (coarse filesystem clocks)"""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def test_index_finds_exes_in_one_pass(tmp_path):
+    """
+    One scan finds every exe (case-insensitive), respects depth, earlier roots win
+    """
+    first, second = tmp_path / 'Program Files', tmp_path / 'Local'
+    make_tree(first, ['Adobe/Photoshop 2025/Photoshop.exe', 'Tool/readme.txt', 'a/b/c/d/e/deep.exe'])
+    make_tree(second, ['Discord/app-1.0/Discord.exe', 'Other/Photoshop.exe'])
+
+    index = ExeIndex(roots=[str(first), str(second), str(tmp_path / 'missing')], path=None, max_depth=3)
+    assert index.find('photoshop.exe') == str(first / 'Adobe' / 'Photoshop 2025' / 'Photoshop.exe')
+    assert index.find('Discord.exe') == str(second / 'Discord' / 'app-1.0' / 'Discord.exe')
+    assert index.find('readme.txt') is None
+    # below max_depth
+    assert index.find('deep.exe') is None
+
+def test_index_persists_and_refreshes_changed_folders_only(tmp_path):
+    """
+    Next launch loads the saved index, refresh only lists folders whose mtime changed
+    """
+    root = tmp_path / 'apps'
+    make_tree(root, ['Photoshop/Photoshop.exe', 'Code/Code.exe', 'Old/old.exe', 'Misc/x/y.txt'])
+    index_path = str(tmp_path / 'exe_index.json')
+
+    index = ExeIndex(roots=[str(root)], path=index_path)
+    index.build()
+    assert index.dirs_listed == 6
+
+    # next launch: no scanning at all for known apps
+    index = ExeIndex(roots=[str(root)], path=index_path)
+    assert index.find('Code.exe') == str(root / 'Code' / 'Code.exe')
+    assert index.dirs_listed == 0
+
+    # install one app, uninstall another
+    make_tree(root, ['Code/CodeHelper.exe', 'New/bin/new.exe'])
+    (root / 'Old' / 'old.exe').unlink()
+    (root / 'Old').rmdir()
+    bump_mtime(root)
+    bump_mtime(root / 'Code')
+
+    # apps/, apps/Code/ and the two new folders
+    assert index.refresh() == 4
+    assert index.find('CodeHelper.exe') == str(root / 'Code' / 'CodeHelper.exe')
+    assert index.find('new.exe') == str(root / 'New' / 'bin' / 'new.exe')
+    assert index.find('old.exe') is None
+
+    # nothing changed since
+    assert index.refresh() == 0
+
+def test_miss_triggers_rate_limited_refresh(tmp_path):
+    """
+    Looking up an app installed after the last scan refreshes the index (not more often than asked)
+    """
+    root = tmp_path / 'apps'
+    make_tree(root, ['A/a.exe'])
+    index = ExeIndex(roots=[str(root)], path=None, refresh_interval=0)
+    assert index.find('a.exe')
+
+    make_tree(root, ['B/b.exe'])
+    bump_mtime(root)
+    assert index.find('b.exe') == str(root / 'B' / 'b.exe')
+
+    index.refresh_interval = 3600
+    make_tree(root, ['C/c.exe'])
+    bump_mtime(root)
+    assert index.find('c.exe') is None
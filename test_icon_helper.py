@@ -0,0 +1,88 @@
+import os
+import pytest
+from icon_helper import IconCache
+
+class CountingResolver:
+    """
+    Stand-in for find_executable_path, counts the (slow) searches
+    """
+    def __init__(self, paths):
+        self.paths = dict(paths)
+        self.calls = []
+
+    def __call__(self, app_name):
+        self.calls.append(app_name)
+        return self.paths.get(app_name)
+
+def make_exe(tmp_path, name):
+    path = tmp_path / 'apps' / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b'MZ')
+    return str(path)
+
+def test_paths_persist_across_launches(tmp_path):
+    """
+    A second cache on the same folder (= next launch) doesn't search again, misses included
+    """
+    exe = make_exe(tmp_path, "Photoshop.exe")
+    cache_dir = str(tmp_path / 'icon_cache')
+
+    resolver = CountingResolver({"Photoshop.exe": exe})
+    first = IconCache(cache_dir)
+    assert first.get_path("Photoshop.exe", resolver) == exe
+    assert first.get_path("gone.exe", resolver) is None
+    assert first.get_path("Photoshop.exe", resolver) == exe
+    assert resolver.calls == ["Photoshop.exe", "gone.exe"]
+
+    resolver = CountingResolver({"Photoshop.exe": exe})
+    second = IconCache(cache_dir)
+    assert second.get_path("Photoshop.exe", resolver) == exe
+    assert second.get_path("gone.exe", resolver) is None
+    assert resolver.calls == []
+
+def test_moved_exe_is_searched_again(tmp_path):
+    """
+    A cached path that no longer exists (app updated/uninstalled) is resolved again
+    """
+    old_exe = make_exe(tmp_path, "Discord.exe")
+    cache = IconCache(str(tmp_path / 'icon_cache'))
+    cache.get_path("Discord.exe", CountingResolver({"Discord.exe": old_exe}))
+
+    os.remove(old_exe)
+    new_exe = make_exe(tmp_path, "Discord2.exe")
+    resolver = CountingResolver({"Discord.exe": new_exe})
+    assert cache.get_path("Discord.exe", resolver) == new_exe
+    assert resolver.calls == ["Discord.exe"]
+
+def test_icons_cached_in_memory_and_on_disk(tmp_path):
+    """
+    Icons are extracted once per exe version, the memory cache is bounded
+    """
+    Image = pytest.importorskip("PIL.Image")
+
+    exes = {name: make_exe(tmp_path, name) for name in ("a.exe", "b.exe", "c.exe")}
+    cache_dir = str(tmp_path / 'icon_cache')
+    extracted = []
+
+    def extract(exe_path, size):
+        extracted.append(exe_path)
+        return Image.new('RGBA', (size, size), (255, 0, 0, 255))
+
+    cache = IconCache(cache_dir, maxsize=2)
+    for name in ("a.exe", "b.exe", "c.exe", "a.exe"):
+        assert cache.get_icon(name, 32, CountingResolver(exes), extract).size == (32, 32)
+    # a.exe fell out of memory but came back from its PNG
+    assert extracted == [exes["a.exe"], exes["b.exe"], exes["c.exe"]]
+    assert len(cache._icons) == 2
+
+    # next launch: nothing searched or extracted
+    resolver = CountingResolver(exes)
+    icon = IconCache(cache_dir).get_icon("b.exe", 32, resolver, extract)
+    assert icon.getpixel((0, 0)) == (255, 0, 0, 255)
+    assert resolver.calls == [] and len(extracted) == 3
+
+    # exe updated = new mtime = extracted again, old PNG removed
+    os.utime(exes["b.exe"], ns=(0, 10**18))
+    IconCache(cache_dir).get_icon("b.exe", 32, resolver, extract)
+    assert len(extracted) == 4
+    assert len([f for f in os.listdir(cache_dir) if f.endswith('.png')]) == 3
@@ -0,0 +1,65 @@
+import threading
+from icon_loader import IconLoader
+
+class FakeWindow:
+    """
+    Stand-in for a Tk window: after() queues callbacks, run_pending() plays them (= mainloop)
+    """
+    def __init__(self):
+        self.queue = []
+        self.lock = threading.Lock()
+
+    def after(self, ms, func, *args):
+        with self.lock:
+            self.queue.append((func, args))
+
+    def run_pending(self):
+        with self.lock:
+            queue, self.queue = self.queue, []
+        for func, args in queue:
+            func(*args)
+
+def test_request_returns_before_slow_lookup():
+    """
+    Requests don't block, callers for the same app share one lookup, results come back via after()
+    """
+    release = threading.Event()
+    loads = []
+
+    def slow_load(app_name, size):
+        loads.append(app_name)
+        release.wait(5)
+        return f"icon:{app_name}:{size}"
+
+    loader = IconLoader(load=slow_load, peek=lambda app_name, size: None, max_workers=2)
+    window = FakeWindow()
+    got = []
+
+    for app_name in ["Photoshop.exe", "Photoshop.exe", "chrome.exe"]:
+        assert loader.request(window, app_name, got.append) is False
+    assert got == []
+    assert loader.pending_count() == 2
+
+    release.set()
+    loader.shutdown()
+    loader._executor.shutdown(wait=True)
+
+    assert sorted(loads) == ["Photoshop.exe", "chrome.exe"]
+    # nothing delivered until the Tk thread runs the queued callbacks
+    assert got == []
+    window.run_pending()
+    assert sorted(got) == ["icon:Photoshop.exe:32", "icon:Photoshop.exe:32", "icon:chrome.exe:32"]
+    assert loader.pending_count() == 0
+
+def test_cached_icon_delivered_immediately():
+    """
+    Icons already in memory skip the pool entirely
+    """
+    def load(app_name, size):
+        raise AssertionError("shouldn't be loaded")
+
+    loader = IconLoader(load=load, peek=lambda app_name, size: "cached")
+    got = []
+    assert loader.request(FakeWindow(), "Code.exe", got.append) is True
+    assert got == ["cached"]
+    loader.shutdown()
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from idle_source import MonotonicIdleSource, FakeIdleSource
+from window_source import ScriptedWindowSource, track_foreground
+
+START = datetime(2025, 1, 1, 9, 0).astimezone()
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+class FakeMonotonic:
+    """
+    Monotonic seconds that only move when told to
+    """
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+def test_monotonic_source_resets_on_probe_change():
+    """
+    Idle time grows while the probe returns the same value, resets when it changes
+    """
+    clock = FakeMonotonic()
+    position = [(10, 10)]
+    source = MonotonicIdleSource(probe=lambda: position[0], clock=clock)
+
+    clock.now += 30
+    assert source.idle_seconds() == 30
+
+    position[0] = (11, 10)
+    assert source.idle_seconds() == 0
+    clock.now += 5
+    assert source.idle_seconds() == 5
+
+    # keyboard etc. can report activity directly
+    source.touch()
+    assert source.idle_seconds() == 0
+
+def test_idle_session_is_backdated_to_last_input(tmp_path):
+    """
+    Going idle ends the app session at the last input, not when the threshold trips
+    """
+    from database import Database, _from_epoch_us
+    from clock import aware
+    from tracker_with_db import ProjectTimeTracker
+
+    # Photoshop from 0, last input at 60s, idle threshold (300s) trips at 360s, back at 600s
+    source = ScriptedWindowSource([
+        (at(0), "Photoshop.exe"),
+        (at(600), "Photoshop.exe"),
+    ])
+    idle = FakeIdleSource(clock=source.now, last_input=at(0))
+
+    class Tracker(ProjectTimeTracker):
+        def update(self, app_name, now=None):
+            if now <= at(60) or now >= at(600):
+                idle.input_at(now)
+            super().update(app_name, now)
+
+    with Database(str(tmp_path / 'idle.db')) as db:
+        project_id = db.create_project("Idle Test")
+        tracker = Tracker(db, project_id, threshold_seconds=30, sync_calendar=False, idle_source=idle)
+
+        track_foreground(source, tracker, lambda: not source.done, heartbeat=60.0)
+        tracker.update("chrome.exe", at(700))
+
+        db.flush()
+        rows = db.conn.execute(
+            'SELECT a.name, s.start_us, s.duration FROM time_sessions s JOIN apps a ON a.id = s.app_id ORDER BY s.id'
+        ).fetchall()
+        assert [(name, aware(_from_epoch_us(start_us)), duration) for name, start_us, duration in rows] == [
+            ("Photoshop.exe", at(0), 60.0),
+            ("Idle", at(60), 540.0),
+            ("Photoshop.exe", at(600), 100.0),
+        ]
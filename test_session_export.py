@@ -0,0 +1,74 @@
+import csv
+import json
+import os
+from datetime import datetime, timedelta
+import pytest
+from database import Database
+from session_export import export_sessions, format_for, main, ExportError
+
+START = datetime(2025, 1, 1, 9, 0)
+
+@pytest.fixture
+def db(tmp_path):
+    with Database(str(tmp_path / 'export.db')) as db:
+        art = db.create_project("Art")
+        other = db.create_project("Other")
+        for i in range(10):
+            start = START + timedelta(hours=i)
+            db.add_time_session(art, "Photoshop.exe", start, start + timedelta(minutes=30), 1800.5)
+        db.add_time_session(other, "krita.exe", START, START + timedelta(minutes=5), 300)
+        db.flush()
+        db.art, db.other = art, other
+        yield db
+
+def test_csv_streams_in_batches_with_progress(db, tmp_path):
+    """
+    A project's sessions, oldest first, written a batch at a time
+    """
+    path = str(tmp_path / 'art.csv')
+    progress = []
+    assert export_sessions(db, path, project_id=db.art, batch_size=4, progress=lambda *p: progress.append(p)) == 10
+    assert progress == [(4, 10), (8, 10), (10, 10)]
+
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['project_name'] for row in rows] == ["Art"] * 10
+    assert float(rows[0]['duration']) == 1800.5
+    # aware local times, same instants as stored (end = start + duration)
+    assert datetime.fromisoformat(rows[0]['start_time']).timestamp() == START.timestamp()
+    last_end = START + timedelta(hours=9, seconds=1800.5)
+    assert datetime.fromisoformat(rows[-1]['end_time']).timestamp() == last_end.timestamp()
+
+def test_jsonl_date_range_all_projects(db, tmp_path):
+    """
+    Sessions overlapping [start, end) from every project
+    """
+    path = str(tmp_path / 'morning.jsonl')
+    count = export_sessions(db, path, start=START + timedelta(minutes=2), end=START + timedelta(hours=2))
+    assert count == 3
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(record['app_name'] for record in records) == ["Photoshop.exe", "Photoshop.exe", "krita.exe"]
+
+def test_parquet(db, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'all.parquet')
+    assert export_sessions(db, path, batch_size=5) == 11
+    table = pq.read_table(path)
+    assert table.num_rows == 11
+    assert table.column('start_time').type.tz == 'UTC'
+
+def test_bad_format_and_cli(db, tmp_path):
+    """
+    Unknown formats are refused, the CLI exports with the same options
+    """
+    with pytest.raises(ExportError):
+        format_for('sessions.xlsx')
+    assert format_for('sessions.ndjson') == 'jsonl'
+
+    path = str(tmp_path / 'cli.csv')
+    assert main([path, '--db', db.db_path, '--project', str(db.other), '--quiet']) == 0
+    with open(path, newline='') as f:
+        assert [row['app_name'] for row in csv.DictReader(f)] == ["krita.exe"]
+    assert not os.path.exists(path + '.tmp')
@@ -0,0 +1,162 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from database import Database
+from idle_source import FakeIdleSource
+from window_source import ScriptedWindowSource
+from tracker_engine import TrackingEngine
+from session_journal import SessionJournal
+
+START = datetime(2025, 1, 1, 9, 0).astimezone()
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+def sessions(db):
+    db.flush()
+    rows = db.conn.execute(
+        'SELECT a.name AS app_name, s.duration FROM time_sessions s JOIN apps a ON a.id = s.app_id ORDER BY s.id'
+    ).fetchall()
+    return [(row['app_name'], row['duration']) for row in rows]
+
+def test_recovers_interrupted_session_once(tmp_path):
+    """
+    The last complete checkpoint comes back as a session, a half-written line is ignored
+    """
+    db_path = str(tmp_path / 'journal.db')
+    journal = SessionJournal.for_database(db_path, fsync=False)
+
+    with Database(db_path) as db:
+        project_id = db.create_project("Journal")
+        journal.checkpoint(project_id, "Photoshop.exe", at(0), at(30))
+        journal.checkpoint(project_id, "Photoshop.exe", at(0), at(3600))
+        # killed mid-write
+        with open(journal.path, 'a') as f:
+            f.write('{"project_id": 1, "app_na')
+
+        assert journal.last()['seen'] == at(3600)
+        recovered = journal.recover(db)
+        assert recovered['duration'] == 3600
+        assert not os.path.exists(journal.path)
+        # nothing left the next time round
+        assert journal.recover(db) is None
+        assert sessions(db) == [("Photoshop.exe", 3600.0)]
+
+def test_recover_skips_sessions_already_saved(tmp_path):
+    """
+    Session ended and was written, the crash came before the next checkpoint
+    """
+    db_path = str(tmp_path / 'saved.db')
+    journal = SessionJournal.for_database(db_path, fsync=False)
+
+    with Database(db_path) as db:
+        project_id = db.create_project("Saved")
+        journal.checkpoint(project_id, "krita.exe", at(0), at(60))
+        db.add_time_session(project_id, "krita.exe", at(0), at(90), 90)
+        db.flush()
+
+        assert journal.recover(db) is None
+        assert sessions(db) == [("krita.exe", 90.0)]
+
+def test_journal_stays_small(tmp_path):
+    """
+    Checkpoints are throttled to interval, and the file is rewritten once it hits max_bytes
+    """
+    now = [0.0]
+    journal = SessionJournal(str(tmp_path / 'small.session'), interval=30, max_bytes=300, fsync=False,
+                             clock=lambda: now[0])
+    assert journal.due()
+    assert not journal.due()
+    now[0] = 30.0
+    assert journal.due()
+
+    for i in range(50):
+        journal.checkpoint(1, "Photoshop.exe", at(0), at(i))
+    assert os.path.getsize(journal.path) < 400
+    assert journal.last()['seen'] == at(49)
+
+def test_engine_checkpoints_and_clears_on_clean_stop(tmp_path):
+    """
+    The engine checkpoints while tracking, a clean stop leaves nothing to recover
+    """
+    db_path = str(tmp_path / 'engine.db')
+    journal = SessionJournal.for_database(db_path, interval=0, fsync=False)
+    source = ScriptedWindowSource([(at(0), "Photoshop.exe"), (at(95), "PureRef.exe"), (at(160), "chrome.exe")])
+
+    with Database(db_path) as db:
+        project_id = db.create_project("Engine")
+        engine = TrackingEngine(
+            db, project_id, source, threshold_seconds=30, idle_source=FakeIdleSource(clock=lambda: START),
+            heartbeat=None, keep_running=lambda: not source.done, journal=journal
+        )
+        asyncio.run(engine.run())
+
+        assert journal.checkpoints == 3
+        assert not os.path.exists(journal.path)
+        assert sessions(db) == [("Photoshop.exe", 95.0), ("PureRef.exe", 65.0)]
+
+def test_clean_stop_saves_open_session(tmp_path):
+    """
+    Stopping saves the open session up to the stop (a crash would have recovered it), then clears the journal
+    """
+    db_path = str(tmp_path / 'stop.db')
+    journal = SessionJournal.for_database(db_path, interval=0, fsync=False)
+    source = ScriptedWindowSource([(at(0), "Photoshop.exe"), (at(95), "PureRef.exe")])
+
+    with Database(db_path) as db:
+        project_id = db.create_project("Stop")
+        engine = TrackingEngine(
+            db, project_id, source, threshold_seconds=30, idle_source=FakeIdleSource(clock=lambda: START),
+            heartbeat=None, keep_running=lambda: source.now() < at(200), journal=journal
+        )
+        asyncio.run(engine.run())
+
+        assert not os.path.exists(journal.path)
+        assert sessions(db) == [("Photoshop.exe", 95.0), ("PureRef.exe", 105.0)]
+
+def test_checkpoint_errors_are_logged(tmp_path, caplog):
+    """
+    A checkpoint that blows up (not just OSError) is logged, tracking and saving carry on
+    """
+    class BrokenJournal(SessionJournal):
+        def checkpoint(self, *args):
+            raise ValueError("journal broke")
+
+    db_path = str(tmp_path / 'broken.db')
+    journal = BrokenJournal(db_path + '.session', interval=0, fsync=False)
+    source = ScriptedWindowSource([(at(0), "Photoshop.exe"), (at(95), "PureRef.exe"), (at(160), "chrome.exe")])
+
+    with Database(db_path) as db:
+        project_id = db.create_project("Broken")
+        engine = TrackingEngine(
+            db, project_id, source, threshold_seconds=30, idle_source=FakeIdleSource(clock=lambda: START),
+            heartbeat=None, keep_running=lambda: not source.done, journal=journal
+        )
+        asyncio.run(engine.run())
+
+        assert "Couldn't checkpoint the open session" in caplog.text and "journal broke" in caplog.text
+        assert sessions(db) == [("Photoshop.exe", 95.0), ("PureRef.exe", 65.0)]
+
+def test_service_recovers_on_startup(tmp_path):
+    """
+    Journal left behind by a crash is saved when the service starts listening
+    """
+    from tracker_service import TrackerService
+
+    db_path = str(tmp_path / 'service.db')
+    with Database(db_path) as db:
+        project_id = db.create_project("Crashed")
+    SessionJournal.for_database(db_path).checkpoint(project_id, "Photoshop.exe", at(0), at(7200))
+
+    service = TrackerService(db_path, port=0, sync_calendar=False, idle_source=FakeIdleSource(),
+                             token_path=str(tmp_path / 'service.token'))
+    try:
+        # nothing recovered until the port is ours
+        assert service.db.get_project_time(project_id)['app_breakdown'] == []
+        service.listen()
+        breakdown = service.db.get_project_time(project_id)['app_breakdown']
+        assert [(app['app_name'], app['duration']) for app in breakdown] == [("Photoshop.exe", 7200.0)]
+    finally:
+        if service.server:
+            service.server.server_close()
+        service.db.close()
@@ -0,0 +1,140 @@
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from database import Database
+from idle_source import FakeIdleSource
+from window_source import ScriptedWindowSource, PollingWindowSource
+from tracker_engine import TrackingEngine, MeteredQueue
+
+START = datetime(2025, 1, 1, 9, 0).astimezone()
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+def always_active():
+    """Idle source that never goes idle (the scripted clock runs ahead on the capture thread)"""
+    return FakeIdleSource(clock=lambda: START)
+
+def saved_sessions(db):
+    db.flush()
+    rows = db.conn.execute(
+        'SELECT a.name AS app_name, s.duration FROM time_sessions s JOIN apps a ON a.id = s.app_id ORDER BY s.id'
+    ).fetchall()
+    return [(row['app_name'], row['duration']) for row in rows]
+
+class SlowDatabase(Database):
+    """
+    Database whose commits take a while (slow disk)
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flushes = 0
+
+    def flush(self):
+        if self._pending_sessions:
+            self.flushes += 1
+            time.sleep(0.05)
+        return super().flush()
+
+def test_engine_saves_exact_switch_times(tmp_path):
+    """
+    Sessions come out the same as the single-threaded loop, timestamps from the source
+    """
+    source = ScriptedWindowSource([
+        (at(0), "Photoshop.exe"),
+        (at(95.5), "PureRef.exe"),
+        (at(100), "Photoshop.exe"),
+        (at(160), "chrome.exe"),
+    ])
+
+    with Database(str(tmp_path / 'engine.db')) as db:
+        project_id = db.create_project("Engine")
+        engine = TrackingEngine(
+            db, project_id, source, threshold_seconds=30, idle_source=always_active(),
+            heartbeat=None, keep_running=lambda: not source.done
+        )
+        asyncio.run(engine.run())
+
+        assert saved_sessions(db) == [("Photoshop.exe", 95.5), ("Photoshop.exe", 60.0)]
+
+def test_slow_writes_queue_up_instead_of_blocking_capture(tmp_path):
+    """
+    While a commit is in progress switches keep being tracked, finished sessions wait in the
+    sessions queue and go in together
+    """
+    switches = [(at(i * 35), "Photoshop.exe" if i % 2 else "krita.exe") for i in range(21)]
+    source = ScriptedWindowSource(switches)
+
+    with SlowDatabase(str(tmp_path / 'slow.db'), batch_size=1000) as db:
+        project_id = db.create_project("Slow")
+        engine = TrackingEngine(
+            db, project_id, source, threshold_seconds=30, idle_source=always_active(),
+            heartbeat=None, keep_running=lambda: not source.done
+        )
+        asyncio.run(engine.run())
+
+        assert len(saved_sessions(db)) == 20
+        metrics = engine.metrics()
+        assert metrics['sessions']['high_water'] > 1
+        assert metrics['sessions']['puts'] == 21 # + end marker
+        # far fewer commits than sessions
+        assert db.flushes < 10
+
+def test_idle_ticks_end_sessions(tmp_path):
+    """
+    With no switches, heartbeat ticks still notice the user went idle
+    """
+    now = [START]
+    clock = lambda: now[0]
+    idle = FakeIdleSource(clock=clock)
+    updates = []
+    saved = threading.Event()
+    source = PollingWindowSource(get_app=lambda: "Photoshop.exe", min_interval=0.01, max_interval=0.01)
+    source.start()
+
+    with Database(str(tmp_path / 'idle.db')) as db:
+        project_id = db.create_project("Idle")
+        engine = TrackingEngine(
+            db, project_id, source, threshold_seconds=30, idle_source=idle,
+            heartbeat=0.01, clock=clock, on_update=updates.append, on_session_saved=lambda *session: saved.set()
+        )
+        thread = threading.Thread(target=asyncio.run, args=(engine.run(),))
+        thread.start()
+        try:
+            deadline = time.monotonic() + 5
+            while not updates and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            # last input 50s in, nothing for 6 mins after
+            idle.input_at(at(50))
+            now[0] = at(410)
+            assert saved.wait(5)
+        finally:
+            engine.stop()
+            thread.join(timeout=5)
+
+        # stopping saves the open idle session too
+        assert saved_sessions(db) == [("Photoshop.exe", 50.0), ("Idle", 360.0)]
+
+def test_metered_queue_counts_backpressure():
+    """
+    Full queue: put() waits (and is counted), offer() drops
+    """
+    async def scenario():
+        queue = MeteredQueue('test', 1)
+        await queue.put('a')
+        assert queue.offer('b') is False
+
+        blocked = asyncio.create_task(queue.put('c'))
+        await asyncio.sleep(0.02)
+        assert await queue.get() == 'a'
+        await blocked
+        assert await queue.get() == 'c'
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['puts'] == 2 and stats['gets'] == 2
+    assert stats['dropped'] == 1
+    assert stats['blocked_puts'] == 1 and stats['blocked_seconds'] >= 0.01
+    assert stats['high_water'] == 1 and stats['depth'] == 0
@@ -0,0 +1,244 @@
+import os
+import time
+import threading
+import pytest
+from database import Database
+from idle_source import FakeIdleSource
+from window_source import PollingWindowSource
+from tracker_service import TrackerService, TrackerClient, ServiceError
+
+class FakeForeground:
+    """
+    Foreground app the test switches by hand
+    """
+    def __init__(self, app):
+        self.app = app
+
+    def get_app(self):
+        # an exception "app" breaks the window source, like a failing OS call
+        if isinstance(self.app, Exception):
+            raise self.app
+        return self.app
+
+    def source(self):
+        source = PollingWindowSource(get_app=self.get_app, min_interval=0.01, max_interval=0.01)
+        source.start()
+        return source
+
+def run_service(tmp_path, sync_calendar=False):
+    """Service on a free port, answering from a background thread"""
+    foreground = FakeForeground("Photoshop.exe")
+    service = TrackerService(
+        str(tmp_path / 'service.db'), port=0, threshold_seconds=0, sync_calendar=sync_calendar,
+        window_source_factory=foreground.source, idle_source=FakeIdleSource(),
+        token_path=str(tmp_path / 'service.token')
+    )
+    service.foreground = foreground
+    service.listen()
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    thread.start()
+    return service, thread
+
+@pytest.fixture
+def service(tmp_path):
+    service, thread = run_service(tmp_path)
+    yield service
+    service.shutdown()
+    thread.join(timeout=5)
+
+def wait_for(events, condition):
+    """Next event matching condition"""
+    for event in events:
+        if condition(event):
+            return event
+    raise AssertionError("stream ended")
+
+def test_client_controls_tracking_and_gets_events(service, tmp_path):
+    """
+    start/status/stop over the socket, saved sessions and app switches are streamed to subscribers
+    """
+    with Database(str(tmp_path / 'service.db')) as db:
+        project_id = db.create_project("Service")
+
+    client = TrackerClient(port=service.port, token_path=service.token_path)
+    assert client.status()['tracking'] is False
+
+    events = client.subscribe()
+    assert next(events)['tracking'] is False
+
+    status = client.start(project_id)
+    assert status['tracking'] and status['project_name'] == "Service"
+    assert wait_for(events, lambda e: e['event'] == 'state')['tracking'] is True
+    # same project again is fine, a different one isn't
+    client.start(project_id)
+
+    service.foreground.app = "PureRef.exe"
+    # the switch saves the Photoshop session, then reports the new app
+    session = wait_for(events, lambda e: e['event'] == 'session')
+    assert session['app_name'] == "Photoshop.exe" and session['project_id'] == project_id
+    assert wait_for(events, lambda e: e['event'] == 'app')['app_name'] == "PureRef.exe"
+    assert client.status()['current_app'] == "PureRef.exe"
+
+    status = client.stop()
+    assert status['tracking'] is False
+    assert wait_for(events, lambda e: e['event'] == 'state')['tracking'] is False
+    events.close()
+
+    # stop wrote the queued session and the open one, another process reading the db sees them
+    with Database(str(tmp_path / 'service.db')) as db:
+        breakdown = db.get_project_time(project_id)['app_breakdown']
+        assert sorted(app['app_name'] for app in breakdown) == ["Photoshop.exe", "PureRef.exe"]
+
+def test_second_service_leaves_running_session_alone(service, tmp_path):
+    """
+    A second service on the same db can't bind the port, and doesn't "recover" the live session's checkpoint
+    """
+    db_path = str(tmp_path / 'service.db')
+    with Database(db_path) as db:
+        project_id = db.create_project("Running")
+
+    client = TrackerClient(port=service.port, token_path=service.token_path)
+    client.start(project_id)
+    deadline = time.monotonic() + 5
+    while not os.path.exists(service.journal.path):
+        assert time.monotonic() < deadline, "no checkpoint written"
+        time.sleep(0.01)
+
+    second = TrackerService(db_path, port=service.port, threshold_seconds=0, sync_calendar=False,
+                            idle_source=FakeIdleSource(), token_path=str(tmp_path / 'second.token'))
+    try:
+        with pytest.raises(OSError):
+            second.listen()
+    finally:
+        second.db.close()
+    # the open session is still the running service's: not saved, checkpoint untouched, no token of its own
+    assert os.path.exists(service.journal.path)
+    assert not os.path.exists(second.token_path)
+    assert client.status()['tracking'] is True
+    with Database(db_path) as db:
+        assert db.count_sessions() == 0
+
+    client.stop()
+    assert not os.path.exists(service.journal.path)
+
+def test_service_errors(service):
+    """
+    Bad requests get an error reply, the connection and service keep working
+    """
+    client = TrackerClient(port=service.port, token_path=service.token_path)
+    with pytest.raises(ServiceError, match="not found"):
+        client.start(999)
+    with pytest.raises(ServiceError, match="Unknown command"):
+        client.request('dance')
+    assert client.status()['tracking'] is False
+
+def test_start_doesnt_wait_for_calendar_sign_in(tmp_path, monkeypatch):
+    """
+    Start answers right away while the calendar signs in on its own thread,
+    the engine picks the calendar up once it's connected
+    """
+    import tracker_service
+    from test_calendar_worker import FakeCalendar
+
+    calendar = FakeCalendar()
+    signed_in = threading.Event()
+    monkeypatch.setattr(tracker_service, 'connect_calendar', lambda: signed_in.wait(10) and calendar)
+
+    service, thread = run_service(tmp_path, sync_calendar=True)
+    try:
+        with Database(str(tmp_path / 'service.db')) as db:
+            project_id = db.create_project("Calendar")
+        client = TrackerClient(port=service.port, token_path=service.token_path, timeout=2)
+        events = client.subscribe()
+        next(events)
+
+        status = client.start(project_id)
+        assert status['tracking'] is True and status['calendar'] == 'connecting'
+        # nothing waits on the sign-in
+        assert client.status()['calendar'] == 'connecting'
+
+        signed_in.set()
+        assert wait_for(events, lambda e: e['event'] == 'calendar')['calendar'] == 'connected'
+        service.foreground.app = "PureRef.exe"
+        wait_for(events, lambda e: e['event'] == 'session')
+        client.flush()
+        deadline = time.monotonic() + 5
+        while not calendar.created:
+            assert time.monotonic() < deadline, "session never pushed to the calendar"
+            time.sleep(0.01)
+        assert calendar.created[0]['app_name'] == "Photoshop.exe"
+        client.stop()
+        events.close()
+    finally:
+        service.shutdown()
+        thread.join(timeout=5)
+
+def test_engine_crash_resets_state(service, tmp_path):
+    """
+    The engine dying on its own is reported as a stop (with the error), and tracking can start again
+    """
+    with Database(str(tmp_path / 'service.db')) as db:
+        project_id = db.create_project("Crash")
+    client = TrackerClient(port=service.port, token_path=service.token_path)
+    events = client.subscribe()
+    next(events)
+
+    client.start(project_id)
+    assert wait_for(events, lambda e: e['event'] == 'state')['tracking'] is True
+    service.foreground.app = OSError("window source broke")
+
+    state = wait_for(events, lambda e: e['event'] == 'state')
+    assert state['tracking'] is False
+    assert "window source broke" in state['error']
+    assert client.status()['tracking'] is False
+    events.close()
+    # the session it had open isn't lost
+    with Database(str(tmp_path / 'service.db')) as db:
+        assert [app['app_name'] for app in db.get_project_time(project_id)['app_breakdown']] == ["Photoshop.exe"]
+
+    service.foreground.app = "Photoshop.exe"
+    assert client.start(project_id)['tracking'] is True
+    client.stop()
+
+def test_requests_need_the_token(service, tmp_path):
+    """
+    No token or someone else's: refused and disconnected. Junk lines (a browser's POST) end the connection
+    """
+    import json
+    import socket
+
+    (tmp_path / 'wrong.token').write_text("not-the-token")
+    for token_path in (str(tmp_path / 'missing.token'), str(tmp_path / 'wrong.token')):
+        client = TrackerClient(port=service.port, token_path=token_path)
+        with pytest.raises(ServiceError, match="Not authorized"):
+            client.status()
+        with pytest.raises(ServiceError, match="Not authorized"):
+            next(client.subscribe())
+
+    # the token file is private
+    if os.name == 'posix':
+        assert os.stat(service.token_path).st_mode & 0o777 == 0o600
+
+    # a cross-protocol POST: the request line isn't JSON, so the JSON body is never run
+    body = json.dumps({'cmd': 'shutdown', 'token': None})
+    with socket.create_connection(('127.0.0.1', service.port), timeout=5) as sock:
+        sock.sendall(f"POST / HTTP/1.1\r\nContent-Type: text/plain\r\n\r\n{body}\n".encode())
+        replies = sock.makefile('r').readlines()
+    assert [json.loads(line)['error'] for line in replies] == ["Bad JSON"]
+    assert TrackerClient(port=service.port, token_path=service.token_path).status()['tracking'] is False
+
+def test_client_without_service(tmp_path):
+    """
+    Nothing listening = ServiceUnavailable, not a hang
+    """
+    from tracker_service import ServiceUnavailable
+
+    service = TrackerService(':memory:', port=0, token_path=str(tmp_path / 'service.token'))
+    port = service.listen()
+    service.server.server_close()
+    service.db.close()
+
+    client = TrackerClient(port=port, timeout=1, token_path=service.token_path)
+    assert client.is_running() is False
+    with pytest.raises(ServiceUnavailable):
+        client.status()
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+from window_source import ScriptedWindowSource, PollingWindowSource, ProcessNameCache, track_foreground
+
+START = datetime(2025, 1, 1, 9, 0).astimezone()
+
+def at(seconds):
+    return START + timedelta(seconds=seconds)
+
+class RecordingTracker:
+    """
+    Remembers every update it gets
+    """
+    def __init__(self):
+        self.updates = []
+
+    def update(self, app_name, now):
+        self.updates.append((app_name, now))
+
+def test_scripted_source_exact_switch_times():
+    """
+    Switches reach the tracker with their own timestamps, heartbeats fill the gaps
+    """
+    source = ScriptedWindowSource([
+        (at(0), "Photoshop.exe"),
+        (at(3.25), "PureRef.exe"),
+        (at(4), "Photoshop.exe"),
+    ])
+    tracker = RecordingTracker()
+
+    track_foreground(source, tracker, lambda: not source.done, heartbeat=2.0)
+
+    assert tracker.updates == [
+        ("Photoshop.exe", at(0)),
+        ("Photoshop.exe", at(2)),  # heartbeat
+        ("PureRef.exe", at(3.25)),
+        ("Photoshop.exe", at(4)),
+    ]
+
+def test_polling_source_backs_off_and_speeds_up():
+    """
+    Poll interval doubles while nothing changes and resets after a switch
+    """
+    apps = iter(["chrome.exe"] * 6 + ["Code.exe"] * 10)
+    source = PollingWindowSource(get_app=lambda: next(apps), min_interval=0.001, max_interval=0.004)
+    source.start()
+    assert source.current() == "chrome.exe"
+
+    event = source.wait(timeout=5)
+    assert event.app_name == "Code.exe"
+    assert source.current() == "Code.exe"
+    assert source.interval == 0.001
+
+    assert source.wait(timeout=0.02) is None
+    assert source.interval == 0.004
+
+def test_polling_source_stop_wakes_wait():
+    """
+    stop() ends a wait early
+    """
+    source = PollingWindowSource(get_app=lambda: "chrome.exe", min_interval=10, max_interval=10)
+    source.start()
+    source.stop()
+    assert source.wait(timeout=60) is None
+
+def test_project_tracker_driven_by_scripted_source(tmp_path):
+    """
+    ProjectTimeTracker saves sessions with the exact switch times from the source
+    """
+    from database import Database
+    from idle_source import FakeIdleSource
+    from tracker_with_db import ProjectTimeTracker
+
+    source = ScriptedWindowSource([
+        (at(0), "Photoshop.exe"),
+        (at(95.5), "PureRef.exe"),
+        (at(100), "Photoshop.exe"),
+        (at(160), "chrome.exe"),
+    ])
+
+    with Database(str(tmp_path / 'track.db')) as db:
+        project_id = db.create_project("Scripted")
+        # never reaches the 5 min idle threshold
+        idle = FakeIdleSource(clock=source.now)
+        tracker = ProjectTimeTracker(db, project_id, threshold_seconds=30, sync_calendar=False, idle_source=idle)
+
+        track_foreground(source, tracker, lambda: not source.done)
+
+        db.flush()
+        rows = db.conn.execute(
+            'SELECT a.name AS app_name, s.duration FROM time_sessions s JOIN apps a ON a.id = s.app_id ORDER BY s.id'
+        ).fetchall()
+        # PureRef's 4.5s is under the threshold
+        assert [(row['app_name'], row['duration']) for row in rows] == [
+            ("Photoshop.exe", 95.5),
+            ("Photoshop.exe", 60.0),
+        ]
+
+class FakeProcesses:
+    """
+    Process table stand-in: pid -> (create_time, name), counts OS lookups
+    """
+    def __init__(self, table):
+        self.table = dict(table)
+        self.create_time_calls = 0
+        self.name_calls = 0
+
+    def __call__(self, pid):
+        processes = self
+
+        class Process:
+            def create_time(self):
+                processes.create_time_calls += 1
+                return processes.table[pid][0]
+
+            def name(self):
+                processes.name_calls += 1
+                return processes.table[pid][1]
+
+        return Process()
+
+def test_process_cache_resolves_new_pids_only():
+    """
+    Names are read once per PID, same-window lookups don't touch the OS at all
+    """
+    processes = FakeProcesses({10: (100.0, "Photoshop.exe"), 20: (200.0, "chrome.exe")})
+    cache = ProcessNameCache(process_factory=processes)
+
+    for _ in range(5):
+        assert cache.get_name(10, hwnd=1) == "Photoshop.exe"
+    assert cache.get_name(20, hwnd=2) == "chrome.exe"
+    # other window of a known process: start time checked, name not re-read
+    assert cache.get_name(10, hwnd=3) == "Photoshop.exe"
+
+    assert processes.name_calls == 2
+    assert processes.create_time_calls == 3
+    assert cache.stats() == {'hits': 5, 'misses': 2, 'size': 2, 'hit_rate': 5 / 7}
+
+def test_process_cache_detects_pid_reuse():
+    """
+    Same PID with a different start time is a different process
+    """
+    processes = FakeProcesses({10: (100.0, "Photoshop.exe")})
+    cache = ProcessNameCache(process_factory=processes)
+    assert cache.get_name(10) == "Photoshop.exe"
+
+    processes.table[10] = (150.0, "notepad.exe")
+    assert cache.get_name(10) == "notepad.exe"
+    assert cache.misses == 2
+
+def test_process_cache_is_bounded():
+    """
+    Least recently used PIDs are dropped past maxsize
+    """
+    processes = FakeProcesses({pid: (float(pid), f"app{pid}.exe") for pid in range(10)})
+    cache = ProcessNameCache(maxsize=3, process_factory=processes)
+
+    for pid in (1, 2, 3):
+        cache.get_name(pid, hwnd=pid)
+    cache.get_name(1, hwnd=1)  # 1 is now most recent
+    cache.get_name(4, hwnd=4)  # pushes out 2
+
+    assert cache.stats()['size'] == 3
+    cache.get_name(1, hwnd=1)
+    assert cache.misses == 4
+    cache.get_name(2, hwnd=2)
+    assert cache.misses == 5
@@ -0,0 +1,391 @@
+"""
+asyncio tracking engine around ProjectTimeTracker
+Every stage is its own task, connected by bounded queues:
+
+    capture ─┐
+             ├─ events ──> track ── sessions ──> persist ── outbox ──> calendar
+    ticks  ──┘
+
+- capture: waits for foreground switches on its own thread, timestamps come from the source
+- ticks: every heartbeat seconds, so idle is noticed while nothing switches
+- track: runs ProjectTimeTracker.update (idle checks, session boundaries), no I/O
+- persist: writes finished sessions to the db on its own thread, batching whatever is queued
+  (and the open-session checkpoints that came in behind them, see session_journal.py)
+- calendar: pushes the calendar outbox on its own thread, woken after writes (and every poll_interval)
+
+A slow disk or a slow API only fills the queue in front of it, switches keep getting
+captured and stamped. MeteredQueue counts how full each queue got and how long
+producers had to wait (see TrackingEngine.metrics())
+"""
+
+import time
+import asyncio
+import logging
+import concurrent.futures
+from collections import namedtuple
+
+from tracker_with_db import ProjectTimeTracker
+from calendar_worker import CalendarSyncWorker
+
+# events queue item: (app_name or None for "whatever's in front", timestamp, is_tick)
+TICK = True
+SWITCH = False
+
+# sessions queue item besides session dicts: the open session, for the journal
+Checkpoint = namedtuple('Checkpoint', ['app_name', 'start', 'seen'])
+
+
+class MeteredQueue(asyncio.Queue):
+    """
+    asyncio.Queue that keeps backpressure stats
+    """
+    def __init__(self, name, maxsize):
+        super().__init__(maxsize)
+        self.name = name
+        self.puts = 0
+        self.gets = 0
+        self.high_water = 0         # most items waiting at once
+        self.blocked_puts = 0       # puts that found the queue full and had to wait
+        self.blocked_seconds = 0.0  # total time producers spent waiting
+        self.dropped = 0            # offer()s that found the queue full
+
+    def _put(self, item):
+        super()._put(item)
+        self.puts += 1
+        self.high_water = max(self.high_water, self.qsize())
+
+    def _get(self):
+        self.gets += 1
+        return super()._get()
+
+    async def put(self, item):
+        if not self.full():
+            return self.put_nowait(item)
+        self.blocked_puts += 1
+        began = time.monotonic()
+        try:
+            await super().put(item)
+        finally:
+            self.blocked_seconds += time.monotonic() - began
+
+    def offer(self, item):
+        """
+        Put without waiting, for items that are fine to lose (wake-ups)
+        :return: True if queued
+        """
+        try:
+            self.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+
+    def stats(self):
+        return {
+            'depth': self.qsize(),
+            'maxsize': self.maxsize,
+            'high_water': self.high_water,
+            'puts': self.puts,
+            'gets': self.gets,
+            'blocked_puts': self.blocked_puts,
+            'blocked_seconds': self.blocked_seconds,
+            'dropped': self.dropped,
+        }
+
+
+class _SessionSink:
+    """
+    Stands in for the Database inside ProjectTimeTracker:
+    sessions are collected for the persist stage, everything else goes to the real db
+    """
+    def __init__(self, db):
+        self._db = db
+        self.sessions = []
+
+    def add_time_session(self, **session):
+        self.sessions.append(session)
+
+    def drain(self):
+        sessions, self.sessions = self.sessions, []
+        return sessions
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+class TrackingEngine:
+    """
+    Runs a ProjectTimeTracker as independent asyncio stages (see module docstring)
+    """
+    def __init__(self, db, project_id, source, threshold_seconds=30, idle_source=None, calendar_sync=None,
+                 on_session_saved=None, on_update=None, heartbeat=2.0, clock=None, keep_running=None,
+                 queue_size=256, batch_size=50, poll_interval=5.0, journal=None):
+        """
+        :param db: Database (sessions are written by the persist stage only)
+        :param project_id: Project to track (ValueError if it doesn't exist)
+        :param source: Started WindowSource
+        :param threshold_seconds: Minimum session length saved
+        :param idle_source: IdleSource for the tracker (default: best for this machine)
+        :param calendar_sync: Authenticated CalendarSync, or None for no calendar stage
+        :param on_session_saved: ProjectTimeTracker callback (called from the loop thread)
+        :param on_update: Called with the app name after every tracker update (loop thread, keep it quick)
+        :param heartbeat: Seconds between idle ticks (None = no ticks)
+        :param clock: Timestamps for ticks (default: source.now)
+        :param keep_running: Capture stops once this returns False (default: until stop())
+        :param queue_size: Max items per queue
+        :param batch_size: Max sessions written per transaction
+        :param poll_interval: Seconds between outbox checks when nothing wakes the calendar stage
+        :param journal: SessionJournal the open session is checkpointed to (cleared on a clean stop,
+                        once the open session is saved)
+        """
+        self.db = db
+        self.source = source
+        self.on_update = on_update
+        self.heartbeat = heartbeat
+        self.clock = clock or source.now
+        self.keep_running = keep_running or (lambda: True)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.journal = journal
+
+        self._sink = _SessionSink(db)
+        self.tracker = ProjectTimeTracker(
+            self._sink,
+            project_id,
+            threshold_seconds=threshold_seconds,
+            on_session_saved=on_session_saved,
+            sync_calendar=False,
+            idle_source=idle_source
+        )
+        # the tracker marks sessions for sync when it has a calendar, the calendar stage pushes them
+        self.tracker.calendar_sync = calendar_sync
+        self.calendar_worker = CalendarSyncWorker(db, calendar_sync) if calendar_sync else None
+
+        self.events = None
+        self.sessions = None
+        self.outbox = None
+        self._loop = None
+        self._running = False
+        self._stopping = False
+        self._calendar_task = None
+        self._app = None          # last app the tracker saw
+        self._last_seen = None    # newest timestamp the tracker saw
+        # one thread per blocking stage, so a slow one never holds up another
+        self._capture_thread = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="Capture")
+        self._db_thread = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="Persist")
+        self._calendar_thread = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="Calendar")
+
+    # Control
+
+    async def run(self):
+        """
+        Run every stage until stop() (or keep_running() is False)
+        Sessions already captured are written before this returns
+        """
+        self._loop = asyncio.get_running_loop()
+        self.events = MeteredQueue('events', self.queue_size)
+        self.sessions = MeteredQueue('sessions', self.queue_size)
+        self.outbox = MeteredQueue('outbox', 1) # just wake-ups, one pending is enough
+        self._running = True
+
+        ticks = asyncio.create_task(self._ticks()) if self.heartbeat else None
+        self._start_calendar()
+        try:
+            # capture -> track -> persist shut down in order, each passing None along
+            await asyncio.gather(self._capture(), self._track(), self._persist())
+            if self.journal:
+                # clean stop, the open session was saved by persist: nothing to recover
+                await asyncio.get_running_loop().run_in_executor(self._db_thread, self.journal.clear)
+        finally:
+            self._running = False
+            tasks = [task for task in (ticks, self._calendar_task) if task]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # an in-flight calendar push finishes on its own, its result is stored in the db
+            for executor in (self._capture_thread, self._db_thread, self._calendar_thread):
+                executor.shutdown(wait=False)
+
+    def stop(self):
+        """Stop capturing and let the queued sessions drain (safe from any thread, even before run())"""
+        self._stopping = True
+        # wakes capture up if it's waiting on a foreground change
+        self.source.stop()
+
+    def attach_calendar(self, calendar_sync):
+        """
+        Start the calendar stage once the calendar is connected (safe from any thread, before or during run())
+        Sessions saved from now on are marked for sync
+        """
+        self.calendar_worker = CalendarSyncWorker(self.db, calendar_sync)
+        self.tracker.calendar_sync = calendar_sync
+        if self._loop and self._running:
+            try:
+                self._loop.call_soon_threadsafe(self._start_calendar)
+            except RuntimeError:
+                pass # loop already finished
+
+    def _start_calendar(self):
+        """Calendar stage task, if there's a calendar and it isn't running yet (loop thread)"""
+        if self._running and self.calendar_worker and self._calendar_task is None:
+            self._calendar_task = asyncio.create_task(self._calendar())
+
+    def wait_persisted(self, timeout=5.0):
+        """
+        Block until every session captured so far is handed to the db (call from another thread)
+        :return: True if drained in time
+        """
+        if not self._loop or not self._running:
+            return True
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._drained(), self._loop)
+        except RuntimeError:
+            return True # loop already finished, everything was written
+        try:
+            future.result(timeout)
+            return True
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return False
+
+    async def _drained(self):
+        await self.events.join()
+        await self.sessions.join()
+
+    def metrics(self):
+        """Backpressure stats per queue"""
+        return {queue.name: queue.stats() for queue in (self.events, self.sessions, self.outbox) if queue}
+
+    # Stages
+
+    async def _capture(self):
+        """Foreground switches -> events (timestamps are the source's, taken on the capture thread)"""
+        loop = asyncio.get_running_loop()
+        try:
+            # the first session starts now, not at the first switch
+            if self.source.current():
+                await self.events.put((self.source.current(), self.clock(), SWITCH))
+
+            while not self._stopping and self.keep_running():
+                # the timeout only matters for noticing keep_running(), stop() wakes it up
+                event = await loop.run_in_executor(self._capture_thread, self.source.wait, 1.0)
+                if event:
+                    await self.events.put((event.app_name, event.timestamp, SWITCH))
+        finally:
+            await self.events.put(None)
+
+    async def _ticks(self):
+        """Idle ticks -> events"""
+        while not self._stopping:
+            await asyncio.sleep(self.heartbeat)
+            await self.events.put((None, self.clock(), TICK))
+
+    async def _track(self):
+        """events -> ProjectTimeTracker -> sessions"""
+        try:
+            while True:
+                item = await self.events.get()
+                try:
+                    if item is None:
+                        await self._end_open_session()
+                        break
+                    await self._update(*item)
+                finally:
+                    self.events.task_done()
+        finally:
+            await self.sessions.put(None)
+
+    async def _update(self, app, now, is_tick):
+        """One tracker update, finished sessions go on to persist"""
+        if is_tick:
+            # a tick stamped before a switch it got queued behind has nothing to add
+            if self._app is None or (self._last_seen and now < self._last_seen):
+                return
+            app = self._app
+        self._app = app
+        self._last_seen = max(self._last_seen, now) if self._last_seen else now
+
+        try:
+            self.tracker.update(app, now)
+        except Exception:
+            logging.exception("Tracker update failed")
+        for session in self._sink.drain():
+            await self.sessions.put(session)
+        if self.journal and self.tracker.session_start and self.journal.due():
+            # queued behind any sessions just handed to persist, so it's written after them
+            # (fine to lose if persist is backed up, the next one replaces it)
+            self.sessions.offer(Checkpoint(
+                self.tracker.current_app, self.tracker.session_start, max(now, self.tracker.session_start)
+            ))
+        if self.on_update:
+            self.on_update(app)
+
+    async def _end_open_session(self):
+        """Capture stopped: the open session counts up to now, same as if the app had been switched away from"""
+        end = self.clock()
+        if self._last_seen and end < self._last_seen:
+            end = self._last_seen
+        try:
+            self.tracker.end_session(end)
+        except Exception:
+            logging.exception("Couldn't end the open session")
+        for session in self._sink.drain():
+            await self.sessions.put(session)
+
+    async def _persist(self):
+        """sessions -> db, whatever is queued goes in one transaction"""
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            batch = [await self.sessions.get()]
+            while len(batch) < self.batch_size and not self.sessions.empty():
+                batch.append(self.sessions.get_nowait())
+            done = None in batch
+            sessions = [item for item in batch if isinstance(item, dict)]
+            # only the newest checkpoint matters
+            checkpoints = [item for item in batch if isinstance(item, Checkpoint)]
+
+            try:
+                if sessions:
+                    await loop.run_in_executor(self._db_thread, self._write, sessions)
+                    if any(session.get('sync_calendar') for session in sessions):
+                        self.outbox.offer(True)
+            except Exception:
+                # keep tracking, the rows stay in the Database queue for its next flush
+                logging.exception("Couldn't write sessions")
+            try:
+                if checkpoints:
+                    await loop.run_in_executor(self._db_thread, self._checkpoint, *checkpoints[-1])
+            finally:
+                for _ in batch:
+                    self.sessions.task_done()
+
+    def _write(self, sessions):
+        """Persist thread"""
+        for session in sessions:
+            self.db.add_time_session(**session)
+        self.db.flush()
+
+    def _checkpoint(self, app, start, seen):
+        """Persist thread, a failed checkpoint is logged and tracking carries on"""
+        try:
+            self.journal.checkpoint(self.tracker.project_id, app, start, seen)
+        except Exception:
+            logging.exception("Couldn't checkpoint the open session")
+
+    async def _calendar(self):
+        """Calendar outbox -> Google Calendar"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self.outbox.get(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass # poll anyway, retries come due by themselves
+            try:
+                # keep going while full batches go through
+                while await loop.run_in_executor(self._calendar_thread, self.calendar_worker.run_once):
+                    pass
+            except Exception as e:
+                # entries are retried next round
+                logging.error(f"Calendar sync error: {e}")
@@ -1,15 +1,17 @@
 import customtkinter as ctk
-from tkinter import messagebox
-import threading
-import time
+from tkinter import messagebox, TclError
 from datetime import datetime, timedelta
-from database import Database
-from tracker_with_db import get_active_window_info, ProjectTimeTracker
-from icon_helper import get_app_icon, get_default_icon
+from database import Database, apply_session_to_project_time
+from tracker_service import TrackerClient, ServiceError
+from clock import default_clock, NS_PER_SECOND
+from icon_helper import get_default_icon
+from icon_loader import request_icon, get_icon_loader
 import config
 
 import os
 import sys
+import logging
+import threading
 
 if getattr(sys, 'frozen', False):
     # Get run script
@@ -82,15 +84,20 @@ class TimeTrackerGUI:
         
         # State
         self.db = Database('time_tracker.db')
-        self.tracker = None
+        # tracking itself runs in the tracker service, this window is only a client
+        self.client = TrackerClient(db_path='time_tracker.db')
+        self.listening = False
         self.is_tracking = False
-        self.tracking_thread = None
         self.current_project_id = None
-        self.elapsed_seconds = 0
+        # the timer shows clock time since timer_started, so late/missed redraws can't make it drift
+        self.clock = default_clock()
+        self.timer_started = None # clock.monotonic_ns() the service's elapsed time counts from
+        self.timer_job = None
         
         self.active_reports = []  # Track open report windows
 
         self.create_ui()
+        self.attach_to_service()
         
     def create_ui(self):
         """Create the UI"""
@@ -280,81 +287,198 @@ class TimeTrackerGUI:
             messagebox.showerror("Error", "Project not found!")
             return
         
-        self.current_project_id = project['id']
-        self.tracker = ProjectTimeTracker(
-        self.db, 
-        self.current_project_id, 
-        threshold_seconds=30,
-        on_session_saved=self.on_session_saved
-        )
+        def start():
+            # starts the service in the background the first time
+            self.client.ensure_running()
+            return self.client.start(project['id'])
+
+        def started(status, error):
+            self.track_button.configure(state="normal")
+            if error:
+                self.status_label.configure(text="Stopped 🌸")
+                messagebox.showerror("Error", f"Couldn't start tracking!\n\n{error}")
+                return
+            self.listen_to_service()
+            self.show_tracking(status)
+
+        self.track_button.configure(state="disabled")
+        self.status_label.configure(text="Starting... ⏳")
+        self.call_service(start, started)
+
+    def call_service(self, request, done=None):
+        """
+        Run a service request on a worker thread, the window stays responsive while it waits
+        done(reply, error) runs in the main thread afterwards (error is the exception, or None)
+        """
+        def run():
+            reply = error = None
+            try:
+                reply = request()
+            except ServiceError as e:
+                error = e
+            except Exception as e:
+                # not the service's answer, but done() still has to put the buttons back
+                logging.exception("Service request failed")
+                error = e
+            if done:
+                try:
+                    self.window.after(0, done, reply, error)
+                except (TclError, RuntimeError):
+                    pass # window closed
+
+        threading.Thread(target=run, name="ServiceRequest", daemon=True).start()
+
+    def show_tracking(self, status):
+        """Switch the UI to tracking (started here, by another client, or still running from before)"""
+        if self.is_tracking:
+            return
 
+        self.current_project_id = status['project_id']
         self.is_tracking = True
-        self.elapsed_seconds = 0
+        self.timer_started = self.clock.monotonic_ns() - int(status['elapsed_seconds'] * NS_PER_SECOND)
+        project = self.db.get_project(self.current_project_id)
+        if project:
+            self.project_var.set(f"{project['name']} ({project['status']})")
         self.track_button.configure(text="⏹ Stop Tracking", fg_color=self.colors['button_active'])
-        self.status_label.configure(text=f"Tracking: {project_name} ✨")
+        self.status_label.configure(text=f"Tracking: {status['project_name']} ✨")
         self.project_dropdown.configure(state="disabled")
-        
-        self.tracking_thread = threading.Thread(target=self.tracking_loop, daemon=True)
-        self.tracking_thread.start()
+        if status.get('current_app'):
+            self.app_label.configure(text=f"Currently: {status['current_app']}")
         
         self.update_timer()
-    
-    def stop_tracking(self):
-        """Stop time tracking"""
+
+    def show_stopped(self, message="Stopped 🌸"):
+        """Switch the UI back to not tracking"""
         self.is_tracking = False
         self.track_button.configure(text="▶ Start Tracking", fg_color=self.colors['button_active'])
-        self.status_label.configure(text="Stopped 🌸")
+        self.status_label.configure(text=message)
         self.project_dropdown.configure(state="normal")
         self.app_label.configure(text="No app tracked")
-        
-        messagebox.showinfo("Stopped", "Time tracking stopped! Your data has been saved 💾")
     
-    def on_session_saved(self, project_id, app_name, duration):
-        """Called when session saved (from background thread!)"""
-        self.window.after(0, self._notify_reports, project_id)
+    def stop_tracking(self):
+        """Stop time tracking"""
+        def stopped(status, error):
+            self.track_button.configure(state="normal")
+            if error:
+                messagebox.showerror("Error", f"Couldn't stop tracking!\n\n{error}")
+                return
+            self.show_stopped()
+            messagebox.showinfo("Stopped", "Time tracking stopped! Your data has been saved 💾")
+
+        self.track_button.configure(state="disabled")
+        # the service writes queued sessions before it answers
+        self.call_service(self.client.stop, stopped)
+
+    def attach_to_service(self):
+        """Pick up tracking that kept going in the service while the window was closed"""
+        def attached(status, error):
+            if error:
+                return # not running yet, started by the first Start
+            self.listen_to_service()
+            if status['tracking']:
+                self.show_tracking(status)
+
+        self.call_service(self.client.status, attached)
+
+    def listen_to_service(self):
+        """Get events (saved sessions, app changes, start/stop) from the service"""
+        if not self.listening:
+            self.listening = True
+            self.client.listen(self.on_service_event, on_close=self.on_service_closed)
+
+    def on_service_event(self, event):
+        """Called for every service event (from background thread!)"""
+        try:
+            self.window.after(0, self.handle_service_event, event)
+        except (TclError, RuntimeError):
+            pass # window closed
+
+    def handle_service_event(self, event):
+        """Apply a service event to the UI (runs in main thread)"""
+        if event['event'] == 'session':
+            self._notify_reports(event['project_id'], event['app_name'], event['duration'])
+        elif event['event'] == 'app' and self.is_tracking:
+            if event['app_name']:
+                self.app_label.configure(text=f"Currently: {event['app_name']}")
+            else:
+                self.app_label.configure(text="No app tracked")
+        elif event['event'] == 'state':
+            if event['tracking']:
+                self.show_tracking(event)
+            elif event.get('error'):
+                self.show_stopped("Tracking stopped (error) 🥀")
+                messagebox.showerror("Tracking stopped", f"Tracking stopped unexpectedly!\n\n{event['error']}")
+            elif self.is_tracking:
+                # stopped from the CLI or another window
+                self.show_stopped()
+        elif event['event'] == 'calendar' and event['calendar'] == 'failed':
+            messagebox.showwarning("Calendar", "Couldn't connect to Google Calendar, sessions aren't synced 📅")
+
+    def on_service_closed(self):
+        """Event stream ended (from background thread!)"""
+        def closed():
+            self.listening = False
+            if self.is_tracking:
+                self.show_stopped("Tracker service stopped 🌸")
+        try:
+            self.window.after(0, closed)
+        except (TclError, RuntimeError):
+            pass
+
+    def flush_service(self, then=None):
+        """
+        Have the service write its queued sessions, so db reads include them
+        then() runs in the main thread once they're written (right away if nothing is tracking)
+        """
+        if not self.is_tracking:
+            if then:
+                then()
+            return
+        # a failed flush still reads the db, just without the queued sessions
+        self.call_service(self.client.flush, (lambda reply, error: then()) if then else None)
     
-    def _notify_reports(self, project_id):
+    def _notify_reports(self, project_id, app_name, duration):
         """Notify report windows (runs in main thread)"""
         # Clean up closed windows
         self.active_reports = [r for r in self.active_reports if r.window.winfo_exists()]
         
-        # Notify matching reports
+        # Pass the new session to matching reports (no db reads)
         for report in self.active_reports:
             if report.project_id == project_id:
-                report.trigger_refresh()
+                report.apply_session(app_name, duration)
     
     def register_report(self, report_window):
         """Register a report window to receive updates"""
         self.active_reports.append(report_window)
 
 
-    def tracking_loop(self):
-        """Background tracking loop"""
-        while self.is_tracking:
-            active_app = get_active_window_info()
-            if active_app and self.tracker:
-                self.tracker.update(active_app)
-                # lambda for .exe compatability
-                self.window.after(0, lambda app = active_app: self.app_label.configure(text=f"Currently: {app}"))
-            else:
-                self.window.after(0, lambda: self.app_label.configure(text="No app tracked"))
-            time.sleep(2)
-    
     def update_timer(self):
-        """Update timer display"""
+        """Update timer display (elapsed time comes from the clock, redraws just keep it on screen)"""
+        if self.timer_job:
+            # restarted while a redraw was pending, keep only one running
+            self.window.after_cancel(self.timer_job)
+            self.timer_job = None
+
         if self.is_tracking:
-            self.elapsed_seconds += 1
-            hours = self.elapsed_seconds // 3600
-            minutes = (self.elapsed_seconds % 3600) // 60
-            seconds = self.elapsed_seconds % 60
+            elapsed_ns = self.clock.monotonic_ns() - self.timer_started
+            elapsed = elapsed_ns // NS_PER_SECOND
+            hours = elapsed // 3600
+            minutes = (elapsed % 3600) // 60
+            seconds = elapsed % 60
             
             time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
             self.timer_label.configure(text=time_str)
             
-            self.window.after(1000, self.update_timer)
+            # next redraw right after the displayed second ticks over
+            delay_ms = 1000 - (elapsed_ns % NS_PER_SECOND) // 1_000_000 + 1
+            self.timer_job = self.window.after(delay_ms, self.update_timer)
     
     def show_report(self):
         """Show proj selection for reports"""
+        self.flush_service(self.open_project_selection)
+
+    def open_project_selection(self):
+        """Project selection window (after the flush)"""
         selection = ProjectSelectionWindow(self.db, self.colors, gui=self)
         # delay so new window will be on top
         self.window.after(100, lambda: selection.window.lift())
@@ -380,15 +504,139 @@ class TimeTrackerGUI:
     def on_closing(self):
         """Handle window closing"""
         if self.is_tracking:
-            if messagebox.askokcancel("Quit", "Tracking is active. Stop and quit? 🌸"):
-                self.is_tracking = False
-                self.db.close()
-                self.window.destroy()
-        else:
-            self.db.close()
-            self.window.destroy()
+            keep = messagebox.askyesnocancel(
+                "Quit",
+                "Tracking is active. Keep tracking in the background? 🌸\n\n(No = stop tracking and quit)"
+            )
+            if keep is None:
+                return
+            if not keep:
+                # close once the service has written everything
+                self.track_button.configure(state="disabled")
+                self.status_label.configure(text="Stopping... ⏳")
+                self.call_service(self.client.stop, lambda status, error: self.close())
+                return
+
+        self.close()
+
+    def close(self):
+        """Close the window (tracking in the service is left as it is)"""
+        get_icon_loader().shutdown()
+        self.db.close()
+        self.window.destroy()
 
 
+def format_duration(total_seconds):
+    """Seconds -> '2h 30m' / '45m 30s' / '12s'"""
+    hours = int(total_seconds // 3600)
+    minutes = int((total_seconds % 3600) // 60)
+    seconds = int(total_seconds % 60)
+
+    if hours > 0:
+        return f"{hours}h {minutes}m"
+    elif minutes > 0:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+class ReportRow:
+    """one app's row in the report table, widgets are kept and updated in place"""
+
+    def __init__(self, report, app_name, duration):
+        self.report = report
+        self.app_name = app_name
+        self.duration = None
+        self.grid_row = None
+        table_frame = report.table_frame
+        colors = report.colors
+
+        # Icon (placeholder until the real one is loaded in the background)
+        self.icon_label = ctk.CTkLabel(
+            table_frame,
+            text="",
+            image=report.placeholder_icon,
+            width=60
+        )
+        request_icon(report.window, app_name, self.set_icon, size=32)
+
+        # App name
+        self.app_label = ctk.CTkLabel(
+            table_frame,
+            text=app_name,
+            font=("Arial", 12),
+            text_color=colors['text'],
+            width=250,
+            anchor="w"
+        )
+
+        # Time (editable)
+        self.time_entry = ctk.CTkEntry(
+            table_frame,
+            width=150,
+            height=35,
+            corner_radius=10,
+            border_width=1,
+            border_color=colors['accent'],
+            fg_color=colors['card'], # use theme card colours
+            text_color=colors['text']
+        )
+
+        # Save button
+        self.edit_btn = ctk.CTkButton(
+            table_frame,
+            text="💾",
+            width=40,
+            height=35,
+            corner_radius=10,
+            fg_color=colors['button_active'],
+            hover_color=colors['button_hover'],
+            command=lambda: report.save_time_edit(self.time_entry, {'app_name': self.app_name})
+        )
+
+        self.set_duration(duration)
+
+    def set_icon(self, icon_img):
+        """Swap the placeholder for the app's icon (main thread)"""
+        if not self.icon_label.winfo_exists():
+            return
+        # Convert PIL Image to CTkImage (fixes HighDPI warning)
+        ctk_image = ctk.CTkImage(
+            light_image=icon_img,
+            dark_image=icon_img,
+            size=(32, 32)
+        )
+        self.icon_label.configure(image=ctk_image)
+
+    def set_duration(self, duration):
+        """Update the time cell, returns True if it changed"""
+        if duration == self.duration:
+            return False
+        self.duration = duration
+
+        # don't overwrite something the user is typing
+        if not self.is_editing():
+            self.time_entry.delete(0, "end")
+            self.time_entry.insert(0, format_duration(duration))
+        return True
+
+    def is_editing(self):
+        """True while the time entry has keyboard focus"""
+        focused = self.time_entry.focus_get()
+        return focused is not None and str(focused).startswith(str(self.time_entry))
+
+    def place(self, grid_row):
+        """Put the row at a table row (no-op if it's already there)"""
+        if grid_row == self.grid_row:
+            return
+        self.grid_row = grid_row
+        self.icon_label.grid(row=grid_row, column=0, padx=5, pady=5)
+        self.app_label.grid(row=grid_row, column=1, padx=5, pady=5, sticky="w")
+        self.time_entry.grid(row=grid_row, column=2, padx=5, pady=5)
+        self.edit_btn.grid(row=grid_row, column=3, padx=5, pady=5)
+
+    def destroy(self):
+        for widget in (self.icon_label, self.app_label, self.time_entry, self.edit_btn):
+            widget.destroy()
+
 class ReportWindow:
     """report window with editable table"""
     
@@ -416,16 +664,24 @@ class ReportWindow:
         self.project = db.get_project(project_id)
         self.time_data = db.get_project_time(project_id)
 
-        self.needs_refresh = False
+        self.needs_redraw = False
+        self.rows = {}  # app_name -> ReportRow
+
+        # shown while icons load, one image shared by every row
+        placeholder = get_default_icon(size=32, color=colors['accent'])
+        self.placeholder_icon = ctk.CTkImage(light_image=placeholder, dark_image=placeholder, size=(32, 32))
         
         self.create_ui()
 
         # Register with main GUI
         if self.gui:
             self.gui.register_report(self)
+            # shown right away, again once the service has written its queued sessions
+            if self.gui.is_tracking:
+                self.gui.flush_service(self.reload)
     
     def create_ui(self):
-        """Create the report UI"""
+        """Create the report UI (once, refreshes go through update_rows)"""
         
         # Header
         header_frame = ctk.CTkFrame(
@@ -435,44 +691,32 @@ class ReportWindow:
         )
         header_frame.pack(pady=20, padx=20, fill="x")
         
-        project_label = ctk.CTkLabel(
+        self.project_label = ctk.CTkLabel(
             header_frame,
             text=f"📊 {self.project['name']}",
             font=("Arial Rounded MT Bold", 24),
             text_color=self.colors['text']
         )
-        project_label.pack(pady=10)
+        self.project_label.pack(pady=10)
         
         # Total time
-        total_seconds = self.time_data['total_seconds']
-        hours = int(total_seconds // 3600)
-        minutes = int((total_seconds % 3600) // 60)
-        seconds = int(total_seconds % 60)
-        
-        if hours > 0:
-            time_str = f"{hours}h {minutes}m"
-        elif minutes > 0:
-            time_str = f"{minutes}m {seconds}s"
-        else:
-            time_str = f"{seconds}s"
-        
-        total_label = ctk.CTkLabel(
+        self.total_label = ctk.CTkLabel(
             header_frame,
-            text=f"Total Time: {time_str}",
+            text="",
             font=("Arial Rounded MT Bold", 18),
             text_color=self.colors['accent']
         )
-        total_label.pack(pady=(0, 10))
+        self.total_label.pack(pady=(0, 10))
         
         # Table frame
-        table_frame = ctk.CTkScrollableFrame(
+        self.table_frame = ctk.CTkScrollableFrame(
             self.window,
             fg_color=self.colors['card'],
             corner_radius=15,
             border_width=2,
             border_color=self.colors['accent']
         )
-        table_frame.pack(pady=10, padx=20, fill="both", expand=True)
+        self.table_frame.pack(pady=10, padx=20, fill="both", expand=True)
         
         # Table headers
         headers = ["Icon", "Application", "Time", "Actions"]
@@ -480,7 +724,7 @@ class ReportWindow:
         
         for i, (header, width) in enumerate(zip(headers, header_widths)):
             label = ctk.CTkLabel(
-                table_frame,
+                self.table_frame,
                 text=header,
                 font=("Arial Rounded MT Bold", 14),
                 text_color=self.colors['text'],
@@ -490,90 +734,37 @@ class ReportWindow:
         
         # Separator
         separator = ctk.CTkFrame(
-            table_frame,
+            self.table_frame,
             height=2,
             fg_color=self.colors['accent']
         )
         separator.grid(row=1, column=0, columnspan=4, sticky="ew", padx=10, pady=5)
         
         # Table rows
-        for idx, app in enumerate(self.time_data['app_breakdown']):
-            row = idx + 2
-            
-            # Get app icon
-            icon_img = get_app_icon(app['app_name'], size=32)
-            if not icon_img:
-                icon_img = get_default_icon(size=32, color=self.colors['accent'])
-            
-            # Convert PIL Image to CTkImage (fixes HighDPI warning)
-            ctk_image = ctk.CTkImage(
-                light_image=icon_img,
-                dark_image=icon_img,
-                size=(32, 32)
-            )
-            
-            # Icon
-            icon_label = ctk.CTkLabel(
-                table_frame,
-                text="",
-                image=ctk_image,
-                width=60
-            )
-            icon_label.grid(row=row, column=0, padx=5, pady=5)
-
-            # App name
-            app_label = ctk.CTkLabel(
-                table_frame,
-                text=app['app_name'],
-                font=("Arial", 12),
-                text_color=self.colors['text'],
-                width=250,
-                anchor="w"
-            )
-            app_label.grid(row=row, column=1, padx=5, pady=5, sticky="w")
-            
-            # Time (editable)
-            app_seconds = app['duration']
-            app_hours = int(app_seconds // 3600)
-            app_minutes = int((app_seconds % 3600) // 60)
-            app_secs = int(app_seconds % 60)
-            
-            if app_hours > 0:
-                time_text = f"{app_hours}h {app_minutes}m"
-            elif app_minutes > 0:
-                time_text = f"{app_minutes}m {app_secs}s"
-            else:
-                time_text = f"{app_secs}s"
-            
-            time_entry = ctk.CTkEntry(
-                table_frame,
-                width=150,
-                height=35,
-                corner_radius=10,
-                border_width=1,
-                border_color=self.colors['accent'],
-                fg_color=self.colors['card'], # use theme card colours
-                text_color=self.colors['text']
-            )
-            time_entry.insert(0, time_text)
-            time_entry.grid(row=row, column=2, padx=5, pady=5)
-            
-            # Save button
-            edit_btn = ctk.CTkButton(
-                table_frame,
-                text="💾",
-                width=40,
-                height=35,
-                corner_radius=10,
-                fg_color=self.colors['button_active'],
-                hover_color=self.colors['button_hover'],
-                command=lambda e=time_entry, a=app: self.save_time_edit(e, a)
-            )
-            edit_btn.grid(row=row, column=3, padx=5, pady=5)
+        self.update_rows()
         
+        # Bottom buttons
+        button_frame = ctk.CTkFrame(self.window, fg_color="transparent")
+        button_frame.pack(pady=10)
+
+        # Refresh button (re-reads the db)
+        refresh_btn = ctk.CTkButton(
+            button_frame,
+            text="🔄 Refresh",
+            command=self.do_refresh,
+            width=140,
+            height=40,
+            corner_radius=20,
+            fg_color=self.colors['button_active'],
+            hover_color=self.colors['button_hover'],
+            font=("Arial Rounded MT Bold", 14),
+            text_color="white"
+        )
+        refresh_btn.pack(side="left", padx=5)
+
         # Close button
         close_btn = ctk.CTkButton(
-            self.window,
+            button_frame,
             text="✨ Close",
             command=self.window.destroy,
             width=200,
@@ -584,32 +775,72 @@ class ReportWindow:
             font=("Arial Rounded MT Bold", 14),
             text_color="white"
         )
-        close_btn.pack(pady=10)
+        close_btn.pack(side="left", padx=5)
+
+    def update_rows(self):
+        """
+        Bring the table in line with self.time_data
+        Only rows that appeared, disappeared, changed or moved get touched
+        """
+        self.total_label.configure(text=f"Total Time: {format_duration(self.time_data['total_seconds'])}")
+
+        seen = set()
+        for idx, app in enumerate(self.time_data['app_breakdown']):
+            app_name = app['app_name']
+            seen.add(app_name)
+
+            row = self.rows.get(app_name)
+            if row is None:
+                row = self.rows[app_name] = ReportRow(self, app_name, app['duration'])
+            else:
+                row.set_duration(app['duration'])
+            # rows are sorted by time, so a change can move a row
+            row.place(idx + 2)
+
+        for app_name in [name for name in self.rows if name not in seen]:
+            self.rows.pop(app_name).destroy()
     
-    def trigger_refresh(self):
-        """Called when new data saved (safe - main thread)"""
-        if not self.needs_refresh:
-            self.needs_refresh = True
-            self.window.after(500, self.do_refresh)
+    def apply_session(self, app_name, duration):
+        """Called when new session saved (safe - main thread), adds it to time_data"""
+        apply_session_to_project_time(self.time_data, app_name, duration)
+        # several saves close together = one redraw
+        if not self.needs_redraw:
+            self.needs_redraw = True
+            self.window.after(500, self.redraw)
+
+    def redraw(self):
+        """Show the current time_data"""
+        if not self.window.winfo_exists():
+            return
+
+        self.needs_redraw = False
+        self.update_rows()
     
     def do_refresh(self):
-        """Actually refresh the display"""
+        """Re-read the project from the db (Refresh button, after edits)"""
         if not self.window.winfo_exists():
             return
         
-        self.needs_refresh = False
-        
-        # Get fresh data
+        def refreshed():
+            self.reload()
+            print(f"✨ Report refreshed!")
+
+        # Get fresh data (sessions the service hasn't written yet too)
+        if self.gui:
+            self.gui.flush_service(refreshed)
+        else:
+            refreshed()
+
+    def reload(self):
+        """Read the project from the db and update in place"""
+        if not self.window.winfo_exists():
+            return
         self.time_data = self.db.get_project_time(self.project_id)
         self.project = self.db.get_project(self.project_id)
         
-        # Clear and rebuild
-        for widget in self.window.winfo_children():
-            widget.destroy()
-        
-        self.create_ui()
-        
-        print(f"✨ Report refreshed!")
+        # Update in place
+        self.project_label.configure(text=f"📊 {self.project['name']}")
+        self.update_rows()
     
     def save_time_edit(self, entry, app_data):
         """Save edited time to database"""
@@ -632,27 +863,40 @@ class ReportWindow:
             elif 's' in time_str:
                 total_seconds = int(time_str.replace('s', '').strip())
             
-            # Update database
+        except Exception as e:
+            messagebox.showerror("Error", f"Invalid time format!\n\nUse: 2h 30m or 45m 30s or 120s\n\nError: {str(e)}")
+            return
+
+        # Update database (after the service writes its queued sessions, so they get scaled too)
+        save = lambda: self.apply_time_edit(app_data['app_name'], total_seconds, time_str)
+        if self.gui:
+            self.gui.flush_service(save)
+        else:
+            save()
+
+    def apply_time_edit(self, app_name, total_seconds, time_str):
+        """Write an edited time to the db (after the flush)"""
+        try:
             self.db.update_app_time_for_project(
                 self.project_id,
-                app_data['app_name'],
+                app_name,
                 total_seconds
             )
-            
-            # Refresh data
-            self.time_data = self.db.get_project_time(self.project_id)
-            
-            messagebox.showinfo(
-                "Saved! 💾",
-                f"Updated {app_data['app_name']} to {time_str}"
-            )
-            
-            # Optionally refresh the window
-            self.window.destroy()
-            ReportWindow(self.db, self.project_id, self.colors)
-            
         except Exception as e:
-            messagebox.showerror("Error", f"Invalid time format!\n\nUse: 2h 30m or 45m 30s or 120s\n\nError: {str(e)}")
+            messagebox.showerror("Error", f"Couldn't save the new time!\n\nError: {str(e)}")
+            return
+        if not self.window.winfo_exists():
+            return
+
+        # Refresh data
+        self.time_data = self.db.get_project_time(self.project_id)
+        self.window.focus_set()  # leave the entry so it shows the saved value
+        self.update_rows()
+        
+        messagebox.showinfo(
+            "Saved! 💾",
+            f"Updated {app_name} to {time_str}"
+        )
 
 class ProjectSelectionWindow:
     """Window to select which project to view report for"""
@@ -711,8 +955,8 @@ class ProjectSelectionWindow:
         )
         projects_frame.pack(pady=10, padx=30, fill="both", expand=True)
         
-        # Get all projects
-        projects = self.db.get_all_projects()
+        # Get all projects + their totals in one query
+        projects = self.db.get_project_summaries()
         
         if not projects:
             no_projects = ctk.CTkLabel(
@@ -729,9 +973,8 @@ class ProjectSelectionWindow:
     def create_project_card(self, parent, project):
         """Create a card for each project"""
         
-        # Get time data for this project
-        time_data = self.db.get_project_time(project['id'])
-        total_seconds = time_data['total_seconds']
+        # Totals come with the project (get_project_summaries)
+        total_seconds = project['total_seconds']
         
         # Format time
         hours = int(total_seconds // 3600)
@@ -1148,5 +1391,10 @@ class SettingsWindow:
             messagebox.showerror("Error", "Invalid settings selected")
 
 if __name__ == "__main__":
+    if '--service' in sys.argv:
+        # packaged exe started as the tracker service (see tracker_service.service_command)
+        import tracker_service
+        sys.exit(tracker_service.main([arg for arg in sys.argv[1:] if arg != '--service']))
+
     app = TimeTrackerGUI()
     app.run()
\ No newline at end of file
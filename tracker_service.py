@@ -0,0 +1,629 @@
+"""
+Tracker service: owns the tracking engine and the database writer, runs without the GUI
+The GUI and CLI are clients - closing them doesn't stop tracking
+
+Clients talk to it over a local TCP socket, one JSON object per line:
+    {"cmd": "start", "project_id": 1}   start tracking a project
+    {"cmd": "stop"}                     stop tracking (queued sessions are written first)
+    {"cmd": "status"}                   what's being tracked
+    {"cmd": "flush"}                    write queued sessions now (before reading the db)
+    {"cmd": "shutdown"}                 stop tracking and exit
+Replies are {"ok": true, ...} or {"ok": false, "error": "..."}
+
+Every request also carries "token": the secret the service writes to a file only this user
+can read (config.get_service_token_path()), so other users' processes and web pages
+(a browser can POST to localhost) can't drive it. A wrong token or a line that isn't JSON
+closes the connection.
+
+{"cmd": "subscribe"} keeps the connection open and streams events:
+    {"event": "state", ...status...}                                tracking started/stopped (or crashed: "error")
+    {"event": "calendar", "calendar": ...}                          calendar "connecting"/"connected"/"failed"
+    {"event": "app", "app_name": ...}                               foreground app changed
+    {"event": "session", "project_id", "app_name", "duration"}     session saved
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import queue
+import asyncio
+import socket
+import logging
+import secrets
+import tempfile
+import threading
+import subprocess
+import socketserver
+
+import config
+from database import Database
+from tracker_engine import TrackingEngine
+from session_journal import SessionJournal
+from tracker_with_db import connect_calendar
+from window_source import default_window_source, get_process_cache_stats
+
+HOST = '127.0.0.1' # local only
+
+class ServiceError(Exception):
+    """The service refused a request"""
+
+class ServiceUnavailable(ServiceError):
+    """Nothing is listening (service not running)"""
+
+
+class TrackerService:
+    """
+    Headless tracker: one ProjectTimeTracker at a time, controlled over a local socket
+    """
+    def __init__(self, db_path='time_tracker.db', host=HOST, port=None, threshold_seconds=30, sync_calendar=True,
+                 window_source_factory=default_window_source, idle_source=None, max_queued_events=1000,
+                 token_path=None):
+        """
+        :param db_path: Path to SQLite database file
+        :param host: Address to listen on
+        :param port: Port to listen on (None = config.get_service_port(), 0 = any free port)
+        :param threshold_seconds: Minimum session length saved
+        :param sync_calendar: Push sessions to Google Calendar
+        :param window_source_factory: Returns a started WindowSource (called on every start)
+        :param idle_source: IdleSource for the trackers (default: best for this machine)
+        :param max_queued_events: Events buffered per subscriber before it's dropped as too slow
+        :param token_path: Where the client token is written (None = config.get_service_token_path())
+        """
+        self.db = Database(db_path)
+        self.host = host
+        self.port = config.get_service_port() if port is None else port
+        self.threshold_seconds = threshold_seconds
+        self.sync_calendar = sync_calendar
+        self.window_source_factory = window_source_factory
+        self.idle_source = idle_source
+        self.max_queued_events = max_queued_events
+        self.token_path = token_path or config.get_service_token_path()
+        self.token = None # new one every time the service starts listening
+
+        # a crash last time leaves its open session in the journal (recovered by listen())
+        self.journal = SessionJournal.for_database(db_path)
+
+        self.engine = None
+        self.calendar_sync = None # authenticated once, kept across projects
+        # 'off' (sync_calendar=False), 'disconnected', 'connecting', 'connected' or 'failed' (retried on the next start)
+        self.calendar_state = 'disconnected' if sync_calendar else 'off'
+        self.source = None
+        self.current_app = None
+        self.started_at = None  # wall clock, for display
+        self._started = None    # clock.monotonic_ns() at start, for elapsed time
+        self._tracking = False
+        self._thread = None
+        self._lock = threading.RLock() # start/stop come from different client connections
+
+        self._subscribers = set()
+        self._subscribers_lock = threading.Lock()
+        self.server = None
+
+    # Tracking
+
+    def start_tracking(self, project_id):
+        """
+        Start tracking a project (no-op if it's already being tracked)
+        :return: Status dict
+        """
+        with self._lock:
+            if self._tracking:
+                if self.engine.tracker.project_id == project_id:
+                    return self.status()
+                raise ServiceError(f"Already tracking {self.engine.tracker.project['name']}, stop it first")
+
+            if self.db.get_project(project_id) is None:
+                raise ServiceError(f"Project {project_id} not found!")
+
+            source = self.window_source_factory()
+            try:
+                engine = TrackingEngine(
+                    self.db,
+                    project_id,
+                    source,
+                    threshold_seconds=self.threshold_seconds,
+                    idle_source=self.idle_source,
+                    calendar_sync=self.calendar_sync,
+                    on_session_saved=self._on_session_saved,
+                    on_update=self._on_update,
+                    journal=self.journal
+                )
+            except ValueError as e:
+                source.stop()
+                raise ServiceError(str(e))
+            # keep the same idle source across projects
+            self.idle_source = engine.tracker.idle_source
+
+            self.engine = engine
+            self.source = source
+            self.current_app = source.current()
+            clock = engine.tracker.clock
+            self._started = clock.monotonic_ns()
+            self.started_at = clock.at(self._started)
+            self._tracking = True
+            self._thread = threading.Thread(target=self._track, args=(engine,), name="Tracking", daemon=True)
+            self._thread.start()
+            # sign-in can wait on the browser for minutes, tracking doesn't wait for it
+            connect = self.calendar_state in ('disconnected', 'failed')
+            if connect:
+                self.calendar_state = 'connecting'
+            status = self.status()
+
+        logging.info(f"Service tracking {engine.tracker.project['name']}")
+        self._publish(dict(status, event='state'))
+        if connect:
+            threading.Thread(target=self._connect_calendar, name="CalendarConnect", daemon=True).start()
+        return status
+
+    def _connect_calendar(self):
+        """Calendar sign-in thread: hands the calendar to the running engine once it's connected"""
+        try:
+            calendar_sync = connect_calendar()
+        except Exception:
+            logging.exception("Calendar sign-in failed")
+            calendar_sync = None
+
+        with self._lock:
+            self.calendar_sync = calendar_sync
+            self.calendar_state = 'connected' if calendar_sync else 'failed'
+            if calendar_sync and self.engine:
+                self.engine.attach_calendar(calendar_sync)
+            state = self.calendar_state
+        self._publish({'event': 'calendar', 'calendar': state})
+
+    def stop_tracking(self, engine=None, error=None):
+        """
+        Stop tracking and write queued sessions
+        :param engine: Only stop if this engine is the one running (None = whatever is)
+        :param error: Why the engine stopped on its own, passed on in the state event
+        :return: Status dict
+        """
+        with self._lock:
+            if not self._tracking or (engine is not None and self.engine is not engine):
+                return self.status()
+
+            self._tracking = False
+            # the engine writes everything it captured before its thread ends
+            self.engine.stop()
+            self._thread.join(timeout=10)
+            self.db.flush()
+            if error and self.journal:
+                # the engine died with its session open: save it now, the next start checkpoints over it
+                try:
+                    self.journal.recover(self.db, self.threshold_seconds, self.sync_calendar)
+                except Exception:
+                    logging.exception("Couldn't recover the session the engine left open")
+
+            self.engine = None
+            self.source = None
+            self.current_app = None
+            self.started_at = None
+            self._thread = None
+            status = self.status()
+
+        logging.info("Service stopped tracking")
+        logging.debug(f"Process name cache: {get_process_cache_stats()}")
+        self._publish(dict(status, event='state', error=error) if error else dict(status, event='state'))
+        return status
+
+    def status(self):
+        """What's being tracked right now"""
+        with self._lock:
+            tracker = self.engine.tracker if self.engine else None
+            return {
+                'tracking': self._tracking,
+                'project_id': tracker.project_id if tracker else None,
+                'project_name': tracker.project['name'] if tracker else None,
+                'current_app': self.current_app,
+                'started_at': self.started_at.isoformat() if self.started_at else None,
+                'elapsed_seconds': tracker.clock.elapsed(self._started) if self._tracking else 0,
+                'calendar': self.calendar_state,
+                'queues': self.engine.metrics() if self.engine else {},
+                'pid': os.getpid(),
+            }
+
+    def _track(self, engine):
+        """Tracking thread: runs the engine's event loop until stop_tracking()"""
+        error = "Tracking engine stopped"
+        try:
+            asyncio.run(engine.run())
+        except Exception as e:
+            logging.exception("Tracking engine crashed")
+            error = f"Tracking engine crashed: {e}"
+        finally:
+            engine.source.stop()
+            if self._tracking and self.engine is engine:
+                # ended without stop_tracking(): clean up the same way, from another thread since
+                # stop_tracking() joins this one
+                threading.Thread(
+                    target=self.stop_tracking, args=(engine, error), name="TrackingCleanup", daemon=True
+                ).start()
+
+    def flush(self):
+        """
+        Write every session captured so far
+        :return: Number of sessions written by the final flush
+        """
+        engine = self.engine
+        if engine and not engine.wait_persisted():
+            logging.warning("Sessions still queued in the tracking engine")
+        return self.db.flush()
+
+    def _on_update(self, app_name):
+        """After every tracker update (engine loop)"""
+        if app_name != self.current_app:
+            self.current_app = app_name
+            self._publish({'event': 'app', 'app_name': app_name})
+
+    def _on_session_saved(self, project_id, app_name, duration):
+        """ProjectTimeTracker callback (engine loop)"""
+        self._publish({'event': 'session', 'project_id': project_id, 'app_name': app_name, 'duration': duration})
+
+    # Subscribers
+
+    def subscribe(self):
+        """
+        New event queue for a client
+        :return: queue.Queue that gets every event from now on
+        """
+        events = queue.Queue(maxsize=self.max_queued_events)
+        with self._subscribers_lock:
+            self._subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self._subscribers_lock:
+            self._subscribers.discard(events)
+
+    def is_subscribed(self, events):
+        with self._subscribers_lock:
+            return events in self._subscribers
+
+    def _publish(self, event):
+        """Send an event to every subscriber, never blocks the tracking thread"""
+        with self._subscribers_lock:
+            for events in list(self._subscribers):
+                try:
+                    events.put_nowait(event)
+                except queue.Full:
+                    # client stopped reading, let it go (it can resubscribe and ask for status)
+                    logging.warning("Dropping slow subscriber")
+                    self._subscribers.discard(events)
+
+    # Requests
+
+    def authorized(self, token):
+        """True if token is the one this service wrote to token_path"""
+        if self.token is None or not isinstance(token, str):
+            return False
+        return hmac.compare_digest(token.encode('utf-8'), self.token.encode('utf-8'))
+
+    def handle(self, request):
+        """
+        Answer one request (not subscribe, see _Handler)
+        :return: Reply dict
+        """
+        cmd = request.get('cmd')
+        try:
+            if cmd == 'start':
+                status = self.start_tracking(int(request['project_id']))
+            elif cmd == 'stop':
+                status = self.stop_tracking()
+            elif cmd == 'status':
+                status = self.status()
+            elif cmd == 'flush':
+                status = dict(self.status(), flushed=self.flush())
+            elif cmd == 'shutdown':
+                status = self.stop_tracking()
+            else:
+                raise ServiceError(f"Unknown command: {cmd}")
+        except (KeyError, TypeError, ValueError):
+            return {'ok': False, 'error': f"Bad request: {request}"}
+        except ServiceError as e:
+            return {'ok': False, 'error': str(e)}
+        return dict(status, ok=True)
+
+    # Server
+
+    def listen(self):
+        """
+        Bind the socket (raises OSError if the port is taken, e.g. the service is already running)
+        Then write the client token and save the session a crash left in the journal - only once
+        the port is ours, a second service must never replace the running one's token or "recover"
+        its open session
+        :return: Port listening on
+        """
+        self.server = _Server((self.host, self.port), _Handler)
+        self.server.service = self
+        self.port = self.server.server_address[1]
+
+        try:
+            self.token = write_token(self.token_path)
+        except OSError:
+            self.server.server_close()
+            raise
+
+        if self.journal:
+            self.journal.recover(self.db, self.threshold_seconds, self.sync_calendar)
+        return self.port
+
+    def serve_forever(self):
+        """Answer clients until shutdown()"""
+        if not self.server:
+            self.listen()
+        logging.info(f"Tracker service listening on {self.host}:{self.port}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stop_tracking()
+            with self._subscribers_lock:
+                self._subscribers.clear()
+            self.server.server_close()
+            self.db.close()
+
+    def shutdown(self):
+        """Make serve_forever() return (call from another thread)"""
+        if self.server:
+            self.server.shutdown()
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    # on Windows this would let a second service bind the same port
+    allow_reuse_address = sys.platform != 'win32'
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One client connection: requests in, replies (or events) out"""
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                # not one of our clients (e.g. the headers of a browser's POST), don't read the rest
+                self._send({'ok': False, 'error': "Bad JSON"})
+                return
+            if not isinstance(request, dict):
+                self._send({'ok': False, 'error': "Bad request"})
+                return
+            if not service.authorized(request.pop('token', None)):
+                self._send({'ok': False, 'error': "Not authorized (token doesn't match the running service)"})
+                return
+
+            if request.get('cmd') == 'subscribe':
+                self._stream(service)
+                return
+
+            reply = service.handle(request)
+            self._send(reply)
+            if request.get('cmd') == 'shutdown':
+                service.shutdown()
+                return
+
+    def _stream(self, service):
+        """Push events until the client goes away"""
+        events = service.subscribe()
+        try:
+            self._send(dict(service.status(), event='state', ok=True))
+            while True:
+                try:
+                    event = events.get(timeout=1.0)
+                except queue.Empty:
+                    # dropped as too slow, or service shutting down
+                    if not service.is_subscribed(events):
+                        return
+                    continue
+                self._send(event)
+        except OSError:
+            pass # client disconnected
+        finally:
+            service.unsubscribe(events)
+
+    def _send(self, message):
+        self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+
+class TrackerClient:
+    """
+    Talks to a TrackerService (GUI, CLI)
+    """
+    def __init__(self, host=HOST, port=None, timeout=5.0, db_path='time_tracker.db', token_path=None):
+        """
+        :param host: Service address
+        :param port: Service port (None = config.get_service_port())
+        :param timeout: Seconds to wait for a reply
+        :param db_path: Database the service is started with if it isn't running
+        :param token_path: Token file the service wrote (None = config.get_service_token_path())
+        """
+        self.host = host
+        self.port = config.get_service_port() if port is None else port
+        self.timeout = timeout
+        self.db_path = db_path
+        self.token_path = token_path or config.get_service_token_path()
+
+    def _line(self, cmd, **params):
+        """One request as a JSON line, with the token (re-read every time, a restarted service has a new one)"""
+        return (json.dumps(dict(params, cmd=cmd, token=read_token(self.token_path))) + '\n').encode('utf-8')
+
+    def request(self, cmd, **params):
+        """
+        Send one request
+        :return: Reply dict
+        Raises ServiceUnavailable if the service isn't running, ServiceError if it refused
+        """
+        try:
+            with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+                sock.sendall(self._line(cmd, **params))
+                line = sock.makefile('r', encoding='utf-8').readline()
+        except OSError as e:
+            raise ServiceUnavailable(f"Tracker service not reachable on port {self.port}: {e}")
+        if not line:
+            raise ServiceUnavailable("Tracker service closed the connection")
+        reply = json.loads(line)
+        if not reply.get('ok'):
+            raise ServiceError(reply.get('error', "Unknown error"))
+        return reply
+
+    def start(self, project_id):
+        return self.request('start', project_id=project_id)
+
+    def stop(self):
+        return self.request('stop')
+
+    def status(self):
+        return self.request('status')
+
+    def flush(self):
+        return self.request('flush')
+
+    def shutdown(self):
+        return self.request('shutdown')
+
+    def is_running(self):
+        try:
+            self.status()
+            return True
+        except ServiceUnavailable:
+            return False
+
+    def ensure_running(self, timeout=10.0):
+        """
+        Start the service in the background if it isn't running, wait until it answers
+        Raises ServiceUnavailable if it doesn't come up in time
+        """
+        if self.is_running():
+            return
+        spawn_service(self.port, self.db_path)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            if self.is_running():
+                return
+        raise ServiceUnavailable("Tracker service didn't start")
+
+    def subscribe(self):
+        """
+        Stream of events (generator, blocks between events)
+        The first event is the current state
+        """
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise ServiceUnavailable(f"Tracker service not reachable on port {self.port}: {e}")
+        with sock:
+            # events can be far apart
+            sock.settimeout(None)
+            sock.sendall(self._line('subscribe'))
+            for line in sock.makefile('r', encoding='utf-8'):
+                event = json.loads(line)
+                if event.get('ok') is False:
+                    raise ServiceError(event.get('error', "Unknown error"))
+                yield event
+
+    def listen(self, callback, on_close=None):
+        """
+        Call callback(event) for every event, from a background thread
+        on_close() is called once the connection ends (service stopped)
+        :return: The thread
+        """
+        def run():
+            try:
+                for event in self.subscribe():
+                    callback(event)
+            except (OSError, ValueError, ServiceError) as e:
+                logging.debug(f"Service event stream ended: {e}")
+            finally:
+                if on_close:
+                    on_close()
+
+        thread = threading.Thread(target=run, name="ServiceEvents", daemon=True)
+        thread.start()
+        return thread
+
+
+def write_token(path):
+    """
+    New random client token, in a file only this user can read
+    (temp file + rename, so a client never reads half of it)
+    :return: The token
+    """
+    token = secrets.token_hex(32)
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    # mkstemp creates the file 0600 (on Windows the per-user folder's ACL keeps others out)
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.token-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(token)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return token
+
+def read_token(path):
+    """Token the running service wrote, None if there's no token file"""
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def service_command(port=None, db_path='time_tracker.db'):
+    """Command line that starts the service"""
+    args = ['--db', os.path.abspath(db_path)]
+    if port is not None:
+        args += ['--port', str(port)]
+    if getattr(sys, 'frozen', False):
+        # packaged exe: the same exe runs the service when given --service
+        return [sys.executable, '--service'] + args
+    return [sys.executable, os.path.abspath(__file__)] + args
+
+def spawn_service(port=None, db_path='time_tracker.db'):
+    """Start the service as its own process (keeps running after the caller exits)"""
+    kwargs = {}
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW
+    else:
+        kwargs['start_new_session'] = True
+    return subprocess.Popen(
+        service_command(port, db_path),
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        close_fds=True, **kwargs
+    )
+
+def main(argv=None):
+    """
+    Run the service in the foreground
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Time tracker background service')
+    parser.add_argument('--db', default='time_tracker.db', help='SQLite database file')
+    parser.add_argument('--port', type=int, help='Port to listen on (default: service_port setting)')
+    parser.add_argument('--no-calendar', action='store_true', help="Don't sync sessions to Google Calendar")
+    args = parser.parse_args(argv)
+
+    service = TrackerService(args.db, port=args.port, sync_calendar=not args.no_calendar)
+    try:
+        service.listen()
+    except OSError as e:
+        logging.error(f"Can't listen on port {service.port} (already running?): {e}")
+        service.db.close()
+        return 1
+
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s: %(message)s', datefmt='%H:%M:%S')
+    sys.exit(main())
@@ -1,12 +1,9 @@
-import win32gui
-import win32process
-import psutil
-import time
-from datetime import datetime, timedelta
+from datetime import timedelta
 from collections import defaultdict
 from database import Database
-from calendar_sync import CalendarSync
-import pyautogui
+from calendar_worker import CalendarSyncWorker
+from idle_source import default_idle_source
+from clock import default_clock, aware
 
 import logging
 
@@ -20,47 +17,29 @@ logging.basicConfig(
     datefmt = '%H:%M:%S'
 )
 
-def get_active_window_info():
+def connect_calendar():
     """
-    Gets the name of active window/app
-    Return: process name or None 
+    Authenticate with Google Calendar
+    
+    :return: CalendarSync, or None if authentication failed
     """
-    try:
-        # grab foreground window
-        window = win32gui.GetForegroundWindow()
-
-        # if no valid window, skip
-        if not window:
-            return None
+    # imported here so tracking works (and tests run) without the Google libraries
+    from calendar_sync import CalendarSync
 
-        # grab process ID of window
-        _, pid = win32process.GetWindowThreadProcessId(window)
-
-        # use psutil -> get process name fm PID
-        process = psutil.Process(pid)
-        process_name = process.name()
-
-        return process_name
-    
-    except psutil.NoSuchProcess:
-        # EXPECTED - window closed between checks
-        logging.debug(f"Process disappeared (PID no longer exists)")
-        return None
-    except psutil.AccessDenied:
-        # EXPECTED - system/protected process
-        logging.debug(f"Access denied to process")
-        return None
-    except Exception as e:
-        # UNEXPECTED!!!! needs fixing
-        logging.error(f"Unexpected error getting window: {e}")
-        return None
+    calendar_sync = CalendarSync()
+    if calendar_sync.authenticate():
+        logging.info("Calendar sync enabled")
+        return calendar_sync
+    logging.warning("Calendar sync disabled (authentication failed)")
+    return None
 
 class ProjectTimeTracker:
     """
     Time tracker, saves sessions to db
     """
     # NEW but similar to old TimeTracker
-    def __init__(self, db: Database, project_id: int, threshold_seconds = 30, on_session_saved=None):
+    def __init__(self, db: Database, project_id: int, threshold_seconds = 30, on_session_saved=None, sync_calendar=True,
+                 idle_source=None, clock=None):
         # storing in database instead of memory
         self.db = db
         self.project_id = project_id
@@ -78,49 +57,77 @@ class ProjectTimeTracker:
         logging.info(f"Tracking time for: {self.project['name']}")
 
         # initialize calendar sync
-        self.calendar_sync = CalendarSync()
-        if self.calendar_sync.authenticate():
-            logging.info("Calendar sync enabled")
-        else:
-            logging.warning("Calendar sync disabled (authentication failed)")
-            self.calendar_sync = None
+        # events are pushed by a background worker so the API never blocks tracking
+        self.calendar_sync = None
+        self.sync_worker = None
+        if sync_calendar:
+            self._start_calendar_sync()
 
         # NEW idle tracking
-        self.last_activity_time = datetime.now()
+        # idle source = how long since the last keyboard/mouse input (see idle_source.py)
+        self.idle_source = idle_source or default_idle_source()
         self.idle_threshold = 300 # 5 mins
         self.is_idle = False
-        self.last_mouse_position = pyautogui.position()
+        self.idle_since = None # last input time once idle
 
-    def check_idle(self):
+        # timestamps/durations come off the monotonic clock, anchored to the wall clock now (see clock.py)
+        self.clock = clock or default_clock()
+        self.clock.anchor()
+
+    def _start_calendar_sync(self):
         """
-        Check if user is idle (no mouse/keyboard activity)
-        Returns True if idle, False if active
+        Authenticate with Google Calendar + start the background sync worker
         
         :param self: -
         """
-        current_mouse_position = pyautogui.position()
+        self.calendar_sync = connect_calendar()
+        if self.calendar_sync:
+            self.sync_worker = CalendarSyncWorker(self.db, self.calendar_sync)
+            self.sync_worker.start()
 
-        # Check if mouse has moved
-        if current_mouse_position != self.last_mouse_position:
-            self.last_mouse_position = current_mouse_position
-            self.last_activity_time = datetime.now()
-            return False
+    def check_idle(self, now=None):
+        """
+        Check if user is idle (no mouse/keyboard activity)
+        Returns True if idle, False if active
+        When idle, idle_since is set to the time of the last input
         
-        # Calculate time since last activity
-        time_since_activity = (datetime.now() - self.last_activity_time).total_seconds()
+        :param self: -
+        :param now: Current time (default: clock.now())
+        """
+        now = aware(now) or self.clock.now()
+        idle_seconds = self.idle_source.idle_seconds()
 
         # If idle > threshold, mark as idle
-        if time_since_activity >= self.idle_threshold:
+        if idle_seconds >= self.idle_threshold:
+            self.idle_since = now - timedelta(seconds=idle_seconds)
             return True
         
+        self.idle_since = None
         return False
 
     # NEW modified for DB
-    def update(self, app_name):
-        now = datetime.now()
+    def update(self, app_name, now=None):
+        """
+        Update tracking w/ current active application
+        
+        :param self: -
+        :param app_name: the current window
+        :param now: when app_name was seen (exact switch time from the window source), default now
+        """
+        now = aware(now) or self.clock.now()
+
+        # slept / clock changed: the open session ends where the old anchor says it did,
+        # the next one starts on the new anchor
+        jump = self.clock.check()
+        if jump:
+            logging.info(f"Clock jumped {jump.seconds:+.1f}s (suspend or clock change), splitting the session")
+            if self.current_app and self.session_start:
+                self._end_session(max(self.session_start, jump.before))
+                self.session_start = jump.after
+            now = max(now, jump.after)
         
         # Check for idle
-        is_currently_idle = self.check_idle()
+        is_currently_idle = self.check_idle(now)
         
         # Determine what we're tracking
         if is_currently_idle:
@@ -134,44 +141,15 @@ class ProjectTimeTracker:
         
         # If tracking name changed (switched apps or went idle/active)
         if tracking_name != self.current_app:
-            if self.current_app and self.session_start:
-                session_duration = (now - self.session_start).total_seconds()
-
-                if session_duration >= self.threshold:
-                    # Create calendar event first
-                    calendar_event_id = None
-                    if self.calendar_sync:
-                        session_data = {
-                            'project_name': self.project['name'],
-                            'app_name': self.current_app,
-                            'start_time': self.session_start,
-                            'end_time': now,
-                            'duration_seconds': session_duration
-                        }
-                        calendar_event_id = self.calendar_sync.create_event_from_session(session_data)
-                    
-                    # Save to database with calendar event ID
-                    self.db.add_time_session(
-                        project_id = self.project_id,
-                        app_name = self.current_app,
-                        start_time = self.session_start,
-                        end_time = now,
-                        duration = session_duration,
-                        calendar_event_id = calendar_event_id
-                    )
-
-                    # update logging msg
-                    logging.info(
-                        f"Saved {session_duration:.1f}s in {self.current_app}"
-                        f" to project '{self.project['name']}'"
-                    )
-                    
-                    # notify callback (in bg thread)
-                    if self.on_session_saved:
-                        self.on_session_saved(self.project_id, self.current_app, session_duration)
+            # going idle: the app session really ended at the last input, not when the 5 mins ran out
+            if is_currently_idle and not self.is_idle and self.idle_since:
+                if self.session_start:
+                    now = max(self.session_start, self.idle_since)
                 else:
-                    # Log to ignore if less than threshold
-                    logging.info(f"Ignored {session_duration:.1f}s...")
+                    now = self.idle_since
+
+            if self.current_app and self.session_start:
+                self._end_session(now)
                 
             self.current_app = tracking_name
             self.session_start = now
@@ -181,6 +159,62 @@ class ProjectTimeTracker:
                 self.is_idle = True
                 logging.info("User went idle (5 min no activity)")
 
+    def _end_session(self, end):
+        """
+        Save the open session (current_app since session_start) if it's long enough
+        
+        :param self: -
+        :param end: When it ended
+        """
+        session_duration = (end - self.session_start).total_seconds()
+
+        if session_duration >= self.threshold:
+            # Save to database, calendar event is created later by the sync worker
+            self.db.add_time_session(
+                project_id = self.project_id,
+                app_name = self.current_app,
+                start_time = self.session_start,
+                end_time = end,
+                duration = session_duration,
+                sync_calendar = self.calendar_sync is not None
+            )
+
+            # update logging msg
+            logging.info(
+                f"Saved {session_duration:.1f}s in {self.current_app}"
+                f" to project '{self.project['name']}'"
+            )
+            
+            # notify callback (in bg thread)
+            if self.on_session_saved:
+                self.on_session_saved(self.project_id, self.current_app, session_duration)
+        else:
+            # Log to ignore if less than threshold
+            logging.info(f"Ignored {session_duration:.1f}s...")
+
+    def end_session(self, now=None):
+        """
+        Save the open session up to now and stop timing it (tracking stopped, not switched)
+        
+        :param self: -
+        :param now: When tracking stopped (default: clock.now())
+        """
+        now = aware(now) or self.clock.now()
+        if self.current_app and self.session_start:
+            self._end_session(max(now, self.session_start))
+        self.current_app = None
+        self.session_start = None
+
+    def stop(self):
+        """
+        Stop background calendar sync (pending sessions stay queued in the db)
+        
+        :param self: -
+        """
+        if self.sync_worker:
+            self.sync_worker.stop()
+            self.sync_worker = None
+
     def get_summary(self):
         """
         Get tracking summary from db
@@ -188,47 +222,54 @@ class ProjectTimeTracker:
         :param self: -
         """
         # NEW: pullls from db
-        time_data = self.db.get_project_time(self.project_id)
-            
-        summary = "\n" + "="*60 + "\n"
-        summary += f"PROJECT: {self.project['name']}\n"
-        summary += "="*60 + "\n"
-        
-        if time_data['total_seconds'] == 0:
-            summary += "No time tracked yet!\n"
+        return format_summary(self.project['name'], self.db.get_project_time(self.project_id))
+
+def format_summary(project_name, time_data):
+    """
+    Text report of a project's time (what Ctrl+C prints)
+    
+    :param project_name: Project name
+    :param time_data: Database.get_project_time() result
+    """
+    summary = "\n" + "="*60 + "\n"
+    summary += f"PROJECT: {project_name}\n"
+    summary += "="*60 + "\n"
+    
+    if time_data['total_seconds'] == 0:
+        summary += "No time tracked yet!\n"
+    else:
+        # formatting total time
+        total_seconds = time_data['total_seconds']
+        hours = int(total_seconds // 3600)
+        minutes = int((total_seconds % 3600) // 60)
+        seconds = int(total_seconds % 60)
+
+        # showing appropriate units
+        if hours > 0:
+            summary += f"Total Time: {hours}h {minutes}m\n"
+        elif minutes > 0:
+            summary += f"Total Time: {minutes}m {seconds}s\n"
         else:
-            # formatting total time
-            total_seconds = time_data['total_seconds']
-            hours = int(total_seconds // 3600)
-            minutes = int((total_seconds % 3600) // 60)
-            seconds = int(total_seconds % 60)
-
-            # showing appropriate units
-            if hours > 0:
-                summary += f"Total Time: {hours}h {minutes}m\n"
-            elif minutes > 0:
-                summary += f"Total Time: {minutes}m {seconds}s\n"
-            else:
-                summary += f"Total Time: {seconds}s\n"
-            
-            summary += "\nBreakdown by Application:\n"
-            summary += "-"*60 + "\n"
-            
-            for app in time_data['app_breakdown']:
-                app_seconds = app['duration']
-                app_hours = int(app_seconds // 3600)
-                app_minutes = int((app_seconds % 3600) // 60)
-                app_secs = int(app_seconds % 60)
-                
-                if app_hours > 0:
-                    summary += f"  {app['app_name']:30s} {app_hours}h {app_minutes}m\n"
-                elif app_minutes > 0:
-                    summary += f"  {app['app_name']:30s} {app_minutes}m {app_secs}s\n"
-                else:
-                    summary += f"  {app['app_name']:30s} {app_secs}s\n"
+            summary += f"Total Time: {seconds}s\n"
         
-        summary += "="*60 + "\n"
-        return summary
+        summary += "\nBreakdown by Application:\n"
+        summary += "-"*60 + "\n"
+        
+        for app in time_data['app_breakdown']:
+            app_seconds = app['duration']
+            app_hours = int(app_seconds // 3600)
+            app_minutes = int((app_seconds % 3600) // 60)
+            app_secs = int(app_seconds % 60)
+            
+            if app_hours > 0:
+                summary += f"  {app['app_name']:30s} {app_hours}h {app_minutes}m\n"
+            elif app_minutes > 0:
+                summary += f"  {app['app_name']:30s} {app_minutes}m {app_secs}s\n"
+            else:
+                summary += f"  {app['app_name']:30s} {app_secs}s\n"
+    
+    summary += "="*60 + "\n"
+    return summary
 
 def select_or_create_project(db: Database):
     """
@@ -308,17 +349,26 @@ def create_new_project(db: Database):
 def main():
     """
     Main tracking loop with database integration
+    Tracking runs in the tracker service (tracker_service.py), this is just a client:
+    it picks the project, starts tracking and prints what the service reports
     """
+    from tracker_service import TrackerClient, ServiceError
+
     print("="*60)
     print("ART TIME TRACKER - Database Edition")
     print("="*60)
     
-    # Connect to database
+    # Connect to database (project list + summary, the service does the writing)
     db = Database('time_tracker.db')
+    client = TrackerClient(db_path='time_tracker.db')
+    project_id = None
     
     try:
         # Select/create project
         project_id = select_or_create_project(db)
+
+        client.ensure_running()
+        client.start(project_id)
         
         print("\n" + "="*60)
         print("TRACKING STARTED")
@@ -326,21 +376,34 @@ def main():
         print("Minimum session: 30 seconds")
         print("Press Ctrl+C to stop and see report\n")
         
-        # Start tracking
-        tracker = ProjectTimeTracker(db, project_id, threshold_seconds=30)
-        
-        while True:
-            active_app = get_active_window_info()
-            if active_app:
-                tracker.update(active_app)
-            
-            time.sleep(2)
+        # runs until Ctrl+C (or another client stops tracking)
+        for event in client.subscribe():
+            if event['event'] == 'session':
+                print(f"Saved {event['duration']:.1f}s in {event['app_name']}")
+            elif event['event'] == 'app' and event['app_name']:
+                print(f"Currently: {event['app_name']}")
+            elif event['event'] == 'calendar':
+                print(f"Calendar sync: {event['calendar']}")
+            elif event['event'] == 'state' and not event['tracking']:
+                if event.get('error'):
+                    print(f"\nTracking stopped: {event['error']}")
+                else:
+                    print("\nTracking was stopped from another window")
+                break
             
     except KeyboardInterrupt:
         print("\n\n" + "="*60)
         print("STOPPING TRACKER")
         print("="*60)
-        print(tracker.get_summary())
+        try:
+            client.stop()
+        except ServiceError as e:
+            print(f"Couldn't stop the tracker service: {e}")
+        if project_id is not None:
+            project = db.get_project(project_id)
+            print(format_summary(project['name'], db.get_project_time(project_id)))
+    except ServiceError as e:
+        print(f"\nTracker service problem: {e}")
         
     finally:
         db.close()
@@ -0,0 +1,399 @@
+"""
+Where the tracker finds out which app is in the foreground
+- WinEventWindowSource: Windows tells us the moment the foreground window changes
+- PollingWindowSource: asks every so often, faster right after a switch
+- ScriptedWindowSource: plays back a fixed list of switches (tests, no Windows needed)
+"""
+
+import sys
+import time
+import queue
+import threading
+import logging
+from collections import namedtuple, OrderedDict
+from datetime import datetime, timedelta
+
+from clock import default_clock, aware
+
+# app_name: process name (e.g. 'Photoshop.exe'), timestamp: when the switch happened
+WindowEvent = namedtuple('WindowEvent', ['app_name', 'timestamp'])
+
+def get_active_window_info():
+    """
+    Gets the name of active window/app
+    Return: process name or None
+    """
+    # Windows only, imported here so the rest of this module works anywhere
+    import win32gui
+    import win32process
+
+    try:
+        # grab foreground window
+        window = win32gui.GetForegroundWindow()
+
+        # if no valid window, skip
+        if not window:
+            return None
+
+        # grab process ID of window
+        _, pid = win32process.GetWindowThreadProcessId(window)
+
+        return get_process_name(pid, window)
+
+    except Exception as e:
+        # UNEXPECTED!!!! needs fixing
+        logging.error(f"Unexpected error getting window: {e}")
+        return None
+
+class ProcessNameCache:
+    """
+    Bounded PID -> (create_time, name) cache, so each tick doesn't re-read the process name
+    PIDs get reused by new processes, so a cached name only counts if the
+    process start time still matches (or it's the same window as last time -
+    a window can't outlive its process)
+    """
+    def __init__(self, maxsize=256, process_factory=None):
+        """
+        :param maxsize: Max PIDs remembered (least recently used dropped first)
+        :param process_factory: pid -> psutil.Process-like object (default psutil.Process)
+        """
+        self.maxsize = maxsize
+        self.process_factory = process_factory
+        self._entries = OrderedDict() # pid -> [create_time, name, hwnd]
+        self._lock = threading.Lock() # hook thread + tracking thread
+        self.hits = 0
+        self.misses = 0
+
+    def get_name(self, pid, hwnd=None):
+        """
+        Process name for a PID, only asks the OS for PIDs it hasn't seen
+
+        :param pid: Process ID
+        :param hwnd: Window handle the PID came from (optional, allows a check-free hit)
+        :return: Process name (psutil errors pass through)
+        """
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry and hwnd is not None and entry[2] == hwnd:
+                self._entries.move_to_end(pid)
+                self.hits += 1
+                return entry[1]
+
+        process = self._new_process(pid)
+        create_time = process.create_time()
+
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry and entry[0] == create_time:
+                entry[2] = hwnd
+                self._entries.move_to_end(pid)
+                self.hits += 1
+                return entry[1]
+
+        # new PID (or reused by a different process)
+        name = process.name()
+        with self._lock:
+            self._entries[pid] = [create_time, name, hwnd]
+            self._entries.move_to_end(pid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self.misses += 1
+        return name
+
+    def forget(self, pid):
+        """Drop a PID (its process is gone)"""
+        with self._lock:
+            self._entries.pop(pid, None)
+
+    def stats(self):
+        """Hit/miss counters, to check the per-tick cost"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _new_process(self, pid):
+        if self.process_factory:
+            return self.process_factory(pid)
+        import psutil
+        return psutil.Process(pid)
+
+# Shared by every window source
+_PROCESS_CACHE = ProcessNameCache()
+
+def get_process_cache_stats():
+    """Hit/miss counters of the PID -> name cache"""
+    return _PROCESS_CACHE.stats()
+
+def get_process_name(pid, hwnd=None):
+    """
+    Process name for a PID (cached)
+    Return: process name or None
+    """
+    import psutil
+
+    try:
+        return _PROCESS_CACHE.get_name(pid, hwnd)
+
+    except psutil.NoSuchProcess:
+        # EXPECTED - window closed between checks
+        logging.debug(f"Process disappeared (PID no longer exists)")
+        _PROCESS_CACHE.forget(pid)
+        return None
+    except psutil.AccessDenied:
+        # EXPECTED - system/protected process
+        logging.debug(f"Access denied to process")
+        return None
+
+
+class WindowSource:
+    """
+    Base class for foreground window sources
+    """
+    def start(self):
+        """Begin watching (hooks, threads...)"""
+
+    def stop(self):
+        """Stop watching, wakes up anyone blocked in wait()"""
+
+    def current(self):
+        """App in the foreground right now (or None)"""
+        return None
+
+    def now(self):
+        """Current time on this source's clock"""
+        return default_clock().now()
+
+    def wait(self, timeout):
+        """
+        Block until the foreground app changes or timeout seconds pass
+
+        :param timeout: Max seconds to wait
+        :return: WindowEvent, or None if nothing changed
+        """
+        raise NotImplementedError
+
+
+class PollingWindowSource(WindowSource):
+    """
+    Polls get_app() - every min_interval right after a switch,
+    backing off (doubling) to max_interval while nothing changes
+    """
+    def __init__(self, get_app=get_active_window_info, min_interval=0.5, max_interval=2.0):
+        self.get_app = get_app
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._current = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        self._stop_event.clear()
+        self._current = self.get_app()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def current(self):
+        return self._current
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while not self._stop_event.is_set():
+            app = self.get_app()
+            if app and app != self._current:
+                self._current = app
+                # someone switching apps tends to switch again soon
+                self.interval = self.min_interval
+                return WindowEvent(app, default_clock().now())
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._stop_event.wait(min(self.interval, remaining))
+            self.interval = min(self.interval * 2, self.max_interval)
+        return None
+
+
+class WinEventWindowSource(WindowSource):
+    """
+    Push-based: a WinEvent hook (EVENT_SYSTEM_FOREGROUND) fires on every foreground change,
+    so there's no polling and switch times are exact
+    """
+    EVENT_SYSTEM_FOREGROUND = 0x0003
+    WINEVENT_OUTOFCONTEXT = 0x0000
+    WM_QUIT = 0x0012
+
+    def __init__(self, get_name=get_process_name):
+        self.get_name = get_name
+        self._events = queue.Queue()
+        self._current = None
+        self._thread = None
+        self._thread_id = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self):
+        """
+        Install the hook on its own thread (hooks need a message loop on the installing thread)
+        Raises OSError if the hook can't be installed
+        """
+        self._current = get_active_window_info()
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._message_loop, name="WinEventHook", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        if self._error:
+            raise self._error
+
+    def stop(self):
+        if self._thread_id:
+            import ctypes
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, self.WM_QUIT, 0, 0)
+        if self._thread:
+            self._thread.join(2)
+            self._thread = None
+        # wake up wait()
+        self._events.put(None)
+
+    def current(self):
+        return self._current
+
+    def wait(self, timeout):
+        try:
+            event = self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if event:
+            self._current = event.app_name
+        return event
+
+    def _message_loop(self):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+
+        def on_foreground(hook, event, hwnd, id_object, id_child, thread, event_ms):
+            if not hwnd:
+                return
+            pid = wintypes.DWORD()
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            app = self.get_name(pid.value, hwnd)
+            if app:
+                # event_ms is GetTickCount() when it happened, turn it into a datetime
+                delay_ms = (kernel32.GetTickCount() - event_ms) & 0xFFFFFFFF
+                self._events.put(WindowEvent(app, default_clock().now() - timedelta(milliseconds=delay_ms)))
+
+        # keep a reference, ctypes callbacks get garbage collected otherwise
+        self._callback = WinEventProc(on_foreground)
+        self._thread_id = kernel32.GetCurrentThreadId()
+        hook = user32.SetWinEventHook(
+            self.EVENT_SYSTEM_FOREGROUND, self.EVENT_SYSTEM_FOREGROUND,
+            0, self._callback, 0, 0, self.WINEVENT_OUTOFCONTEXT
+        )
+        if not hook:
+            self._error = OSError("SetWinEventHook failed")
+            self._ready.set()
+            return
+        self._ready.set()
+
+        try:
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            user32.UnhookWinEvent(hook)
+            self._thread_id = None
+
+
+class ScriptedWindowSource(WindowSource):
+    """
+    Fake source for tests: plays back (timestamp, app_name) switches on a virtual clock
+    wait() jumps the clock straight to the next switch (or by timeout if that comes first)
+    Naive timestamps are taken as local time and made aware, like the session clock's
+    """
+    def __init__(self, switches, start_time=None):
+        self.switches = sorted((aware(timestamp), app_name) for timestamp, app_name in switches)
+        self._index = 0
+        self._now = aware(start_time) or (self.switches[0][0] if self.switches else default_clock().now())
+        self._current = None
+
+    @property
+    def done(self):
+        """True once every switch has been played"""
+        return self._index >= len(self.switches)
+
+    def current(self):
+        return self._current
+
+    def now(self):
+        return self._now
+
+    def wait(self, timeout):
+        tick_end = self._now + timedelta(seconds=timeout)
+        if not self.done and self.switches[self._index][0] <= tick_end:
+            timestamp, app = self.switches[self._index]
+            self._index += 1
+            self._now = max(self._now, timestamp)
+            self._current = app
+            return WindowEvent(app, timestamp)
+        self._now = tick_end
+        return None
+
+
+def default_window_source():
+    """
+    Best source for this machine: WinEvent hook on Windows, polling otherwise
+    (or if the hook can't be installed)
+    Returns a started source
+    """
+    if sys.platform == 'win32':
+        source = WinEventWindowSource()
+        try:
+            source.start()
+            return source
+        except OSError as e:
+            logging.warning(f"Foreground hook unavailable ({e}), polling instead")
+
+    source = PollingWindowSource()
+    source.start()
+    return source
+
+
+def track_foreground(source, tracker, keep_running, heartbeat=2.0, on_tick=None):
+    """
+    Feed foreground changes from a source into a tracker until keep_running() is False
+    The tracker also gets a call every heartbeat seconds with the same app,
+    so idle checks keep running while nothing switches
+
+    :param source: Started WindowSource
+    :param tracker: Anything with update(app_name, now)
+    :param keep_running: Callable, loop stops when it returns False
+    :param heartbeat: Max seconds between tracker updates
+    :param on_tick: Optional callable(app_name) after every update (UI refresh, flushing...)
+    """
+    app = source.current()
+    while keep_running():
+        event = source.wait(heartbeat)
+        if event:
+            app = event.app_name
+            now = event.timestamp
+        else:
+            now = source.now()
+
+        if app:
+            tracker.update(app, now)
+        if on_tick:
+            on_tick(app)